@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import logging
+from collections import deque
 from inspect import isgenerator
-from threading import Lock
+from threading import Event, Lock, Thread, current_thread
+
+logging = logging.getLogger('kastl.async_utils')
 
 
 def coroutine(func):
@@ -12,55 +16,164 @@ def coroutine(func):
     return wrapper
 
 
+class _Subscriber(object):
+    """
+    Deliver messages straight to the coroutine.
+    """
+
+    __slots__ = ('coro',)
+
+    def __init__(self, coro):
+        self.coro = coro
+
+    def send(self, message):
+        self.coro.send(message)
+
+    def close(self):
+        pass
+
+
+class _QueuedSubscriber(_Subscriber):
+    """
+    Deliver messages to the coroutine from its own thread.
+
+    Messages are kept in a bounded queue: when the coroutine is too slow,
+    oldest messages are dropped so the sender never waits.
+    """
+
+    __slots__ = ('queue', 'dropped', 'channel', '_ev', '_exit_ev', '_thread')
+
+    def __init__(self, coro, maxsize, channel):
+        super().__init__(coro)
+        self.queue = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.channel = channel
+
+        self._ev = Event()
+        self._exit_ev = Event()
+        self._thread = Thread(target=self._loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def send(self, message):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(message)
+        self._ev.set()
+
+    def close(self):
+        self._exit_ev.set()
+        self._ev.set()
+        # The coroutine may only be closed once the loop no longer sends to it
+        if self._thread is not current_thread():
+            self._thread.join()
+
+    def _loop(self):
+        while not self._exit_ev.is_set():
+            self._ev.wait()
+            self._ev.clear()
+            while self.queue and not self._exit_ev.is_set():
+                try:
+                    self.coro.send(self.queue.popleft())
+                except StopIteration:
+                    self.channel._prune(self.coro)
+                    return
+                except Exception as e:
+                    logging.exception('Error in {!r} subscriber: {!s}'.format(
+                        self.channel, e))
+
+
 class Channel(object):
+    """
+    Fan-out a message to every subscribed coroutine.
+
+    Subscribers are held in an immutable snapshot replaced on each
+    (un)subscription, so send() never locks. Coroutines that are exhausted
+    are pruned on the next delivery attempt.
+    """
+
     _Channels = {}
     _Lock = Lock()
 
     def __init__(self, name):
-        if name in self._Channels:
-            raise ValueError('Name already exists')
+        with self._Lock:
+            if name in self._Channels:
+                raise ValueError('Name already exists')
+            self._Channels[name] = self
 
         self._name = name
-        with self._Lock:
-            self._Channels[self.name] = {
-                'ids': [],
-                'coros': {},
-            }
+        self._lock = Lock()
+        self._subscribers = ()
 
-    def suscribe(self, coro):
+    def suscribe(self, coro, maxsize=None):
+        """
+        Subscribe coro to this channel.
+
+        If maxsize is given, messages are queued (up to maxsize) and
+        delivered from a dedicated thread.
+        """
         if not isgenerator(coro):
             raise ValueError('Invalid coroutine specified')
 
-        if id(coro) in self.coro_ids:
-            raise ValueError('Coroutine already subscribed.')
+        with self._lock:
+            if self._find(coro) is not None:
+                raise ValueError('Coroutine already subscribed.')
 
-        with self._Lock:
-            self.coro_ids.append(id(coro))
-            self.coros[id(coro)] = coro
+            if maxsize:
+                sub = _QueuedSubscriber(coro, maxsize, self)
+            else:
+                sub = _Subscriber(coro)
+            self._subscribers = self._subscribers + (sub,)
 
     def unsuscribe(self, coro):
         if not isgenerator(coro):
             raise ValueError('Invalid coroutine specified')
 
-        with self._Lock:
-            if id(coro) not in self.coro_ids:
+        with self._lock:
+            sub = self._find(coro)
+            if sub is None:
                 raise ValueError('Coroutine not found.')
 
-            self.coro_ids.remove(id(coro))
-            self.coros.pop(id(coro))
+            self._remove(sub)
 
     def send(self, message):
-        with self._Lock:
-            coros = list(self.coros.values())
-
-        for coro in coros:
+        for sub in self._subscribers:
             try:
-                coro.send(message)
+                sub.send(message)
             except StopIteration:
-                raise
+                self._prune(sub.coro)
+            except Exception as e:
+                logging.exception('Error in {!r} subscriber: {!s}'.format(self, e))
 
-    def close(self, end_message):
-        pass
+    def close(self, end_message=None):
+        if end_message is not None:
+            self.send(end_message)
+
+        with self._lock:
+            subs, self._subscribers = self._subscribers, ()
+
+        for sub in subs:
+            sub.close()
+            sub.coro.close()
+
+        with self._Lock:
+            self._Channels.pop(self.name, None)
+
+    def _find(self, coro):
+        for sub in self._subscribers:
+            if sub.coro is coro:
+                return sub
+
+    def _remove(self, sub):
+        self._subscribers = tuple(s for s in self._subscribers if s is not sub)
+        sub.close()
+
+    def _prune(self, coro):
+        with self._lock:
+            sub = self._find(coro)
+            if sub is not None:
+                self._remove(sub)
+                logging.debug('Pruned dead subscriber from {!r}'.format(self))
 
     @property
     def name(self):
@@ -68,8 +181,14 @@ class Channel(object):
 
     @property
     def coro_ids(self):
-        return self._Channels[self.name]['ids']
+        return [id(s.coro) for s in self._subscribers]
 
     @property
     def coros(self):
-        return self._Channels[self.name]['coros']
+        return {id(s.coro): s.coro for s in self._subscribers}
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.name}'.format(self)
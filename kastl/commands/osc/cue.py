@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from kastl.commands import UnbufferedCommand
+from kastl.commands import OscCommand
+
+
+class CueGo(OscCommand, UnbufferedCommand):
+    """
+    Fire cue NAME: its precompiled values are sent to the machine in one
+    /machine/set_many message, and to slaves.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'eq', 1):
+            return
+
+        try:
+            cue = self.machine.cues.go(str(c.args[0]))
+            self.ok(c, cue.name)
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/cue/go'
+
+    @property
+    def help_text(self):
+        return 'Fire a cue'
+
+    @property
+    def args(self):
+        return 'NAME'
+
+
+class CueList(OscCommand, UnbufferedCommand):
+    "Reply with the name of every cue"
+
+    def execute(self, c):
+        try:
+            self.ok(c, *self.machine.cues.names)
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/cue/list'
+
+    @property
+    def help_text(self):
+        return 'List cues'
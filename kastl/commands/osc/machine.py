@@ -57,6 +57,44 @@ class RemoveSlave(OscCommand, UnbufferedCommand):
         return '/machine/slave/remove'
 
 
+class SlaveStats(OscCommand, UnbufferedCommand):
+    """
+    Link statistics of slave SERIALNUMBER: round trip times, adapted
+    timeout, intervals and window, clock and queue. Replies with
+    SERIALNUMBER followed by KEY VALUE pairs.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'eq', 1):
+            return
+
+        sn, = c.args
+        for s in self.machine.slaves or ():
+            if s.serialnumber == sn:
+                break
+        else:
+            self.error(c, sn, 'No such slave')
+            return
+
+        res = []
+        for k, v in sorted(s.link_stats.items()):
+            if v is not None:
+                res += [k, v]
+        self.ok(c, sn, *res)
+
+    @property
+    def alias(self):
+        return '/machine/slave/stats'
+
+    @property
+    def help_text(self):
+        return 'Link statistics of slave SERIALNUMBER as KEY VALUE pairs'
+
+    @property
+    def args(self):
+        return 'SERIALNUMBER'
+
+
 class SlaveMode(OscCommand, UnbufferedCommand):
 
     def execute(self, c):
@@ -110,3 +148,212 @@ class MachineGet(OscCommand, UnbufferedCommand):
     @property
     def alias(self):
         return '/machine/get'
+
+
+class MachineGetMany(OscCommand, UnbufferedCommand):
+    """
+    Get several KEYS at once. Reply carries, for each key in order, the key,
+    ok or error, and the value or the error message.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'ge', 1):
+            return
+
+        res = []
+        for k in c.args:
+            try:
+                res += [k, 'ok', self.machine[k]]
+            except Exception as e:
+                res += [k, 'error', str(e)]
+
+        self.ok(c, *res)
+
+    @property
+    def alias(self):
+        return '/machine/get_many'
+
+    @property
+    def help_text(self):
+        return 'Get values of KEYS, reply with KEY ok|error VALUE for each'
+
+    @property
+    def args(self):
+        return 'KEYS...'
+
+
+class MachineSetMany(OscCommand, UnbufferedCommand):
+    """
+    Set several KEY VALUE pairs at once. Reply carries, for each key in
+    order, the key, ok or error, and the value or the error message.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'ge', 2):
+            return
+        if len(c.args) % 2:
+            self.error(c, 'Expected KEY VALUE pairs for %s' % self.alias)
+            return
+
+        res = []
+        for k, v in zip(c.args[0::2], c.args[1::2]):
+            try:
+                self.machine[k] = v
+                res += [k, 'ok', v]
+            except Exception as e:
+                res += [k, 'error', str(e)]
+
+        self.ok(c, *res)
+
+    @property
+    def alias(self):
+        return '/machine/set_many'
+
+    @property
+    def help_text(self):
+        return 'Set KEY VALUE pairs, reply with KEY ok|error VALUE for each'
+
+    @property
+    def args(self):
+        return 'KEY VALUE...'
+
+
+class MachineMove(OscCommand, UnbufferedCommand):
+    """
+    Move through POSITIONS at VELOCITY with ACCELERATION, planned and
+    streamed by the motion unit. A JERK of 0 gives a trapezoidal profile.
+    Replies with the duration of the move.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'ge', 4):
+            return
+
+        try:
+            velocity, acceleration, jerk, *positions = [float(a) for a in c.args]
+            profile = self.machine.move(positions, velocity, acceleration,
+                                        jerk=jerk or None)
+            self.ok(c, profile.duration)
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/machine/move'
+
+    @property
+    def help_text(self):
+        return 'Move through POSITIONS, reply with the duration'
+
+    @property
+    def args(self):
+        return 'VELOCITY ACCELERATION JERK POSITIONS...'
+
+
+class MachineMoveCancel(OscCommand, UnbufferedCommand):
+    """
+    Stop streaming the current move. A streamed velocity is set back to 0,
+    a streamed position stays where it is.
+    """
+
+    def execute(self, c):
+        try:
+            self.machine.trajectories.cancel('machine')
+            self.ok(c)
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/machine/move/cancel'
+
+    @property
+    def help_text(self):
+        return 'Stop streaming the current move'
+
+
+class MachineMoveSync(OscCommand, UnbufferedCommand):
+    """
+    Move AXES (machine for the local one, or a slave serial number) to their
+    POSITION at VELOCITY with ACCELERATION, arriving together. Every axis
+    but the slowest is slowed down. Replies with the duration of the move.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'ge', 4):
+            return
+        if len(c.args) % 2:
+            self.error(c, 'Missing the position of {}'.format(c.args[-1]))
+            return
+
+        try:
+            velocity, acceleration = float(c.args[0]), float(c.args[1])
+            targets = {str(a): float(p) for a, p in zip(c.args[2::2], c.args[3::2])}
+            plan = self.machine.coordinator.move(targets, velocity, acceleration)
+            self.ok(c, plan.duration)
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/machine/move/sync'
+
+    @property
+    def help_text(self):
+        return 'Move axes together, reply with the duration'
+
+    @property
+    def args(self):
+        return 'VELOCITY ACCELERATION AXIS POSITION...'
+
+
+class MachineSubscribe(OscCommand, UnbufferedCommand):
+    """
+    Subscribe to KEYS at RATE (Hz). Changed values are pushed to the sender
+    on /machine/subscribe/data until the lease expires. Sending the command
+    again renews the lease.
+    """
+
+    def execute(self, c):
+        if not self.check_args(c, 'ge', 2):
+            return
+
+        try:
+            *keys, rate = c.args
+            lease = self.machine.telemetry.subscribe(c.sender, keys, rate)
+            self.ok(c, *(keys + [lease]))
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/machine/subscribe'
+
+    @property
+    def help_text(self):
+        return 'Push changes of KEYS at RATE (Hz) to sender'
+
+    @property
+    def args(self):
+        return 'KEYS... RATE'
+
+
+class MachineUnsubscribe(OscCommand, UnbufferedCommand):
+    """
+    Cancel the subscription of the sender.
+    """
+
+    def execute(self, c):
+        try:
+            self.machine.telemetry.unsubscribe(c.sender)
+            self.ok(c)
+        except Exception as e:
+            self.error(c, str(e))
+
+    @property
+    def alias(self):
+        return '/machine/unsubscribe'
+
+    @property
+    def help_text(self):
+        return 'Cancel the subscription of the sender'
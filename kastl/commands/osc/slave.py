@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import time
+
+from kastl.machines.clock import to_us, from_us
 
 from kastl.commands import UnbufferedCommand
 from kastl.commands import OscCommand
@@ -15,6 +18,7 @@ class SlaveCommand(OscCommand):
 
     def check_slave_mode(self, c, reply=True):
         if self.machine.slave_mode:
+            self.machine.heartbeat('master')
             return True
 
         if reply:
@@ -103,15 +107,164 @@ class SlaveSet(SlaveCommand, UnbufferedCommand):
         return '/slave/set'
 
 
+class SlaveGetMany(SlaveCommand, UnbufferedCommand):
+    """
+    Received by a slave. Reply with KEY ok|error VALUE for each key.
+    """
+
+    def execute(self, c):
+        if not self.check_slave_mode(c):
+            return
+
+        if not self.check_args(c, 'ge', 1):
+            return
+
+        uuid, *keys = c.args
+        res = []
+        for k in keys:
+            try:
+                res += [k, 'ok', self.machine[k]]
+            except Exception as e:
+                logging.error(repr(e))
+                res += [k, 'error', repr(e)]
+
+        self.ok(c, uuid, *res)
+
+    @property
+    def alias(self):
+        return '/slave/get_many'
+
+
+class SlaveSetMany(SlaveCommand, UnbufferedCommand):
+    """
+    Received by a slave. Reply with KEY ok|error VALUE for each pair.
+    """
+
+    def execute(self, c):
+        if not self.check_slave_mode(c):
+            return
+
+        if not self.check_args(c, 'ge', 2):
+            return
+
+        uuid, *args = c.args
+        if len(args) % 2:
+            self.error(c, uuid, 'Expected KEY VALUE pairs')
+            return
+
+        res = []
+        for k, v in zip(args[0::2], args[1::2]):
+            try:
+                self.machine[k] = v
+                res += [k, 'ok', v]
+            except Exception as e:
+                logging.error(repr(e))
+                res += [k, 'error', repr(e)]
+
+        self.ok(c, uuid, *res)
+
+    @property
+    def alias(self):
+        return '/slave/set_many'
+
+
+class SlaveSetAt(SlaveCommand, UnbufferedCommand):
+    """
+    Received by a slave: APPLY_AT KEY VALUE [KEY VALUE...], APPLY_AT in
+    microseconds of the slave clock. Reply with KEY ok|error VALUE for each
+    pair once scheduled.
+    """
+
+    def execute(self, c):
+        if not self.check_slave_mode(c):
+            return
+
+        if not self.check_args(c, 'ge', 3):
+            return
+
+        uuid, apply_at, *args = c.args
+        if len(args) % 2:
+            self.error(c, uuid, 'Expected KEY VALUE pairs')
+            return
+
+        self.ok(c, uuid, *schedule(self.machine, from_us(apply_at), args))
+
+    @property
+    def alias(self):
+        return '/slave/set_at'
+
+
+def schedule(machine, apply_at, args):
+    res = []
+    for k, v in zip(args[0::2], args[1::2]):
+        try:
+            machine.scheduler.schedule(apply_at, k, v)
+            res += [k, 'ok', v]
+        except Exception as e:
+            logging.error(repr(e))
+            res += [k, 'error', repr(e)]
+    return res
+
+
+class SlaveGroupSet(SlaveCommand, UnbufferedCommand):
+    """
+    Received by every slave of a group: SERIALNUMBER KEY VALUE [KEY VALUE...].
+    Only the slave with SERIALNUMBER applies the values, nothing is replied.
+    """
+
+    def execute(self, c):
+        if not c.args or c.args[0] != self.machine.serialnumber:
+            return
+
+        if not self.check_slave_mode(c, reply=False):
+            logging.warn('Group values received while not in slave mode')
+            return
+
+        sn, *args = c.args
+        for k, v in zip(args[0::2], args[1::2]):
+            try:
+                self.machine[k] = v
+            except Exception as e:
+                logging.error('Unable to set {} from group: {!r}'.format(k, e))
+
+    @property
+    def alias(self):
+        return '/slave/group/set'
+
+
+class SlaveGroupSetAt(SlaveCommand, UnbufferedCommand):
+    """
+    Same as /slave/group/set with SERIALNUMBER APPLY_AT KEY VALUE...
+    """
+
+    def execute(self, c):
+        if len(c.args) < 2 or c.args[0] != self.machine.serialnumber:
+            return
+
+        if not self.check_slave_mode(c, reply=False):
+            logging.warn('Group values received while not in slave mode')
+            return
+
+        sn, apply_at, *args = c.args
+        res = schedule(self.machine, from_us(apply_at), args)
+        for k, st, v in zip(res[0::3], res[1::3], res[2::3]):
+            if st != 'ok':
+                logging.error('Unable to schedule {} from group: {}'.format(k, v))
+
+    @property
+    def alias(self):
+        return '/slave/group/set_at'
+
+
 class SlaveRegister(SlaveCommand, UnbufferedCommand):
 
     def execute(self, c):
         if not self.check_args(c, 'le', 1):
             return
 
+        uuid = c.args[0]
         try:
             self.machine.set_operating_mode('slave')
-            uuid = c.args[0]
             self.ok(c, uuid)
         except Exception as e:
             self.error(c, uuid, e)
@@ -124,12 +277,13 @@ class SlaveRegister(SlaveCommand, UnbufferedCommand):
 class SlaveFree(SlaveCommand, UnbufferedCommand):
 
     def execute(self, c):
+        uuid = c.args[0]
         if not self.check_slave_mode(c, reply=False):
             self.error(c, uuid, 'Cannot free slave: Slave mode not activated')
+            return
 
         try:
             self.machine.set_operating_mode()
-            uuid = c.args[0]
             self.ok(c, uuid)
         except Exception as e:
             self.error(c, uuid, e)
@@ -139,6 +293,27 @@ class SlaveFree(SlaveCommand, UnbufferedCommand):
         return '/slave/free'
 
 
+class SlaveTime(OscCommand, UnbufferedCommand):
+    """
+    Clock exchange: reply T0 (echoed), receive and reply times, in
+    microseconds.
+    """
+
+    def execute(self, c):
+        t1 = to_us(time.time())
+        if len(c.args) != 2:
+            uuid = c.args[0] if c.args else 0
+            self.error(c, uuid, 'Expected T0')
+            return
+
+        uuid, t0 = c.args
+        self.ok(c, uuid, t0, t1, to_us(time.time()))
+
+    @property
+    def alias(self):
+        return '/slave/time'
+
+
 class SlavePing(OscCommand, UnbufferedCommand):
 
     def execute(self, c):
@@ -195,6 +370,48 @@ class SlaveSetError(SlaveResponse):
         return '/slave/set/error'
 
 
+class SlaveGetManyResponse(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/get_many/ok'
+
+
+class SlaveGetManyError(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/get_many/error'
+
+
+class SlaveSetManyResponse(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/set_many/ok'
+
+
+class SlaveSetManyError(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/set_many/error'
+
+
+class SlaveSetAtResponse(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/set_at/ok'
+
+
+class SlaveSetAtError(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/set_at/error'
+
+
+class SlaveTimeResponse(SlaveResponse):
+    @property
+    def alias(self):
+        return '/slave/time/ok'
+
+
 class SlavePingResponse(SlaveResponse):
     @property
     def alias(self):
@@ -54,6 +54,9 @@ __all__ = ['NoSectionError', 'NoOptionError', 'ParsingError', 'ConfigParserError
 
 parameter = namedtuple('parameter', ['vtype', 'unit', 'value'])
 
+# Shared by every parser so a revision is never reused, even across proxies
+_REVISIONS = itertools.count(1)
+
 
 class ConfigParserError(Error):
     pass
@@ -136,6 +139,36 @@ class AbstractConfigParser(configparser.ConfigParser):
                 logger.warn("Config file %s not found" % real_path_cfg)
 
         self._config_proxies = [None, None]
+        self._touch()
+
+    def _touch(self):
+        self._revision = next(_REVISIONS)
+
+    @property
+    def revision(self):
+        """
+        A number changing each time this config (or one of its loaded
+        variant and profile) is modified.
+        """
+        revisions = [p.revision for p in self._config_proxies if p is not None]
+        revisions.append(self._revision)
+        return max(revisions)
+
+    def read_file(self, *args, **kwargs):
+        super().read_file(*args, **kwargs)
+        self._touch()
+
+    def set(self, *args, **kwargs):
+        super().set(*args, **kwargs)
+        self._touch()
+
+    def remove_option(self, *args, **kwargs):
+        self._touch()
+        return super().remove_option(*args, **kwargs)
+
+    def remove_section(self, *args, **kwargs):
+        self._touch()
+        return super().remove_section(*args, **kwargs)
 
     def save(self, nfile=None):
         """
@@ -155,6 +188,16 @@ class AbstractConfigParser(configparser.ConfigParser):
         with open(save_to, 'w') as sfile:
             tmp_config.write(sfile)
 
+    def all_sections(self):
+        """
+        Return sections of this config and of its loaded variant and profile.
+        """
+        sections = self.sections()
+        for p in self._config_proxies or ():
+            if p is not None:
+                sections.extend(s for s in p.sections() if s not in sections)
+        return sections
+
     def dump(self):
         dump = {}
         for sec, opts in self.items():
@@ -331,6 +374,7 @@ class ConfigParser(AbstractConfigParser):
                 variant_config_file = os.path.join(_VARIANT_PATH, variant + ".conf")
 
             self._config_proxies[self.VARIANT_PRIORITY] = ProxyConfigParser(variant_config_file, variant)
+            self._touch()
 
             logger.info("Loaded variant config file: %s" % variant)
         except ParsingError as e:
@@ -363,6 +407,7 @@ class ConfigParser(AbstractConfigParser):
 
             self._config_proxies[self.PROFILE_PRIORITY] = ProxyConfigParser(profile_config_path, profile)
             self['server']['profile'] = profile
+            self._touch()
         except ParsingError as e:
             logger.warn("Couldn't load profile file {0}: {1!s}" % (self.profile_config_path, e))
 
@@ -372,6 +417,7 @@ class ConfigParser(AbstractConfigParser):
             del self._config_proxies[self.PROFILE_PRIORITY]
         except (IndexError, NoSectionError, NoOptionError):
             pass
+        self._touch()
 
     def dump_profile(self, profile=None):
         if not self.get('server', 'profile', fallback=profile):
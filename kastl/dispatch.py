@@ -8,46 +8,150 @@
 
 """
 Communication dispatcher
+
+Outgoing messages are put in a bounded queue per server and sent from a
+dedicated outlet thread, so command handlers, log handlers and remotes never
+wait on a transport.
 """
 
 import logging
-from threading import Event
+from threading import Event, Thread
+import queue
 
 from .async_utils import coroutine
-from .exceptions import AbstractErtzaException, AbstractErtzaFatalException
 
 logging = logging.getLogger('kastl.dispatch')
 
 
-class DispatcherException(AbstractErtzaException):
+class DispatcherException(Exception):
     pass
 
 
-class DispatcherFatalException(AbstractErtzaFatalException):
+class DispatcherFatalException(DispatcherException):
     pass
 
 
+class Outlet(object):
+    """
+    Outbound queue of a server.
+
+    Messages are sent in batches: every message waiting in the queue when the
+    outlet thread wakes up is handed to the server at once. Servers providing
+    send_messages() may then group them per destination.
+    """
+
+    def __init__(self, name, server, maxsize=256, batch_size=32):
+        self.name = name
+        self.server = server
+        self.batch_size = batch_size
+
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.sent = 0
+
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            raise DispatcherException('{} outlet already started'.format(self.name))
+
+        self._thread = Thread(target=self.loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+            if message.msg_type != 'log':
+                logging.error('{} outlet is full, message dropped: {!r}'.format(
+                    self.name, message))
+
+    def stop(self, timeout=1.0):
+        """
+        Stop the outlet once pending messages are sent (or timeout expired).
+        """
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def loop(self):
+        while True:
+            message = self.queue.get()
+
+            batch = []
+            stop = message is None
+            if not stop:
+                batch.append(message)
+
+            while len(batch) < self.batch_size:
+                try:
+                    message = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    stop = True
+                    continue
+                batch.append(message)
+
+            if batch:
+                self.send(batch)
+
+            if stop and self.queue.empty():
+                return
+
+    def send(self, batch):
+        try:
+            if len(batch) > 1 and hasattr(self.server, 'send_messages'):
+                self.server.send_messages(batch)
+            else:
+                for message in batch:
+                    self.server.send_message(message)
+            self.sent += len(batch)
+        except Exception as e:
+            logging.error('Error while sending to {} server: {!s}'.format(
+                self.name, e))
+
+    @property
+    def pending(self):
+        return self.queue.qsize()
+
+
 class Dispatcher(object):
     """
     Communication dispatcher
     """
-    def __init__(self):
+    def __init__(self, maxsize=256, batch_size=32):
         self._processors = {}
         self._servers = {}
+        self._outlets = {}
+
+        self.maxsize = maxsize
+        self.batch_size = batch_size
 
         self._running_event = Event()
 
-    def add_server(self, server):
-        if server.identifier in self._servers:
-            raise DispatcherException('{} server already exists'.format(server.identifier))
+    def add_server(self, server, identifier=None):
+        identifier = identifier or server.identifier
+        if identifier in self._servers:
+            raise DispatcherException('{} server already exists'.format(identifier))
 
-        self._servers[server.identifier] = server
+        self._servers[identifier] = server
+        self._outlets[identifier] = Outlet(identifier, server,
+                                           maxsize=self.maxsize,
+                                           batch_size=self.batch_size)
 
-    def add_processor(self, proc):
-        if proc.identifier in self._servers:
-            raise DispatcherException('{} processor already exists'.format(proc.identifier))
+    def add_processor(self, proc, identifier=None):
+        identifier = identifier or proc.identifier
+        if identifier in self._processors:
+            raise DispatcherException('{} processor already exists'.format(identifier))
 
-        self._processors[proc.identifier] = proc
+        self._processors[identifier] = proc
 
     def start(self):
         self._running_event.clear()
@@ -55,19 +159,33 @@ class Dispatcher(object):
         for name, server in self._servers.items():
             logging.debug('Starting {} server'.format(name))
             server.start()
+            self._outlets[name].start()
             logging.info('{} server started.'.format(name))
 
-        for name, proc in self._processors.items():
-            logging.debug('Starting {} processor'.format(name))
-            proc.start()
-            logging.info('{} processor started.'.format(name))
+    def send_message(self, message):
+        """
+        Queue message on the outlet of its protocol and return immediately.
+        """
+        if self._running_event.is_set():
+            raise DispatcherException('Dispatcher is stopped')
+
+        try:
+            outlet = self._outlets[message.protocol]
+        except KeyError:
+            raise DispatcherException('Unable to find {} server'.format(message.protocol))
+
+        outlet.put(message)
 
     def stop(self):
         self._running_event.set()
 
-    def exit(self):
+    def exit(self, timeout=1.0):
         self.stop()
 
+        for name, outlet in self._outlets.items():
+            logging.info('Draining {} outlet ({} pending).'.format(name, outlet.pending))
+            outlet.stop(timeout)
+
         for name, server in self._servers.items():
             logging.info('Stopping {} server.'.format(name))
             server.exit()
@@ -75,17 +193,14 @@ class Dispatcher(object):
     @coroutine
     def outlet(self, name):
         try:
-            server = self._servers[name]
+            outlet = self._outlets[name]
         except KeyError:
             raise DispatcherFatalException('Unable to find {} server'.format(name))
 
         while not self._running_event.is_set():
             try:
                 message = (yield)
-
-                server.send_message(message)
-            except AbstractErtzaException as e:
-                logging.error('Error while sending to {} server: {!s}'.format(name, e))
+                outlet.put(message)
             except StopIteration:
                 self._running_event.set()
                 break
@@ -101,7 +216,7 @@ class Dispatcher(object):
             try:
                 message = (yield)
                 proc.execute(message)
-            except AbstractErtzaException as e:
+            except DispatcherException as e:
                 logging.error(str(e))
             except StopIteration:
                 self._running_event.set()
@@ -114,3 +229,7 @@ class Dispatcher(object):
     @property
     def servers(self):
         return self._servers
+
+    @property
+    def outlets(self):
+        return self._outlets
@@ -2,13 +2,16 @@
 
 import liblo as lo
 import logging
+import itertools
+import time
 from threading import Thread
 from threading import Event
-from queue import Queue
-import uuid
+from queue import Queue, Empty
 
 from .abstract_driver import AbstractDriver, AbstractDriverError, AbstractTimeoutError
 from ..processors.osc import OscAddress, OscMessage
+from ..futures import FutureRegistry
+from ..machines.clock import to_us
 
 logging = logging.getLogger('kastl.driver.osc')
 
@@ -31,11 +34,31 @@ class OscDriver(AbstractDriver):
         self.running = Event()
         self.timeout = config.get('timeout', 0.25)
 
-        self._waiting_futures = []
+        # Requests carry a per-connection sequence number as first argument,
+        # echoed by the slave in its reply.
+        self._sequence = itertools.count(1)
+        self._waiting_futures = FutureRegistry(timeout=self.timeout,
+                                               exception=OscDriverTimeout)
 
         self.queue = Queue(maxsize=45)
+        self.reactor = None
+
+    def init_queue(self):
+        return self.queue
+
+    def attach(self, reactor):
+        """
+        Handle replies and timeouts in reactor instead of a thread of its
+        own. Return the new inlet for replies.
+        """
+        self.reactor = reactor
+        self.queue = ReactorInlet(reactor, self._handle_reply)
+        return self.queue
 
     def connect(self):
+        if self.reactor is not None:
+            return
+
         self._thread = Thread(target=self.from_machine)
         self._thread.daemon = True
         self._thread.start()
@@ -68,56 +91,52 @@ class OscDriver(AbstractDriver):
     def message(self, *args, **kwargs):
         return OscMessage(*args, receiver=self.target, **kwargs)
 
-    def ping(self):
-        m = self.message('/slave/ping')
-        fut = self.to_machine(m)
-        reply = None
-        try:
-            reply = self.wait_for_future(fut)
-            return reply
-        except OscDriverTimeout as e:
-            logging.error(e)
-            return reply, e
-
-    def to_machine(self, request, uid=None):
+    def ping(self, **kwargs):
+        return self._request('/slave/ping', **kwargs)
+
+    def set_timeout(self, timeout):
+        "Timeout of requests sent from now on"
+        self.timeout = timeout
+        self._waiting_futures.timeout = timeout
+
+    def next_uid(self):
+        "Return the next correlation id (fits in an OSC int32)"
+        return next(self._sequence) & 0x7fffffff
+
+    def to_machine(self, request, uid=None, callback=None):
+        if uid is None:
+            uid = self.next_uid()
+        event = Event()
+        future = OscFutureResult(uid)
+        future.set_callback(callback or self.done_cb)
+        future.set_event(event)
+        self._waiting_futures.add(future, request.path, uid=uid)
         try:
-            if not uid:
-                uid = uuid.uuid4().hex
-            event = Event()
-            future = OscFutureResult(uid)
-            future.set_callback(self.done_cb)
-            future.set_event(event)
-            self._waiting_futures.append(future)
             self._send(request, uid)
-            return future
-        except:
+        except OscDriverError:
+            self._waiting_futures.pop(uid=uid)
             raise
+        if self.reactor is not None:
+            self.reactor.call_later(self.timeout, self._expire)
+        return future
 
     def from_machine(self):
         while not self.running.is_set():
             try:
-                recv_item = self.queue.get(block=True)
-
-                future = None
-                for i, f in enumerate(self._waiting_futures):
-                    if recv_item == f:
-                        future = f
-                        f_id = i
-                        break
-
-                if not future:
-                    logging.error('Unable to find waiting future '
-                                  'for %s' % str(f))
+                now = time.time()
+                self._waiting_futures.expire(now)
+                deadline = self._waiting_futures.next_deadline()
+                timeout = self.timeout if deadline is None else \
+                    min(max(deadline - now, 0), self.timeout)
+                try:
+                    recv_item = self.queue.get(block=True, timeout=timeout)
+                except Empty:
                     continue
 
-                del self._waiting_futures[f_id]
-
-                if self._check_error(recv_item):
-                    future.set_result((recv_item, OscDriverError(str(recv_item))))
-                else:
-                    future.set_result(recv_item)
-
-                self.queue.task_done()
+                try:
+                    self._handle_reply(recv_item)
+                finally:
+                    self.queue.task_done()
             except OscDriverTimeout as e:
                 logging.error('Timeout in %s: %s' % (self.__class__.__name__,
                                                      repr(e)))
@@ -125,6 +144,23 @@ class OscDriver(AbstractDriver):
                 logging.error('Exception in %s: %s' % (self.__class__.__name__,
                                                        repr(e)))
 
+    def _handle_reply(self, recv_item):
+        uid = recv_item.args[0] if recv_item.args else None
+        future = self._waiting_futures.pop(uid=uid)
+
+        if not future:
+            logging.error('Unable to find waiting future '
+                          'for %s' % str(recv_item))
+            return
+
+        if self._check_error(recv_item):
+            future.set_result((recv_item, OscDriverError(str(recv_item))))
+        else:
+            future.set_result(recv_item)
+
+    def _expire(self):
+        self._waiting_futures.expire(time.time())
+
     def done_cb(self, *args):
         pass
 
@@ -135,7 +171,7 @@ class OscDriver(AbstractDriver):
 
     def get(self, key, **kwargs):
         m = self.message('/slave/get', key)
-        fut = self.to_machine(m)
+        fut = self.to_machine(m, callback=kwargs.get('callback'))
         try:
             if kwargs.get('block', True):
                 ret = self.wait_for_future(fut)
@@ -150,7 +186,7 @@ class OscDriver(AbstractDriver):
 
     def set(self, key, *args, **kwargs):
         m = self.message('/slave/set', key, *args)
-        fut = self.to_machine(m)
+        fut = self.to_machine(m, callback=kwargs.get('callback'))
         try:
             if kwargs.get('block', True):
                 ret = self.wait_for_future(fut)
@@ -163,25 +199,87 @@ class OscDriver(AbstractDriver):
         except OscDriverError as e:
             logging.error(e)
 
+    def get_many(self, *keys, **kwargs):
+        return self._request('/slave/get_many', *keys, **kwargs)
+
+    def set_many(self, *pairs, **kwargs):
+        return self._request('/slave/set_many', *pairs, **kwargs)
+
+    def set_many_at(self, apply_at, *pairs, **kwargs):
+        "apply_at is in slave clock, as integer microseconds"
+        return self._request('/slave/set_at', apply_at, *pairs, **kwargs)
+
+    def get_time(self, **kwargs):
+        """
+        Clock exchange: the reply carries the send time of the request (t0)
+        and the slave receive and reply times (t1, t2), in microseconds.
+        """
+        return self._request('/slave/time', to_us(time.time()), **kwargs)
+
+    def _request(self, path, *args, **kwargs):
+        m = self.message(path, *args)
+        fut = self.to_machine(m, callback=kwargs.get('callback'))
+        try:
+            if kwargs.get('block', True):
+                return self.wait_for_future(fut)
+            return fut
+        except OscDriverTimeout as e:
+            logging.error(e)
+            raise e
+        except OscDriverError as e:
+            logging.error(e)
+
     def __getitem__(self, key):
         return self.get(key)
 
     def __setitem__(self, key, *args):
         return self.set(key, *args)
 
-    def _send(self, message, *args, **kwargs):
+    def _send(self, message, uid=None, **kwargs):
         try:
-            m = self.message(message.path, *message.args)
+            if uid is not None:
+                m = self.message(message.path, uid, *message.args)
+            else:
+                m = self.message(message.path, *message.args)
             m.receiver = self.target
             lo.send((m.receiver.hostname, m.receiver.port), m.message)
         except OSError as e:
             raise OscDriverError(str(e))
 
+    def send_bundle(self, messages):
+        """
+        Send messages to target in a single bundle, without waiting for
+        any reply.
+        """
+        try:
+            bundle = lo.Bundle(*[m.to_message() for m in messages])
+            lo.send((self.target.hostname, self.target.port), bundle)
+        except OSError as e:
+            raise OscDriverError(str(e))
+
     def _check_error(self, command):
         if command.path.endswith('/error'):
             return True
 
 
+class ReactorInlet(object):
+    """
+    Queue-like inlet handing each reply to the reactor.
+    """
+
+    def __init__(self, reactor, handler):
+        self._reactor = reactor
+        self._handler = handler
+
+    def put(self, item, block=True, timeout=None):
+        self._reactor.call_soon(self._handler, item)
+
+    put_nowait = put
+
+    def task_done(self):
+        pass
+
+
 class OscFutureResult(object):
     def __init__(self, uid):
         self._callback = None
@@ -219,6 +317,21 @@ class OscFutureResult(object):
         if self._callback:
             self._callback(self)
 
+    def set_exception(self, exception):
+        self._exception = exception
+        self.event.set()
+
+        if self._callback:
+            self._callback(self)
+
+    @property
+    def exception(self):
+        return self._exception
+
+    @property
+    def raw_result(self):
+        return self._result
+
     @property
     def result(self):
         if self._exception:
@@ -13,12 +13,15 @@ Filters are used to dispatch incoming messages
 """
 
 import logging
+from heapq import merge
 
 logging = logging.getLogger('kastl.filter')
 
 
 class Filter(object):
     def __init__(self, *args, **kwargs):
+        self.order = None       # Registration order, set by FilterIndex
+
         self.is_exclusive = kwargs.pop('exclusive', False)
 
         if 'target' in kwargs and 'targets' in kwargs:
@@ -67,3 +70,130 @@ class Filter(object):
         filters = ' '.join([str(x) for x in spec])
         return '%s: %s' % (self.__class__.__name__, filters)
 
+
+
+class _AliasTrie(object):
+    """
+    Character trie of alias masks.
+
+    Each node holds the filters whose mask ends at this node, so walking the
+    command string yields every filter whose mask is a prefix of it.
+    """
+
+    __slots__ = ('children', 'filters')
+
+    def __init__(self):
+        self.children = {}
+        self.filters = []
+
+    def add(self, mask, new_filter):
+        node = self
+        for c in mask:
+            node = node.children.setdefault(c, _AliasTrie())
+        node.filters.append(new_filter)
+
+    def lookup(self, command):
+        """
+        Return a list of filter lists, one per matching mask.
+        """
+        found = []
+        if self.filters:
+            found.append(self.filters)
+
+        node = self
+        for c in command:
+            node = node.children.get(c)
+            if node is None:
+                break
+            if node.filters:
+                found.append(node.filters)
+
+        return found
+
+
+class FilterIndex(object):
+    """
+    Compiled filter index
+
+    Filters are bucketed by protocol and sender, then by alias mask in a
+    trie. Matching a message only visits the four (protocol, sender) buckets
+    that may apply to it instead of every registered filter. Matching filters
+    are yielded in registration order so exclusive filters keep their
+    meaning.
+    """
+
+    def __init__(self):
+        self._filters = list()
+        self._buckets = {}
+        self._protocols = {}
+
+    def add(self, new_filter):
+        if not isinstance(new_filter, Filter):
+            raise TypeError('Unexpected type %s for new_filter'
+                            % type(new_filter))
+
+        new_filter.order = len(self._filters)
+        self._filters.append(new_filter)
+
+        key = (new_filter.protocol, new_filter.sender)
+        try:
+            trie = self._buckets[key]
+        except KeyError:
+            trie = self._buckets[key] = _AliasTrie()
+
+        trie.add(new_filter.alias_mask or '', new_filter)
+
+    append = add
+
+    def candidates(self, message):
+        """
+        Return filters that may accept message, in registration order.
+
+        Protocol, sender and alias mask are already checked by the index.
+        """
+        try:
+            protocol = self._protocols[message.protocol]
+        except KeyError:
+            protocol = self._protocols[message.protocol] = message.protocol.upper()
+
+        if message.sender is not None:
+            sender = message.sender.hostname
+            keys = ((protocol, sender), (protocol, None),
+                    ('', sender), ('', None))
+        else:
+            keys = ((protocol, None), ('', None))
+
+        lists = []
+        command = None
+        for key in keys:
+            trie = self._buckets.get(key)
+            if trie is None:
+                continue
+            if command is None:
+                command = message.command
+            lists.extend(trie.lookup(command))
+
+        if not lists:
+            return ()
+        if len(lists) == 1:
+            return lists[0]
+        return merge(*lists, key=lambda f: f.order)
+
+    def match(self, message):
+        """
+        Yield filters accepting message, in registration order.
+        """
+        nargs = None
+        for f in self.candidates(message):
+            if f.args_length is not None:
+                if nargs is None:
+                    nargs = len(message.args)
+                if nargs != f.args_length:
+                    continue
+            yield f
+
+    def __iter__(self):
+        return iter(self._filters)
+
+    def __len__(self):
+        return len(self._filters)
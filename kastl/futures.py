@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pending request registry
+
+Futures waiting for a reply are indexed by uid and, for replies that don't
+carry one, by request path in sending order. Deadlines are kept in a heap so
+futures whose reply never comes are failed and freed.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from threading import Lock
+
+logging = logging.getLogger('kastl.futures')
+
+REPLY_SUFFIXES = ('ok', 'error', 'reply')
+
+
+class FutureTimeout(Exception):
+    pass
+
+
+def request_path(path, sep='/'):
+    """
+    Return the request path of a reply path (strip /ok, /error or /reply).
+    """
+    head, _, last = path.rpartition(sep)
+    if head and last in REPLY_SUFFIXES:
+        return head
+    return path
+
+
+class FutureRegistry(object):
+    def __init__(self, timeout=1.0, exception=FutureTimeout):
+        self.timeout = timeout
+        self.exception = exception
+
+        self._by_uid = {}
+        self._by_path = {}
+        self._deadlines = []
+        self._pending = set()
+        self._counter = itertools.count()
+        self._lock = Lock()
+
+    def add(self, future, path, uid=None, timeout=None, now=None):
+        """
+        Register future, waiting for a reply to path (or with uid).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = (time.time() if now is None else now) + timeout
+
+        with self._lock:
+            if uid is not None:
+                if uid in self._by_uid:
+                    raise ValueError('A future is already waiting for %s' % uid)
+                self._by_uid[uid] = future
+            else:
+                try:
+                    self._by_path[path].append(future)
+                except KeyError:
+                    self._by_path[path] = deque((future,))
+
+            self._pending.add(id(future))
+            heapq.heappush(self._deadlines,
+                           (deadline, next(self._counter), future, path, uid))
+
+        return future
+
+    def pop(self, path=None, uid=None):
+        """
+        Remove and return the future matching uid, or else the oldest future
+        waiting on path. Return None if nothing matches.
+        """
+        with self._lock:
+            if uid is not None:
+                future = self._by_uid.pop(uid, None)
+                if future is not None:
+                    self._pending.discard(id(future))
+                    return future
+
+            if path is None:
+                return None
+
+            path = request_path(path)
+            futures = self._by_path.get(path)
+            if not futures:
+                return None
+
+            future = futures.popleft()
+            if not futures:
+                del self._by_path[path]
+            self._pending.discard(id(future))
+            return future
+
+    def pop_reply(self, msg):
+        uid = msg.uid or None
+        return self.pop(msg.path, uid=uid)
+
+    def expire(self, now):
+        """
+        Fail futures whose deadline is over. Return the expired futures.
+        """
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, _, future, path, uid = heapq.heappop(self._deadlines)
+                if not self._discard(future, path, uid):
+                    continue    # Already answered
+                expired.append(future)
+
+        for future in expired:
+            try:
+                future.set_exception(self.exception('Timeout in %r' % future))
+            except Exception as e:
+                logging.error('Unable to expire %r: %s', future, e)
+
+        return expired
+
+    def next_deadline(self):
+        with self._lock:
+            while self._deadlines:
+                deadline, _, future, path, uid = self._deadlines[0]
+                if id(future) in self._pending:
+                    return deadline
+                heapq.heappop(self._deadlines)
+        return None
+
+    def _discard(self, future, path, uid):
+        if id(future) not in self._pending:
+            return False
+        self._pending.discard(id(future))
+
+        if uid is not None:
+            if self._by_uid.get(uid) is not future:
+                return False
+            del self._by_uid[uid]
+            return True
+
+        futures = self._by_path.get(path)
+        if not futures:
+            return False
+
+        if futures[0] is future:    # Oldest is the usual case
+            futures.popleft()
+        else:
+            try:
+                futures.remove(future)
+            except ValueError:
+                return False
+
+        if not futures:
+            del self._by_path[path]
+        return True
+
+    def __len__(self):
+        return len(self._pending)
@@ -14,12 +14,14 @@ import queue
 
 from .configparser import ConfigParser, ProfileError
 from .motion import MotionUnit, MotionError
+from .dispatch import Dispatcher
 
 from .processors import OscProcessor, SerialProcessor
 
 from .processors.osc.server import OscServer
 from .processors.serial.server import SerialServer
 from .processors.serial.message import SerialCommandString
+from .transport import TransportProcess
 
 from .pwm import PWM
 from .thermistor import Thermistor
@@ -146,18 +148,40 @@ class Kastl(object):
         # Create queue of commands
         self.mu.commands = JoinableQueue(20)
 
+        self.mu.dispatcher = Dispatcher(
+            maxsize=self.mu.config.getint('dispatch', 'queue_size', fallback=256),
+            batch_size=self.mu.config.getint('dispatch', 'batch_size', fallback=32))
+
         if not self.mu.config.get('osc', 'disable', fallback=False):
             self.mu.processors['OSC'] = OscProcessor(self.mu)
-            self.mu.comms['OSC'] = OscServer(self.mu)
 
         if not self.mu.config.get('serial', 'disable', fallback=False):
             self.mu.processors['Serial'] = SerialProcessor(self.mu)
-            self.mu.comms['Serial'] = SerialServer(self.mu)
+
+        # Transports either run in a process of their own, or as threads
+        self.transport = None
+        if self.mu.config.getboolean('transport', 'process', fallback=False):
+            self.transport = TransportProcess(self.mu, self.mu.processors.keys(),
+                                              **dict(self.mu.config['transport']))
+            self.mu.comms.update(self.transport.proxies)
+        else:
+            if 'OSC' in self.mu.processors:
+                self.mu.comms['OSC'] = OscServer(self.mu)
+            if 'Serial' in self.mu.processors:
+                self.mu.comms['Serial'] = SerialServer(self.mu)
+
+        for name, comm in self.mu.comms.items():
+            self.mu.dispatcher.add_server(comm, name)
+            self.mu.dispatcher.add_processor(self.mu.processors[name], name)
 
     def start(self):
         """ Start the processes """
         self.running = True
 
+        if self.transport:
+            # Fork before the motion unit and dispatcher start their threads
+            self.transport.start()
+
         # Start the processes
         commands_thread = Thread(target=self.loop,
                                  args=(self.mu.commands, "command"))
@@ -165,8 +189,8 @@ class Kastl(object):
         commands_thread.deamon = True
         commands_thread.start()
 
-        for name, comm in self.mu.comms.items():
-            comm.start()
+        self.mu.dispatcher.start()
+        for name in self.mu.comms.keys():
             logger.info("%s communication module started" % name)
 
         self.mu.start()
@@ -211,6 +235,9 @@ class Kastl(object):
 
         self.running = False
 
+        logger.info('Sending pending messages')
+        self.mu.dispatcher.exit()
+
         for f in self.mu.fans:
             f.set_value(0)
 
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Telemetry cache
+
+Values read from the drive are kept for a short time (per key TTL) so every
+reader (slaves, remotes, OSC and serial commands, telemetry) shares the same
+reads. Concurrent readers of an expired key wait for a single drive read.
+Static keys never expire: they are written through when set.
+"""
+
+import logging
+import time
+import weakref
+from threading import Event, Lock
+
+logging = logging.getLogger('kastl.machine.cache')
+
+
+class TelemetryCacheError(Exception):
+    pass
+
+
+class _Entry(object):
+    __slots__ = ('value', 'expires')
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+
+
+class _Flight(object):
+    """
+    A drive read in progress, waited for by concurrent readers.
+    """
+
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = Event()
+        self.value = None
+        self.error = None
+
+
+class TelemetryCache(object):
+    def __init__(self, reader, ttl=0.03, ttls=None, static_keys=()):
+        self.reader = reader
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.static_keys = set(static_keys)
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.errors = 0
+
+        self._entries = {}
+        self._flights = {}
+        self._listeners = []
+        self._lock = Lock()
+
+    def configure(self, ttl=None, **kwargs):
+        """
+        Set TTLs from a config section: ttl is the default TTL, <key>_ttl
+        the TTL of key (with ':' written as '.').
+        """
+        if ttl is not None:
+            self.ttl = float(ttl)
+
+        for opt, v in kwargs.items():
+            if not opt.endswith('_ttl'):
+                continue
+            self.ttls[opt[:-len('_ttl')].replace('.', ':')] = float(v)
+
+    def add_static_keys(self, keys):
+        self.static_keys.update(keys)
+
+    def add_listener(self, callback):
+        """
+        Call callback(key, value) each time a read returns a new value.
+        Bound methods are weakly referenced.
+        """
+        try:
+            ref = weakref.WeakMethod(callback)
+        except TypeError:
+            ref = lambda: callback
+        with self._lock:
+            self._listeners.append(ref)
+
+    def remove_listener(self, callback):
+        "Stop calling callback, added by add_listener"
+        with self._lock:
+            self._listeners = [r for r in self._listeners
+                               if r() is not None and r() != callback]
+
+    def key_ttl(self, key):
+        "TTL of key, None if it never expires"
+        if key in self.static_keys:
+            return None
+        return self.ttls.get(key, self.ttl)
+
+    def get(self, key, block=True):
+        """
+        Return key, read if expired. Unless block, raise TelemetryCacheError
+        rather than wait for a read of key by another thread.
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires is None or entry.expires > now):
+                self.hits += 1
+                return entry.value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.waits += 1
+
+        if not leader:
+            if not block:
+                raise TelemetryCacheError('{} is being read'.format(key))
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = self.reader(key)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._flights[key]
+            flight.error = e
+            flight.event.set()
+            raise
+
+        old = self._store(key, value, time.time())
+        with self._lock:
+            del self._flights[key]
+        flight.value = value
+        flight.event.set()
+
+        if old is not None and old.value != value:
+            self._notify(key, value)
+
+        return value
+
+    def put(self, key, value):
+        "Write value through, as if it was just read."
+        self._store(key, value, time.time())
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def peek(self, key, default=None):
+        "Return the cached value of key, even if expired, without reading it."
+        entry = self._entries.get(key)
+        return default if entry is None else entry.value
+
+    def _store(self, key, value, now):
+        ttl = self.key_ttl(key)
+        with self._lock:
+            old = self._entries.get(key)
+            self._entries[key] = _Entry(value, None if ttl is None else now + ttl)
+        return old
+
+    def _notify(self, key, value):
+        with self._lock:
+            self._listeners = [r for r in self._listeners if r() is not None]
+            listeners = [r() for r in self._listeners]
+
+        for cb in listeners:
+            if cb is None:
+                continue
+            try:
+                cb(key, value)
+            except Exception as e:
+                logging.exception('Error in cache listener for {}: {!s}'.format(key, e))
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'errors': self.errors,
+            'size': len(self._entries),
+        }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_status(local_status, cache, key, block=True):
+    """
+    Return key ('machine.velocity' form) from local_status, calling it if
+    it is callable, or else read it through cache (see TelemetryCache.get
+    for block). Shared by remotes, feedback and status publishing.
+    """
+    try:
+        v = local_status[key]
+    except KeyError:
+        if cache is None:
+            raise
+        nk = key[len('machine.'):] if key.startswith('machine.') else key
+        return cache.get(nk, block=block)
+
+    return v() if callable(v) else v
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Clock offset estimation between two nodes
+
+Each exchange gives four timestamps, NTP style: t0 request sent (local),
+t1 request received (remote), t2 reply sent (remote) and t3 reply received
+(local). Exchanges with the shortest round trip are the least affected by
+network jitter, so the offset is taken from those, and the drift from the
+trend of offsets over the window.
+"""
+
+import logging
+from collections import deque, namedtuple
+from threading import Lock
+
+logging = logging.getLogger('kastl.machine.clock')
+
+ClockSample = namedtuple('ClockSample', ('time', 'offset', 'delay'))
+
+# Timestamps are exchanged as integer microseconds: OSC floats are single
+# precision, not enough for epoch times.
+US = 1000000
+
+
+def to_us(t):
+    return int(round(t * US))
+
+
+def from_us(t):
+    return t / US
+
+
+class ClockError(Exception):
+    pass
+
+
+class ClockEstimator(object):
+    def __init__(self, window=16):
+        self._samples = deque(maxlen=window)
+        self._lock = Lock()
+
+        self._ref = None
+        self.drift = 0.0
+
+    def add(self, t0, t1, t2, t3):
+        """
+        Add an exchange (in seconds) and return its sample.
+        """
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        delay = max((t3 - t0) - (t2 - t1), 0)
+        sample = ClockSample(t3, offset, delay)
+
+        with self._lock:
+            self._samples.append(sample)
+            self._update()
+
+        return sample
+
+    def _update(self):
+        samples = sorted(self._samples, key=lambda s: s.delay)
+        best = samples[:max(len(samples) // 2, 1)]
+        self._ref = max(best, key=lambda s: s.time)
+
+        if len(best) < 2:
+            self.drift = 0.0
+            return
+
+        # Least squares slope of offsets over time
+        n = len(best)
+        mt = sum(s.time for s in best) / n
+        mo = sum(s.offset for s in best) / n
+        var = sum((s.time - mt) ** 2 for s in best)
+        if var <= 0:
+            self.drift = 0.0
+            return
+        self.drift = sum((s.time - mt) * (s.offset - mo) for s in best) / var
+
+    def offset_at(self, t):
+        """
+        Remote clock minus local clock at local time t.
+        """
+        ref = self._ref
+        if ref is None:
+            raise ClockError('Clock not synchronized')
+        return ref.offset + self.drift * (t - ref.time)
+
+    def to_remote(self, t):
+        return t + self.offset_at(t)
+
+    def to_local(self, t):
+        return t - self.offset_at(t)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._ref = None
+            self.drift = 0.0
+
+    @property
+    def synchronized(self):
+        return self._ref is not None
+
+    @property
+    def offset(self):
+        return self._ref.offset if self._ref else None
+
+    @property
+    def delay(self):
+        return self._ref.delay if self._ref else None
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __repr__(self):
+        if not self.synchronized:
+            return '{0.__class__.__name__}: not synchronized'.format(self)
+        return '{0.__class__.__name__}: offset {1:+.6f}s, drift {2:+.3g}, delay {3:.6f}s'.format(
+            self, self.offset, self.drift, self.delay)
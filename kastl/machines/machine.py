@@ -27,6 +27,7 @@ from .slave import Slave, SlaveMachine
 from .slave import SlaveMachineError, FatalSlaveMachineError, SlaveRequest
 
 from ..drivers.utils import retry
+from ..futures import FutureRegistry
 
 from ..configparser import parameter as _p
 from ..configparser import _ChainMap as ChainMap
@@ -38,6 +39,8 @@ OPERATING_MODES = ('standalone', 'master', 'slave')
 
 
 class OscMachine(AbstractMachine):
+    PUSH_PATH = '/machine/subscribe/data'
+
     def __init__(self, *args, **kwargs):
         super().__init__()
 
@@ -60,16 +63,22 @@ class OscMachine(AbstractMachine):
         except KeyError as e:
             logging.error('No such control mode: %s', e)
 
-        self.waiting_futures = list()
+        self.waiting_futures = FutureRegistry(exception=MachineCommunicationTimeout)
         self.driver = None
         self.refresh_interval = 0.25
 
         self._comms_thread = None
         self._machine_thread = None
 
+        # With a reactor, messages and machine logic are handled in its thread
+        self.reactor = None
+        self._machine_timer = None
+
         self._local_status = dict()
         self._local_requests = dict()
 
+        self._subscription_renew_time = 0
+
         self.last_command_time = time.time()
 
         self.init_communication()
@@ -98,9 +107,10 @@ class OscMachine(AbstractMachine):
 
     init_driver = init_communication
 
-    def start(self):
+    def start(self, reactor=None):
         "Starts the underlying mechanism."
 
+        self.reactor = reactor
         if self.connect():
             self.send_configuration()
 
@@ -110,9 +120,10 @@ class OscMachine(AbstractMachine):
         and variant.
         """
 
-        self._comms_thread = Thread(target=self._communication_loop)
-        self._comms_thread.daemon = True
-        self._comms_thread.start()
+        if self.reactor is None:
+            self._comms_thread = Thread(target=self._communication_loop)
+            self._comms_thread.daemon = True
+            self._comms_thread.start()
 
         try:
 
@@ -137,6 +148,10 @@ class OscMachine(AbstractMachine):
         except MachineCommunicationTimeout as e:
             logging.error('Node unreachable')
 
+        if self.reactor is not None:
+            self.reactor.call_soon(self._machine_tick)
+            return
+
         self._machine_thread = Thread(target=self._machine_loop)
         self._machine_thread.daemon = True
         self._machine_thread.start()
@@ -155,12 +170,20 @@ class OscMachine(AbstractMachine):
         "Close the communication and delete the driver"
 
         self.running_ev.set()
-        self._machine_thread.join()
-        self._comms_thread.join()
+        if self._machine_timer is not None:
+            self._machine_timer.cancel()
+        if self._machine_thread:
+            self._machine_thread.join()
+        if self._comms_thread:
+            self._comms_thread.join()
         del self.driver
 
     def handle(self, message, **kwargs):
         "Handle an incoming message."
+        if self.reactor is not None:
+            self.reactor.call_soon(self._handle_message, message)
+            return
+
         try:
             self.messages_queue.put(message, block=False)
         except queue.Full as e:
@@ -168,54 +191,102 @@ class OscMachine(AbstractMachine):
             logging.error(str(fe))
             raise fe
 
-    def find_matching_future(self, msg, delete=True):
-        future = None
-        findex = None
-
-        if msg.uid: # Find by UUID
-            for i, f in enumerate(self.waiting_futures):
-                if msg == f:
-                    future = f
-                    findex = i
-                    break
-        else: # Find by path
-            p = msg.path
-            if p.endswith('/ok') or \
-                    p.endswith('/error') or \
-                    p.endswith('/reply'):
-                p = '/'.join(p.split('/')[:-1])
-
-            for i, f in enumerate(self.waiting_futures):
-                if p == f.request.path:
-                    future = f
-                    findex = i
-                    break
-
-        del self.waiting_futures[findex]
-        return future
+    def find_matching_future(self, msg):
+        """
+        Return the future waiting for msg (by uid, or else the oldest one
+        sent on the same path), or None.
+        """
+        return self.waiting_futures.pop_reply(msg)
 
     def send_local_requests(self):
-        for k in self._local_requests.keys():
-            v = self._local_status.pop(k)
-            self.send_machine_var(k, v)
+        if not self._local_requests:
+            return
 
-    def update_local_status(self):
-        self.request_machine_var('machine:error_code')
-        self.request_machine_var('machine:status')
+        requests, self._local_requests = self._local_requests, dict()
+        pairs = [a for kv in requests.items() for a in kv]
+        f = self.send('/machine/set_many', *pairs)
+        f.set_callback(self.update_machine_vars)
+
+    def status_keys(self):
+        "Keys mirrored in local status for the current control mode"
+
+        keys = ('machine:error_code', 'machine:status')
 
         if self.control_mode == ControlMode.Velocity:
-            self.request_machine_var('machine:velocity')
-            self.request_machine_var('machine:acceleration')
-            self.request_machine_var('machine:deceleration')
+            keys += ('machine:velocity', 'machine:acceleration',
+                     'machine:deceleration')
         elif self.control_mode == ControlMode.Torque:
-            self.request_machine_var('machine:velocity')
-            self.request_machine_var('machine:torque_rise_time')
-            self.request_machine_var('machine:torque_fall_time')
+            keys += ('machine:velocity', 'machine:torque_rise_time',
+                     'machine:torque_fall_time')
         elif self.control_mode == ControlMode.Position:
-            self.request_machine_var('machine:velocity')
-            self.request_machine_var('machine:position')
-            self.request_machine_var('machine:acceleration')
-            self.request_machine_var('machine:deceleration')
+            keys += ('machine:velocity', 'machine:position',
+                     'machine:acceleration', 'machine:deceleration')
+
+        return keys
+
+    def update_local_status(self):
+        f = self.send('/machine/get_many', *self.status_keys())
+        f.set_callback(self.update_machine_vars)
+
+    def subscribe_status(self):
+        """
+        Ask the machine to push status keys changes instead of polling them.
+        """
+
+        rate = 1 / self.refresh_interval
+        f = self.send('/machine/subscribe', *(self.status_keys() + (rate,)))
+        f.set_callback(self.update_subscription)
+
+    def update_subscription(self, f):
+        if f.result.is_error:
+            logging.warn('Subscription refused by %s: %s', self.serialnumber,
+                         ' '.join(map(str, f.result.args)))
+            return
+
+        lease = float(f.result.args[-1])
+        # Renew at half lease to avoid gaps in pushed data
+        self._subscription_renew_time = time.time() + lease / 2
+
+    def update_pushed_status(self, msg):
+        args = msg.args
+        for k, v in zip(args[0::2], args[1::2]):
+            self._local_status[k] = v
+
+    def read(self, key):
+        """
+        Return key from local status, or else ask the machine for it and
+        wait for the reply. Replies are handled by the reactor, so it may not
+        wait in the reactor thread.
+        """
+        try:
+            return self._local_status[key]
+        except KeyError:
+            pass
+
+        if self.reactor is not None and self.reactor.in_reactor():
+            raise MachineError('Unable to wait for {} from {} in the reactor'.format(
+                key, self.serialnumber))
+
+        result = self.wait_for_reply(self.send('/machine/get', key))
+        if result.is_error:
+            raise MachineError('Unable to get {} from {}: {}'.format(
+                key, self.serialnumber, ' '.join(map(str, result.args))))
+        return result.args[1]
+
+    def set_now(self, key, value):
+        """
+        Send key to the machine right away, instead of at the next step. A
+        request of key waiting for the next step is dropped.
+        """
+        self._local_requests.pop(key, None)
+        self.send('/machine/set', key, value, reply_expected=False)
+
+    def set_many_now(self, values):
+        "Send values, a list of (key, value), right away in one message"
+        for key, value in values:
+            self._local_requests.pop(key, None)
+        pairs = [a for kv in values for a in kv]
+        self.send('/machine/set_many', *pairs, reply_expected=False)
 
     def request_machine_var(self, var):
         f = self.send('/machine/get', var)
@@ -232,6 +303,17 @@ class OscMachine(AbstractMachine):
                 print(f.request.args[0], f.result.args[0])
             self._local_status[f.request.args[0]] = f.result.args[1]
 
+    def update_machine_vars(self, f):
+        if f.result.is_error:
+            return
+
+        args = f.result.args
+        for k, st, v in zip(args[0::3], args[1::3], args[2::3]):
+            if st == 'ok':
+                self._local_status[k] = v
+            else:
+                logging.debug('Unable to get %s from %s: %s', k, self.serialnumber, v)
+
     def reply(self, command):
         if command.answer is not None:
             self.send_message(command.protocol, command.answer)
@@ -242,7 +324,7 @@ class OscMachine(AbstractMachine):
         f = None
         if re:
             f = Future(m)
-            self.waiting_futures.append(f)
+            self.waiting_futures.add(f, m.path, timeout=f.timeout)
         self.driver._send(m)
 
         return f
@@ -272,23 +354,39 @@ class OscMachine(AbstractMachine):
         """
 
         while not self.running_ev.is_set():
-            try:
-                if self.machine_class is None:
-                    if self.machine_type is not MachineType.NONE:
-                        # Load corresponding class
-                        self.machine_class = get_machine_class(self.machine_type)
-                    self.running_ev.wait(0.1)
-                    continue
+            self.running_ev.wait(self._machine_step())
+
+    def _machine_tick(self):
+        self._machine_timer = None
+        if self.running_ev.is_set():
+            return
 
+        self._expire_futures()
+        self._machine_timer = self.reactor.call_later(self._machine_step(),
+                                                      self._machine_tick)
+
+    def _machine_step(self):
+        "Run machine logic once, return the time to wait before the next run"
+
+        try:
+            if self.machine_class is None:
+                if self.machine_type is not MachineType.NONE:
+                    # Load corresponding class
+                    self.machine_class = get_machine_class(self.machine_type)
+                return 0.1
+
+            if time.time() > self._subscription_renew_time:
+                # Poll until the subscription is acknowledged
+                self.subscribe_status()
                 self.update_local_status()
-                self.send_local_requests()
+            self.send_local_requests()
+        except MachineCommunicationTimeout as e:
+            self.timeout_ev.set()
+            logging.exception(e)
+        except Exception as e:
+            logging.exception(e)
 
-                self.running_ev.wait(self.refresh_interval)
-            except MachineCommunicationTimeout as e:
-                self.timeout_ev.set()
-                logging.exception(e)
-            except Exception as e:
-                logging.exception(e)
+        return self.refresh_interval
 
     def _communication_loop(self):
         """
@@ -297,25 +395,42 @@ class OscMachine(AbstractMachine):
 
         while not self.running_ev.is_set():
             try:
+                deadline = self._expire_futures()
+                timeout = 1 if deadline is None else min(max(deadline - time.time(), 0), 1)
                 try:
-                    msg = self.messages_queue.get(block=True, timeout=1)
+                    msg = self.messages_queue.get(block=True, timeout=timeout)
                 except queue.Empty:
                     continue
 
-                future = self.find_matching_future(msg)
-                if future is None:
-                    logging.debug('No future for %s' % str(msg))
-                    # A command might be sent from the remote node (error,
-                    # event, etc)
-                    # TODO: Here should be a function to handle this case
+                try:
+                    self._handle_message(msg)
+                finally:
                     self.messages_queue.task_done()
-                    continue
-
-                future.set_result(msg)
-                self.messages_queue.task_done()
             except Exception as e:
                 logging.exception(e)
 
+    def _expire_futures(self):
+        "Fail futures waiting for too long, return the next deadline"
+
+        for f in self.waiting_futures.expire(time.time()):
+            logging.debug('No reply for %s', f)
+        return self.waiting_futures.next_deadline()
+
+    def _handle_message(self, msg):
+        if msg.path == self.PUSH_PATH:
+            self.update_pushed_status(msg)
+            return
+
+        future = self.find_matching_future(msg)
+        if future is None:
+            logging.debug('No future for %s' % str(msg))
+            # A command might be sent from the remote node (error,
+            # event, etc)
+            # TODO: Here should be a function to handle this case
+            return
+
+        future.set_result(msg)
+
     # Special methods
 
     def __getitem__(self, key):
@@ -368,6 +483,14 @@ class Future(object):
         if self._callback:
             self._callback(self)
 
+    def set_exception(self, exception):
+        self._exception = exception
+        self.event.set()
+
+    @property
+    def done(self):
+        return self.event.is_set()
+
     @property
     def event(self):
         if not self._event:
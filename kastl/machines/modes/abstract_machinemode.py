@@ -3,6 +3,8 @@
 import logging
 from collections import namedtuple
 
+from ..cache import TelemetryCache
+
 logging = logging.getLogger('kastl.machine.modes')
 
 
@@ -49,7 +51,15 @@ class AbstractMachineMode(object):
 
     def __init__(self, machine):
         self._machine = machine
-        self._last_values = {}
+
+        # Shared with the machine readers if it holds one
+        self.cache = getattr(machine, 'cache', None)
+        if self.cache is None:
+            self.cache = TelemetryCache(self._read)
+        self.cache.add_static_keys(self.StaticKeys)
+
+    def _read(self, key):
+        return self._machine.driver[key]
 
     def _check_read_access(self, key):
         self._check_key(key)
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
-import time
 import logging
+from collections import namedtuple
+from threading import Lock
 
 from .abstract_machinemode import ContinueException, MachineModeException
 from .standalone import StandaloneMachineMode
@@ -9,13 +10,53 @@ from .standalone import StandaloneMachineMode
 logging = logging.getLogger('kastl.machine.modes.master')
 
 
+Transform = namedtuple('Transform', ('mode', 'value', 'function'))
+
+
+def compile_transform(mode, value=None):
+    """
+    Return the Transform applying mode (with its configured value) to
+    master values.
+    """
+    if mode not in TRANSFORMS:
+        raise MachineModeException('Unrecognized mode {0}'.format(mode))
+
+    if mode != 'forward' and value is None:
+        raise MachineModeException('No value configured for {0}'.format(mode))
+
+    return Transform(mode, value, TRANSFORMS[mode](value))
+
+
+TRANSFORMS = {
+    'forward':      lambda k: lambda v: v,
+    'multiply':     lambda k: lambda v: k * v,
+    'divide':       lambda k: lambda v: k / v,
+    'add':          lambda k: lambda v: k + abs(v),
+    'substract':    lambda k: lambda v: k - abs(v),
+    'default':      lambda k: lambda v: k,
+}
+
+
 class SlavesConfig(object):
+    """
+    Per slave value transforms, read from slave_<serialnumber> sections.
+
+    Transforms are compiled once per key for every slave, and compiled again
+    when the config revision changes.
+    """
+
     def __init__(self, config, slave_machines):
         self._cf = config
+        self._tables = {}
+        self._revision = None
+        self._lock = Lock()
         self.update_slave_configs(slave_machines)
 
     def update_slave_configs(self, slave_machines):
-        self._slaves = [sm.slave for sm in slave_machines.values()]
+        with self._lock:
+            self._slaves = [sm.slave for sm in slave_machines.values()]
+            self._serialnumbers = frozenset(s.serialnumber for s in self._slaves)
+            self._tables = {}
 
     def __getitem__(self, key):
         try:
@@ -37,8 +78,42 @@ class SlavesConfig(object):
         except KeyError:
             raise KeyError('No config found for {}'.format(key.split(':', maxsplit=1)[0]))
 
+    def table(self, key):
+        """
+        Return the compiled transforms of key as a dict serialnumber ->
+        Transform (or the exception raised while compiling it).
+        """
+        revision = getattr(self._cf, 'revision', None)
+
+        with self._lock:
+            if revision != self._revision:
+                self._tables = {}
+                self._revision = revision
+
+            table = self._tables.get(key)
+            if table is None:
+                table = self._tables[key] = self._compile(key)
+
+        return table
+
+    def _compile(self, key):
+        table = {}
+        for s in self._slaves:
+            sn = s.serialnumber
+            try:
+                table[sn] = compile_transform(*self['{}:{}'.format(sn, key)])
+            except (KeyError, MachineModeException) as e:
+                table[sn] = e
+        return table
+
+    def transform(self, sn, key):
+        t = self.table(key)[sn]
+        if isinstance(t, Exception):
+            raise t
+        return t
+
     def keys(self):
-        return [s.serialnumber for s in self._slaves]
+        return self._serialnumbers
 
 
 class MasterMachineMode(StandaloneMachineMode):
@@ -84,15 +159,27 @@ class MasterMachineMode(StandaloneMachineMode):
         ),
     }
 
-    ValueGuard = {}
-
     def __init__(self, machine):
         super().__init__(machine)
 
-        self.guard_interval = 0.03
+        self.cache.add_listener(self._sampled)
 
         self._slv_config = SlavesConfig(self._machine.config, self._machine.slave_machines)
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.notify_slaves(key)
+
+    def notify_slaves(self, key):
+        """
+        Wake slaves following key so the change is forwarded right away.
+        """
+        if not key.startswith('machine:'):
+            key = 'machine:{}'.format(key)
+
+        for sm in self._machine.slave_machines.values():
+            sm.notify(key)
+
     def _send_to_slave(self, slave, mode=None, key='', value=None):
         if not mode:
             return
@@ -109,54 +196,52 @@ class MasterMachineMode(StandaloneMachineMode):
             logging.warn('No config registered for slave {!s}'.format(slave))
             return
 
-        vl_mode, vl_value = self._slv_config['{}:{}'.format(sn, key)]
-
-        if vl_mode not in ('forward', 'multiply', 'divide', 'add', 'substract', 'default',):
-            raise MachineModeException('Unrecognized mode {0} for {1}'.format(vl_mode, key))
+        try:
+            t = self._slv_config.transform(sn, key)
+        except MachineModeException as e:
+            raise MachineModeException('{0} for {1} in {2!s}'.format(e, key, slave))
 
-        if vl_mode in ('multiply', 'divide', 'add', 'substract', 'default',) and vl_value is None:
-            raise MachineModeException('No value configured for '
-                                       '{0} in {1!s}'.format(key, slave))
-        if vl_mode == 'default':
-            return vl_value
+        if t.mode == 'default':
+            return t.value
 
         if not value:
-            if key in self.StaticKeys:
-                value = self._last_values.get(key, self._machine[key])
-            else:
-                try:
-                    value = self.get_guarded_value(key)
-                except ContinueException:
-                    raise MachineModeException('No value returned for '
-                                               '{0.slave.serialnumber} '
-                                               '({1} asked)'.format(slave, key))
-
-        nvalue = None
-        if vl_mode == 'forward':
-            nvalue = value
-        elif vl_mode == 'multiply':
-            nvalue = vl_value * value
-        elif vl_mode == 'divide':
-            nvalue = vl_value / value
-        elif vl_mode == 'add':
-            nvalue = vl_value + value if value >= 0 else vl_value - value
-        elif vl_mode == 'substract':
-            nvalue = vl_value - value if value >= 0 else vl_value + value
-
-        return nvalue
+            value = self._master_value(key, slave)
+
+        return t.function(value)
+
+    def get_values_for_slaves(self, key, value=None):
+        """
+        Return the value of key for every configured slave, as a dict
+        serialnumber -> value. The master value is read once for all.
+        """
+        table = self._slv_config.table(key)
+
+        if not value and any(not isinstance(t, Exception) and t.mode != 'default'
+                             for t in table.values()):
+            value = self._master_value(key)
+
+        values = {}
+        for sn, t in table.items():
+            if isinstance(t, Exception):
+                logging.warn('Unable to compute {0} for {1}: {2!s}'.format(key, sn, t))
+                continue
+            values[sn] = t.function(value)
+
+        return values
+
+    def _master_value(self, key, slave=None):
+        try:
+            return self.get_guarded_value(key)
+        except ContinueException:
+            raise MachineModeException('No value returned for '
+                                       '{0} ({1} asked)'.format(
+                                           slave.slave.serialnumber if slave
+                                           else 'slaves', key))
 
     def get_guarded_value(self, key):
-        gvalue, gtime = self.ValueGuard.get(key, (None, None,))
-        if gtime is not None:
-            if time.time() - gtime > self.guard_interval:
-                nvalue = self._machine[key]
-                ntime = time.time()
-                self.ValueGuard[key] = (nvalue, ntime)
-                return nvalue
-            else:
-                return gvalue
-        else:
-            nvalue = self._machine[key]
-            ntime = time.time()
-            self.ValueGuard[key] = (nvalue, ntime)
-            return nvalue
+        "Read key from the master, through the telemetry cache"
+        return self._machine[key]
+
+    def _sampled(self, key, value):
+        # A new value read from the drive, slaves following it are woken
+        self.notify_slaves(key)
@@ -29,12 +29,7 @@ class StandaloneMachineMode(AbstractMachineMode):
         try:
             res = super().__getitem__(key)
         except ContinueException:
-            if key in self.StaticKeys:
-                res = self._last_values.get(key, None)
-                if res is None:
-                    res = self._machine.driver[key]
-            else:
-                res = self._machine.driver[key]
+            res = self.cache.get(key)
 
         return res
 
@@ -45,4 +40,6 @@ class StandaloneMachineMode(AbstractMachineMode):
             self._machine.driver[key] = value
 
         if key in self.StaticKeys:
-            self._last_values[key] = value
+            self.cache.put(key, value)
+        else:
+            self.cache.invalidate(key)
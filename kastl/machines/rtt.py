@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Round trip time estimation
+
+Smoothed RTT and variation are updated like TCP does (RFC 6298), recent
+samples are kept to give percentiles. The retransmission timeout derived
+from them backs off on each timeout until a new sample comes.
+"""
+
+import logging
+import math
+from collections import deque
+from threading import Lock
+
+logging = logging.getLogger('kastl.machine.rtt')
+
+
+class RttEstimator(object):
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+
+    def __init__(self, min_timeout=0.05, max_timeout=2.0, window=64):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.timeouts = 0
+
+        self._backoff = 1
+        self._recent = deque(maxlen=window)
+        self._lock = Lock()
+
+    def add(self, rtt):
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+                self.srtt += self.ALPHA * (rtt - self.srtt)
+
+            self._recent.append(rtt)
+            self.samples += 1
+            self._backoff = 1
+
+    def timeout(self):
+        "Count a lost request, the timeout doubles until the next sample"
+        with self._lock:
+            self.timeouts += 1
+            self._backoff = min(self._backoff * 2, 64)
+
+    def percentile(self, p):
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return None
+        i = min(int(math.ceil(p / 100 * len(recent))) - 1, len(recent) - 1)
+        return recent[max(i, 0)]
+
+    def rto(self, default=None):
+        """
+        Timeout to wait for a reply, default if no sample was taken yet.
+        """
+        if self.srtt is None:
+            return default
+        rto = (self.srtt + 4 * self.rttvar) * self._backoff
+        return min(max(rto, self.min_timeout), self.max_timeout)
+
+    @property
+    def stats(self):
+        return {
+            'srtt': self.srtt,
+            'rttvar': self.rttvar,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'samples': self.samples,
+            'timeouts': self.timeouts,
+        }
+
+    def __repr__(self):
+        if self.srtt is None:
+            return '{0.__class__.__name__}: no sample'.format(self)
+        return '{0.__class__.__name__}: {1:.1f}ms ±{2:.1f}ms'.format(
+            self, self.srtt * 1000, self.rttvar * 1000)
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 
 from threading import Thread
-from threading import Event
-from queue import Queue, Empty
-from collections import namedtuple
+from threading import Event, Condition, Lock
+from queue import Empty
+from collections import namedtuple, deque, OrderedDict
 from datetime import datetime
 import logging
+import math
+import time
 import functools
 
 from .abstract_machine import AbstractMachine
@@ -14,6 +16,9 @@ from .abstract_machine import AbstractMachineError, AbstractFatalMachineError
 from ..drivers import get_driver
 from ..drivers.abstract_driver import AbstractDriverError, AbstractTimeoutError
 
+from .clock import ClockEstimator, ClockError, to_us, from_us
+from .rtt import RttEstimator
+
 logging = logging.getLogger('kastl.machine.slave')
 
 Slave = namedtuple('Slave', ('serialnumber', 'address', 'driver', 'slave_mode', 'config'))
@@ -61,10 +66,38 @@ class SlaveRequest(object):
         }
         self._kwargs.update(kwargs)
         self._callback = None
+        self._superseded = []
 
     def set_callback(self, cb):
         self._callback = cb
 
+    def supersede(self, older):
+        """
+        Replace older, still waiting to be sent: its callback is called
+        with the reply of this request.
+        """
+        self._superseded.append(older)
+
+    def coalesce(self, older):
+        """
+        Fold values of an older set_many request under those of this one.
+        """
+        values = older.values
+        values.update(self.values)
+        self._args = tuple(a for kv in values.items() for a in kv)
+
+    @property
+    def values(self):
+        """
+        Values written by this request as an ordered dict, None if it
+        doesn't write any.
+        """
+        if self._kwargs['setitem']:
+            return OrderedDict(((self._item, self._args[0]),))
+        if self._attr == 'set_many':
+            return OrderedDict(zip(self._args[0::2], self._args[1::2]))
+        return None
+
     @property
     def attribute(self):
         return self._attr
@@ -83,7 +116,23 @@ class SlaveRequest(object):
 
     @property
     def callback(self):
-        return self._callback
+        if not self._superseded:
+            return self._callback
+        return self._chained_callback
+
+    def _chained_callback(self, data):
+        callbacks = [self._callback] + [rq.callback for rq in self._superseded]
+
+        error = None
+        for cb in callbacks:
+            if cb is None:
+                continue
+            try:
+                cb(data)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
 
     def __getattr__(self, name):
         return self._kwargs[name]
@@ -93,11 +142,174 @@ class SlaveRequest(object):
                                     ' '.join(map(str, self.args)), self.callback)
 
 
+class _BridgeEntry(object):
+    __slots__ = ('request', 'slot', 'keys', 'stamp')
+
+    def __init__(self, request, slot=None, keys=(), stamp=None):
+        self.request = request
+        self.slot = slot
+        self.keys = set(keys)
+        self.stamp = stamp
+
+
+class SlaveBridge(object):
+    """
+    Requests waiting to be sent to a slave.
+
+    Writes of continuous setpoints (setpoint_keys) are held in slots: while a
+    slot is waiting, a newer value for the same key replaces the pending one
+    instead of being queued behind it. Any other request (enable, stop,
+    control mode, get...) is queued in order and acts as a barrier: setpoints
+    queued after it never overtake it, so ordering between commands and
+    setpoints is kept.
+
+    Ages (time spent waiting) are measured from the first value of a slot,
+    so they bound the lag between the master and the slave.
+    """
+
+    AGE_SMOOTHING = 0.1
+
+    def __init__(self, setpoint_keys=()):
+        self.setpoint_keys = frozenset(setpoint_keys)
+
+        self._entries = deque()
+        self._open = {}     # slot -> waiting entry setpoints can merge into
+        self._owners = {}   # setpoint key -> slot holding its latest value
+        self._cond = Condition()
+        self._unfinished = 0
+
+        # Called after each put, outside the lock
+        self.on_put = None
+
+        self.commands = 0
+        self.setpoints = 0
+        self.superseded = 0
+        self.last_age = 0
+        self.mean_age = 0
+        self.max_age = 0
+
+    def put(self, request, block=True, timeout=None):
+        self._put(request)
+        if self.on_put is not None:
+            self.on_put()
+
+    def _put(self, request):
+        values = request.values
+        if values and self.setpoint_keys.issuperset(values):
+            slot = request.item if request.setitem else request.attribute
+        else:
+            slot = None
+
+        with self._cond:
+            if slot is None:
+                self.commands += 1
+                self._open.clear()
+                self._owners.clear()
+                self._append(_BridgeEntry(request, stamp=time.time()))
+                return
+
+            self.setpoints += 1
+            entry = self._open.get(slot)
+            if entry is not None and all(self._owners.get(k, slot) == slot
+                                         for k in values):
+                if request.attribute == 'set_many':
+                    request.coalesce(entry.request)
+                request.supersede(entry.request)
+                entry.request = request
+                entry.keys.update(values)
+                self.superseded += 1
+            else:
+                entry = _BridgeEntry(request, slot, values, time.time())
+                self._open[slot] = entry
+                self._append(entry)
+
+            for k in values:
+                self._owners[k] = slot
+
+    def _append(self, entry):
+        self._entries.append(entry)
+        self._unfinished += 1
+        self._cond.notify()
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if not block:
+                if not self._entries:
+                    raise Empty
+            elif timeout is None:
+                while not self._entries:
+                    self._cond.wait()
+            else:
+                end = time.time() + timeout
+                while not self._entries:
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        raise Empty
+                    self._cond.wait(remaining)
+
+            entry = self._entries.popleft()
+            if entry.slot is not None and self._open.get(entry.slot) is entry:
+                del self._open[entry.slot]
+                for k in entry.keys:
+                    if self._owners.get(k) == entry.slot:
+                        del self._owners[k]
+
+            age = time.time() - entry.stamp
+            self.last_age = age
+            self.mean_age += self.AGE_SMOOTHING * (age - self.mean_age)
+            self.max_age = max(self.max_age, age)
+
+            return entry.request
+
+    def task_done(self):
+        with self._cond:
+            if self._unfinished <= 0:
+                raise ValueError('task_done() called too many times')
+            self._unfinished -= 1
+            if not self._unfinished:
+                self._cond.notify_all()
+
+    def join(self):
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def qsize(self):
+        return len(self._entries)
+
+    def empty(self):
+        return not self._entries
+
+    @property
+    def oldest_age(self):
+        with self._cond:
+            if not self._entries:
+                return 0
+            return time.time() - self._entries[0].stamp
+
+    @property
+    def stats(self):
+        return {
+            'pending': self.qsize(),
+            'commands': self.commands,
+            'setpoints': self.setpoints,
+            'superseded': self.superseded,
+            'last_age': self.last_age,
+            'mean_age': self.mean_age,
+            'max_age': self.max_age,
+            'oldest_age': self.oldest_age,
+        }
+
+
 class SlaveMachine(AbstractMachine):
 
     machine = None
     fatal_event = None
 
+    PIPELINED_ATTRIBUTES = ('get_many', 'set_many', 'set_many_at', 'get_time', 'ping')
+
+    ADAPT_INTERVAL = 0.25
+
     SLAVE_MODES = {
         'torque': (
             SlaveKey('machine:torque_ref', 'machine:torque'),
@@ -117,6 +329,9 @@ class SlaveMachine(AbstractMachine):
         ),
     }
 
+    # Keys written continuously by the watcher, only their latest value matters
+    SETPOINT_KEYS = frozenset(k.dest for keys in SLAVE_MODES.values() for k in keys)
+
     def __init__(self, **kwargs):
         for k in ('address', 'driver_type', 'motion_mode', 'config'):
             if k not in kwargs:
@@ -141,7 +356,46 @@ class SlaveMachine(AbstractMachine):
         self.timeout = self.driver_config['timeout']
         self.refresh_interval = float(self.config.get('refresh_interval', 0.5))
 
-        self.bridge = Queue()
+        # Changes are forwarded as soon as they are notified, but no more
+        # often than min_interval. Feedback sources are sampled every
+        # feedback_interval, and everything is resent every keepalive_interval.
+        self.min_interval = float(self.config.get('min_interval', 0.02))
+        self.feedback_interval = float(self.config.get('feedback_interval',
+                                                       self.refresh_interval))
+        self.keepalive_interval = float(self.config.get('keepalive_interval', 5))
+
+        self._changed = set()
+        self._changed_lock = Lock()
+        self._change_ev = Event()
+
+        # Timeout, intervals and window follow the measured round trip time,
+        # configured values are the lower bounds
+        self.rtt = RttEstimator(
+            min_timeout=float(self.config.get('min_timeout', 0.05)),
+            max_timeout=float(self.config.get('max_timeout', 2.0)))
+        self.base_timeout = self.timeout
+        self.base_min_interval = self.min_interval
+        self.base_feedback_interval = self.feedback_interval
+        self._last_adapt = 0
+
+        # Clock offset with the slave, refreshed every sync_interval
+        self.clock = ClockEstimator(int(self.config.get('sync_window', 16)))
+        self.sync_interval = float(self.config.get('sync_interval', 1))
+
+        # Setpoints of slaves in a group are sent by the group
+        self.group_name = self.config.get('group', None)
+        self.group = None
+
+        # Requests kept in flight at once. With a window of 1, each request
+        # waits for its reply. The effective window is halved on timeouts and
+        # grows back by one on each reply.
+        self.max_window = max(1, int(self.config.get('window', 1)))
+        self.window_size = self.max_window
+        self.window = self.window_size
+        self._in_flight = 0
+        self._window_cond = Condition()
+
+        self.bridge = SlaveBridge(self.SETPOINT_KEYS)
 
         self._get_dict = {}
         self._set_dict = {}
@@ -153,10 +407,27 @@ class SlaveMachine(AbstractMachine):
         self.max_errors = 10
 
         self.watchdog_ev = Event()
+        self.running_event = Event()
+        self.watchdog_event = Event()
+        self.fault_event = Event()
 
         self._thread = None
         self._watchdog_thread = None
 
+        # Watches of a watchdog service, replacing the watchdog thread: the
+        # slave goes silent if no reply comes for silence_timeout
+        self.silence_timeout = float(self.config.get('silence_timeout', 3))
+        self.watchdog = None
+        self._watches = ()
+
+        # With a reactor, requests, watcher and watchdog run in its thread
+        self.reactor = None
+        self._pump_pending = False
+        self._watcher = None
+        self._watchdog_timer = None
+
+        self._next_keepalive = self._next_feedback = self._next_sync = 0
+
     def init_driver(self):
         drv = self.driver_type
         if not drv:
@@ -180,6 +451,15 @@ class SlaveMachine(AbstractMachine):
         return drv
 
     def start(self, **kwargs):
+        """
+        Start sending requests. Given a reactor (reactor keyword), requests,
+        watcher and watchdog run in it instead of threads of their own. The
+        watchdog keyword is a bool, or a watchdog service to register to.
+        """
+        reactor = kwargs.get('reactor')
+        if reactor is not None:
+            return self._start_in_reactor(reactor, kwargs.get('watchdog', True))
+
         if self._thread:
             self.running_event.set()
             self._thread.join()
@@ -191,10 +471,38 @@ class SlaveMachine(AbstractMachine):
         self._thread.daemon = True
         self._thread.start()
 
-        if kwargs.get('watchdog', True):
-            self.start_watchdog()
+        watchdog = kwargs.get('watchdog', True)
+        if watchdog:
+            self.start_watchdog(None if watchdog is True else watchdog)
+
+    def _start_in_reactor(self, reactor, watchdog=True):
+        self.reactor = reactor
+        self.running_event.clear()
+
+        self.inlet = self.driver.attach(reactor)
+        self.driver.connect()
+        self.bridge.on_put = self._schedule_pump
+
+        self._watch_init(block=False)
+        self.set_to_remote('machine:command:enable', False)
+
+        self._watcher = reactor.ticker(self._watch_step)
+        self._watcher.start()
+
+        if watchdog:
+            self.start_watchdog(None if watchdog is True else watchdog)
+
+    def start_watchdog(self, service=None):
+        if service is not None:
+            return self.attach_watchdog(service)
+
+        if self.reactor is not None:
+            if self._watchdog_timer:
+                self._watchdog_timer.cancel()
+            self._watchdog_timer = self.reactor.call_every(self.refresh_interval,
+                                                           self._watchdog_step)
+            return
 
-    def start_watchdog(self):
         if self._watchdog_thread:
             self.watchdog_event.set()
             self._watchdog_thread.join()
@@ -204,8 +512,33 @@ class SlaveMachine(AbstractMachine):
         self._watchdog_thread.daemon = True
         self._watchdog_thread.start()
 
+    def attach_watchdog(self, service):
+        """
+        Register silence and fault watches of this slave to service.
+        """
+        self.detach_watchdog()
+        self.watchdog = service
+        name = 'slave:{}'.format(self.serialnumber)
+        self._watches = (
+            service.watch(name, self.silence_timeout, self._silence_cb,
+                          recover=self._silence_recover),
+            service.watch(name + ':fault', self.refresh_interval,
+                          lambda w: self._watchdog_step(), repeat=True),
+        )
+
+    def detach_watchdog(self):
+        for w in self._watches:
+            self.watchdog.unwatch(w.name)
+        self._watches = ()
+
     def exit(self):
         self.running_event.set()
+        self.watchdog_event.set()
+        self.detach_watchdog()
+        self._change_ev.set()
+        for timer in (self._watcher, self._watchdog_timer):
+            if timer is not None:
+                timer.cancel()
         self.driver.exit()
 
     def loop(self):
@@ -230,66 +563,289 @@ class SlaveMachine(AbstractMachine):
                     logging.error('Unsupported object in queue: %s' % repr(recv_item))
                     continue
 
-                try:
-                    if recv_item.getitem:
-                        res = self.driver[recv_item.item]
-                    elif recv_item.setitem:
-                        res = self.driver.__setitem__(recv_item.item, *recv_item.args)
-                    else:
-                        res = getattr(self.driver, recv_item.attribute)(
-                            *recv_item.args)
-
-                    recv_item.callback(res)
-                except AttributeError:
-                    logging.exception('''Can't find %s in driver''' % recv_item.attribute)
-                except SlaveMachineError as e:
-                    logging.error('Exception in {n} loop: {e}'.format(
-                        n=self.__class__.__name__, e=e))
-                except AbstractTimeoutError as e:
-                    logging.error('Timeout for {!s}'.format(self))
-                except Exception as e:
-                    logging.error('Uncatched exception in {n} loop: {e}'.format(
-                        n=self.__class__.__name__, e=e))
+                if self.window_size > 1:
+                    self._pipeline(recv_item)
+                else:
+                    self._execute(recv_item)
                 self.bridge.task_done()
             except Empty:
                 pass
 
+    def _execute(self, recv_item):
+        "Send request and wait for its reply"
+
+        start = time.time()
+        try:
+            if recv_item.getitem:
+                res = self.driver[recv_item.item]
+            elif recv_item.setitem:
+                res = self.driver.__setitem__(recv_item.item, *recv_item.args)
+            else:
+                res = getattr(self.driver, recv_item.attribute)(
+                    *recv_item.args)
+
+            if res is not None:
+                self._rtt_sample(time.time() - start)
+            recv_item.callback(res)
+        except AttributeError:
+            logging.exception('''Can't find %s in driver''' % recv_item.attribute)
+        except SlaveMachineError as e:
+            logging.error('Exception in {n} loop: {e}'.format(
+                n=self.__class__.__name__, e=e))
+        except AbstractTimeoutError as e:
+            self._rtt_timeout()
+            logging.error('Timeout for {!s}'.format(self))
+        except Exception as e:
+            logging.error('Uncatched exception in {n} loop: {e}'.format(
+                n=self.__class__.__name__, e=e))
+
+    def _pipeline(self, recv_item):
+        """
+        Send request without waiting for its reply, once a slot is free in
+        the window. The reply is handled by _pipeline_cb.
+        """
+
+        if not (recv_item.getitem or recv_item.setitem or
+                recv_item.attribute in self.PIPELINED_ATTRIBUTES):
+            return self._execute(recv_item)
+
+        with self._window_cond:
+            while self._in_flight >= self.window:
+                if self.running_event.is_set():
+                    return
+                self._window_cond.wait(self.timeout)
+            self._in_flight += 1
+
+        self._send_request(recv_item)
+
+    def _schedule_pump(self):
+        if self._pump_pending:
+            return
+        self._pump_pending = True
+        self.reactor.call_soon(self._pump)
+
+    def _pump(self):
+        """
+        Send queued requests while the window has room (reactor thread).
+        Released slots pump again.
+        """
+        self._pump_pending = False
+        while not self.running_event.is_set():
+            with self._window_cond:
+                if self._in_flight >= self.window:
+                    return
+                try:
+                    recv_item = self.bridge.get(block=False)
+                except Empty:
+                    return
+                self._in_flight += 1
+
+            if not (recv_item.getitem or recv_item.setitem or
+                    recv_item.attribute in self.PIPELINED_ATTRIBUTES):
+                # Waiting for the reply would block the reactor
+                self._release_slot(timeout=False)
+                logging.error('{} cannot be sent without blocking to {!s}'.format(
+                    recv_item.attribute, self))
+            else:
+                self._send_request(recv_item)
+            self.bridge.task_done()
+
+    def _send_request(self, recv_item):
+        "Send request in a slot taken by the caller"
+        cb = functools.partial(self._pipeline_cb, recv_item, time.time())
+        try:
+            if recv_item.getitem:
+                self.driver.get(recv_item.item, block=False, callback=cb)
+            elif recv_item.setitem:
+                self.driver.set(recv_item.item, *recv_item.args,
+                                block=False, callback=cb)
+            else:
+                getattr(self.driver, recv_item.attribute)(
+                    *recv_item.args, block=False, callback=cb)
+        except Exception as e:
+            self._release_slot(timeout=False)
+            logging.error('Uncatched exception in {n} pipeline: {e}'.format(
+                n=self.__class__.__name__, e=e))
+
+    def _pipeline_cb(self, recv_item, start, future):
+        timeout = isinstance(future.exception, AbstractTimeoutError)
+        self._release_slot(timeout)
+
+        if timeout:
+            self._rtt_timeout()
+            logging.error('Timeout for {!s} (window: {})'.format(self, self.window))
+            return
+
+        self._rtt_sample(time.time() - start)
+
+        try:
+            recv_item.callback(future.raw_result)
+        except SlaveMachineError as e:
+            logging.error('Exception in {n} pipeline: {e}'.format(
+                n=self.__class__.__name__, e=e))
+        except Exception as e:
+            logging.error('Uncatched exception in {n} pipeline: {e}'.format(
+                n=self.__class__.__name__, e=e))
+
+    def _release_slot(self, timeout):
+        with self._window_cond:
+            self._in_flight -= 1
+            if timeout:
+                self.window = max(1, self.window // 2)
+            elif self.window < self.window_size:
+                self.window += 1
+            self._window_cond.notify()
+
+        if self.reactor is not None:
+            self._schedule_pump()
+
+    def _rtt_sample(self, rtt):
+        if self._watches:
+            self._watches[0].feed()     # A reply came, the slave is alive
+        self.rtt.add(rtt)
+        if time.time() - self._last_adapt > self.ADAPT_INTERVAL:
+            self.adapt()
+
+    def _rtt_timeout(self):
+        self.rtt.timeout()
+        self.adapt()
+
+    def adapt(self):
+        """
+        Fit timeout, refresh intervals and window to the link round trip time.
+        """
+        self._last_adapt = time.time()
+        srtt = self.rtt.srtt
+        if srtt is None:
+            return
+
+        self.timeout = self.rtt.rto(self.base_timeout)
+        driver = getattr(self, 'driver', None)
+        if hasattr(driver, 'set_timeout'):
+            driver.set_timeout(self.timeout)
+
+        # Sampling feedback faster than replies come back only queues requests
+        self.feedback_interval = max(self.base_feedback_interval,
+                                     self.rtt.percentile(95))
+
+        if self.max_window > 1:
+            # Enough requests in flight to send one every min_interval
+            size = int(math.ceil(srtt / self.base_min_interval))
+            size = min(max(size, 1), self.max_window)
+            with self._window_cond:
+                self.window_size = size
+                self.window = min(self.window, size)
+                self._window_cond.notify_all()
+
+        self.min_interval = max(self.base_min_interval, srtt / self.window_size)
+
     def watcher_loop(self):
-        smode = self.slave.slave_mode
-        self.last_values = {}
-        self.set_control_mode(smode)
+        self._watch_init()
         while not self.running_event.is_set():
-            if SlaveMachine.fatal_event.is_set():
-                self.set_to_remote('machine:command:enable', False)
-                self.running_event.wait(self.refresh_interval)
-                continue
+            pause, deadline = self._watch_step()
+            if pause:
+                self.running_event.wait(pause)
+            self._change_ev.wait(max(deadline - time.monotonic(), 0))
 
+    def _watch_init(self, block=True):
+        self.last_values = {}
+        self.set_control_mode(self.slave.slave_mode, block=block)
+        self._next_keepalive = self._next_feedback = self._next_sync = time.monotonic()
+
+    def _watch_step(self):
+        """
+        Forward changed values once. Return (pause, deadline): the next step
+        waits at least pause, then until deadline or a change.
+        """
+        smode = self.slave.slave_mode
+        now = time.monotonic()
+
+        if now >= self._next_sync:
+            self.sync_clock()
+            self._next_sync = now + self.sync_interval
+
+        if self.fatal:
+            self.set_to_remote('machine:command:enable', False)
+            return self.refresh_interval, now
+
+        if self.group is not None:
+            return min(self.refresh_interval, max(self._next_sync - now, 0)), now
+
+        sent = None
+        try:
             try:
-                try:
-                    for skey in self.SLAVE_MODES[smode]:
-                        self._send_if_latest(skey.dest, source=skey.source)
-                    self.errors = 0
-                except KeyError:
-                    raise FatalSlaveMachineError(
-                        'Unrecognized mode for slave {!s}: {}'.format(self, smode))
-            except AbstractFatalMachineError as e:
-                if self.errors > self.max_errors:
-                    self.set_to_remote('machine:command:enable', False)
-                    if SlaveMachine.fatal_event:
-                        SlaveMachine.fatal_event.set()
-                    logging.error('Slave machine disabled')
-                    continue
+                if now >= self._next_keepalive:
+                    self.last_values = {}   # Resend everything
+                    self._pop_changed()
+                    skeys = self.SLAVE_MODES[smode]
+                    self._next_keepalive = now + self.keepalive_interval
                 else:
-                    self.errors += 1
-                logging.error('Fatal exception occured in slave watcher loop '
-                              'for {!s}: {!r}'.format(self, e))
-            except AbstractMachineError as e:
-                logging.error('Exception occured in slave watcher loop '
-                              'for {!s}: {!r}'.format(self, e))
-            except Exception as e:
-                logging.error('Exception in {0} loop: {1}'.format(self.__class__.__name__, e))
+                    skeys = self._pop_changed(feedback=now >= self._next_feedback)
+
+                if now >= self._next_feedback:
+                    self._next_feedback = now + self.feedback_interval
+
+                if skeys:
+                    sent = self._send_latest(skeys)
+                self.errors = 0
+            except KeyError:
+                raise FatalSlaveMachineError(
+                    'Unrecognized mode for slave {!s}: {}'.format(self, smode))
+        except AbstractFatalMachineError as e:
+            if self.errors > self.max_errors:
+                self.set_to_remote('machine:command:enable', False)
+                if SlaveMachine.fatal_event:
+                    SlaveMachine.fatal_event.set()
+                logging.error('Slave machine disabled')
+                return self.refresh_interval, now
+            else:
+                self.errors += 1
+            logging.error('Fatal exception occured in slave watcher loop '
+                          'for {!s}: {!r}'.format(self, e))
+        except AbstractMachineError as e:
+            logging.error('Exception occured in slave watcher loop '
+                          'for {!s}: {!r}'.format(self, e))
+        except Exception as e:
+            logging.error('Exception in {0} loop: {1}'.format(self.__class__.__name__, e))
+
+        deadline = min(self._next_keepalive, self._next_sync)
+        if self.feedback_keys:
+            deadline = min(deadline, self._next_feedback)
+        return (self.min_interval if sent is not None else 0), deadline
+
+    def notify(self, key):
+        """
+        Signal a change of a master value, forwarded by the watcher loop if
+        this slave follows it.
+        """
+        try:
+            if key not in self.source_keys:
+                return
+        except KeyError:
+            return  # Unrecognized mode, reported by the watcher loop
+
+        with self._changed_lock:
+            self._changed.add(key)
+            self._change_ev.set()
+
+        if self._watcher is not None:
+            self._watcher.wake()
 
-            self.running_event.wait(self.refresh_interval)
+        if self.group is not None:
+            self.group.wake()
+
+    def _pop_changed(self, feedback=False):
+        """
+        Return forwarded keys whose source changed since the last call (and
+        keys following a feedback source if feedback is True).
+        """
+        with self._changed_lock:
+            changed, self._changed = self._changed, set()
+            self._change_ev.clear()
+
+        return tuple(k for k in self.forward_keys
+                     if (k.source or k.dest) in changed or
+                     (feedback and k in self.feedback_keys))
 
     def request_from_remote(self, callback, attribute, *args, **kwargs):
         event = kwargs.pop('event', None)
@@ -322,10 +878,47 @@ class SlaveMachine(AbstractMachine):
     def enslave(self):
         self.set_to_remote('machine:operating_mode', 'slave', self.machine.get_address(self.slave.driver))
 
+    @property
+    def queue_stats(self):
+        return self.bridge.stats
+
+    @property
+    def link_stats(self):
+        """
+        Round trip time, adapted parameters, clock and queue statistics.
+        """
+        stats = self.rtt.stats
+        stats.update({
+            'timeout': self.timeout,
+            'window': self.window,
+            'window_size': self.window_size,
+            'min_interval': self.min_interval,
+            'feedback_interval': self.feedback_interval,
+            'clock_offset': self.clock.offset,
+            'clock_drift': self.clock.drift,
+        })
+        stats.update(('queue_' + k, v) for k, v in self.queue_stats.items())
+        return stats
+
+    @property
+    def fatal(self):
+        return self.fatal_event is not None and self.fatal_event.is_set()
+
     @property
     def forward_keys(self):
         return self.SLAVE_MODES[self.slave.slave_mode]
 
+    @property
+    def source_keys(self):
+        "Master keys followed by this slave"
+        return frozenset(k.source or k.dest for k in self.forward_keys)
+
+    @property
+    def feedback_keys(self):
+        "Forwarded keys following a master feedback instead of a setpoint"
+        return tuple(k for k in self.forward_keys
+                     if k.source is not None and k.source != k.dest)
+
     @property
     def infos(self):
         rev = self.driver['machine:revision']
@@ -372,11 +965,46 @@ class SlaveMachine(AbstractMachine):
             return self._set_dict[key]
         return rq
 
-    def set_control_mode(self, mode):
+    def set_many_to_remote(self, values, **kwargs):
+        """
+        Set several keys in one request. values is a list of (key, value).
+
+        If apply_at (master time.time() clock) is given, the slave applies
+        the values at that time.
+        """
+        ev = Event() if 'block' in kwargs and kwargs['block'] is True else None
+
+        pairs = [a for kv in values for a in kv]
+        apply_at = kwargs.get('apply_at')
+        if apply_at is not None:
+            rq = self.request_from_remote(self._set_many_cb, 'set_many_at',
+                                          self.remote_time(apply_at), *pairs, event=ev)
+        else:
+            rq = self.request_from_remote(self._set_many_cb, 'set_many', *pairs, event=ev)
+
+        if ev is not None and ev.wait(self.timeout):
+            return {k: self._set_dict.get(k) for k, v in values}
+        return rq
+
+    def sync_clock(self):
+        "Start a clock exchange with the slave"
+        return self.request_from_remote(self._time_cb, 'get_time')
+
+    def remote_time(self, t):
+        """
+        Return master time t in slave clock, as integer microseconds.
+        """
+        try:
+            return to_us(self.clock.to_remote(t))
+        except ClockError as e:
+            raise SlaveMachineError('{!s}: {!s}'.format(self, e))
+
+    def set_control_mode(self, mode, block=True):
         if mode not in CONTROL_MODES.keys():
             raise KeyError('Unexpected mode: {0}'.format(mode))
 
-        return self.set_to_remote('machine:command:control_mode', CONTROL_MODES[mode], block=True)
+        return self.set_to_remote('machine:command:control_mode', CONTROL_MODES[mode],
+                                  block=block)
 
     def get(self, key, **kwargs):
         return self.driver.get(key, **kwargs)
@@ -384,14 +1012,42 @@ class SlaveMachine(AbstractMachine):
     def set(self, key, *args, **kwargs):
         return self.driver.set(key, *args, **kwargs)
 
-    def _send_if_latest(self, dest, source=None, **kwargs):
+    def _send_latest(self, skeys):
+        """
+        Send changed values of skeys to the slave in a single request.
+        """
+        changed = self._changed_values(skeys)
+        if not changed:
+            return None
+
+        rq = self.set_many_to_remote(changed)
+        self._mark_sent(changed)
+        return rq
+
+    def _changed_values(self, skeys):
+        "Return (dest, value) for skeys whose value changed since last sent"
+        changed = []
+        for skey in skeys:
+            value = self._get_if_latest(skey.dest, skey.source)
+            if value is not None:
+                changed.append((skey.dest, value))
+        return changed
+
+    def _mark_sent(self, changed):
+        for dest, value in changed:
+            self.last_values[dest] = value
+
+    def _get_if_latest(self, dest, source=None, **kwargs):
+        """
+        Return the value to send for dest, or None if the slave already has it.
+        """
         source = source if source is not None else dest
         lvalue = self.last_values.get(dest, None)
 
         value = kwargs.get('value', None)
 
         try:
-            value = self.machine.machine_keys.get_value_for_slave(self, source, value)
+            value = self.machine.get_value_for_slave(self, source, value)
         except SlaveMachineError as e:
             logging.warn('Exception in {0!s}: {1!s}'.format(self, e))
         except AbstractMachineError:
@@ -403,12 +1059,15 @@ class SlaveMachine(AbstractMachine):
         if value is None:
             raise SlaveMachineError('{0} returned None for {1!s}'.format(source, self))
 
+        if lvalue and value == lvalue:
+            return None
+        return value
+
+    def _send_if_latest(self, dest, source=None, **kwargs):
+        value = self._get_if_latest(dest, source, **kwargs)
+
         rq = None
-        if lvalue:
-            if value != lvalue:
-                rq = self.set_to_remote(dest, value)
-                self.last_values[dest] = value
-        else:
+        if value is not None:
             rq = self.set_to_remote(dest, value)
             self.last_values[dest] = value
 
@@ -416,17 +1075,46 @@ class SlaveMachine(AbstractMachine):
 
     def _watchdog(self):
         while not self.watchdog_event.is_set():
-            if self.fatal_event.is_set() or self.fault_event.is_set():
-                self.set('machine:command:enable', False)
-
+            self._watchdog_step()
             self.watchdog_event.wait(self.refresh_interval)
 
+    def _watchdog_step(self):
+        if self.fatal or self.fault_event.is_set():
+            self.set('machine:command:enable', False, block=False)
+
+    def _silence_cb(self, watch):
+        logging.error('No reply from {!s} for {}s'.format(self, watch.timeout))
+        self.fault_event.set()
+
+    def _silence_recover(self, watch):
+        logging.info('{!s} replies again'.format(self))
+        self.fault_event.clear()
+
     def _ping_cb(self, start_time, data, event=None):
         rtn = self._default_cb(data, event)
 
         if rtn:
             dt = datetime.now() - start_time
-            self._latency = dt.microseconds / 1000
+            self._latency = dt.total_seconds() * 1000
+            self._rtt_sample(dt.total_seconds())
+
+        if event:
+            event.set()
+
+    def _time_cb(self, data, event=None):
+        t3 = time.time()
+        try:
+            rtn = self._default_cb(data, event)
+        except SlaveMachineError as e:
+            logging.error(repr(e))
+            return
+
+        if not rtn:
+            raise SlaveMachineError('No data in {}'.format(rtn))
+
+        t0, t1, t2 = map(from_us, rtn.args[1:4])
+        sample = self.clock.add(t0, t1, t2, t3)
+        self._rtt_sample(sample.delay)
 
         if event:
             event.set()
@@ -463,6 +1151,28 @@ class SlaveMachine(AbstractMachine):
         if event:
             event.set()
 
+    def _set_many_cb(self, data, event=None):
+        try:
+            rtn = self._default_cb(data, event)
+            logging.debug('Rtn data: %s' % rtn)
+        except SlaveMachineError as e:
+            logging.error(repr(e))
+            return
+
+        if not rtn:
+            raise SlaveMachineError('No data in {}'.format(rtn))
+
+        args = rtn.args[1:]
+        for k, st, v in zip(args[0::3], args[1::3], args[2::3]):
+            if st == 'ok':
+                self._set_dict[k] = v
+            else:
+                self.last_values.pop(k, None)   # Resend it next time
+                logging.error('Error while setting {} on {!s}: {}'.format(k, self, v))
+
+        if event:
+            event.set()
+
     def _default_cb(self, data, event=None):
         exc = None
         if isinstance(data, (list, tuple)) and len(data) == 2:
@@ -505,3 +1215,184 @@ class SlaveMachine(AbstractMachine):
             'serial': self.slave.serialnumber,
         }
         return '{addr}:{port} via {prot} ({serial})'.format(**i)
+
+
+class SlaveGroup(object):
+    """
+    Slaves receiving their setpoints together.
+
+    On each change, values of every member are sent in one bundle to the
+    group address (multicast or broadcast), one /slave/group/set message per
+    member. Each slave only applies the message carrying its serial number.
+    Nothing is acknowledged: values are resent every keepalive_interval.
+    Discrete commands (enable, control mode...) still go to each slave.
+    """
+
+    PATH = '/slave/group/set'
+    PATH_AT = '/slave/group/set_at'
+
+    def __init__(self, name, address, config=None):
+        self.name = name
+        self.config = config or {}
+
+        addr = address.split(':')[0:2]
+        port = 6969
+        if len(addr) == 2:
+            addr, port = addr
+        else:
+            addr, = addr
+
+        self.driver = get_driver('Osc')({
+            'target_address': addr,
+            'target_port': int(port),
+        })
+
+        self.min_interval = float(self.config.get('min_interval', 0.02))
+        self.feedback_interval = float(self.config.get('feedback_interval', 0.5))
+        self.keepalive_interval = float(self.config.get('keepalive_interval', 5))
+
+        # Values are applied by every member apply_delay after being sent
+        # (0 applies them on receipt). It should cover the network delay.
+        self.apply_delay = float(self.config.get('apply_delay', 0))
+
+        self.members = []
+        self.sent = 0
+
+        self._wake_ev = Event()
+        self.running_event = Event()
+        self._thread = None
+        self._ticker = None
+
+        self._next_keepalive = self._next_feedback = 0
+
+    @classmethod
+    def from_slaves(cls, slave_machines, config):
+        """
+        Create groups named by the group option of slaves, configured by the
+        slave_group_<name> sections. Return a dict name -> group.
+        """
+        groups = {}
+        for sm in slave_machines.values():
+            name = sm.group_name
+            if not name:
+                continue
+            if name not in groups:
+                gconfig = config['slave_group_{}'.format(name)]
+                groups[name] = cls(name, gconfig['address'], gconfig)
+            groups[name].add(sm)
+        return groups
+
+    def add(self, slave_machine):
+        slave_machine.group = self
+        self.members.append(slave_machine)
+        self.wake()
+
+    def remove(self, slave_machine):
+        self.members.remove(slave_machine)
+        slave_machine.group = None
+
+    def start(self, reactor=None):
+        if self._thread or self._ticker:
+            raise SlaveMachineError('Group {} already started'.format(self.name))
+
+        self.running_event.clear()
+        if reactor is not None:
+            self._ticker = reactor.ticker(self._step)
+            self._ticker.start()
+            return
+
+        self._thread = Thread(target=self.loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def exit(self):
+        self.running_event.set()
+        self._wake_ev.set()
+        if self._ticker:
+            self._ticker.cancel()
+            self._ticker = None
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self):
+        self._wake_ev.set()
+        if self._ticker is not None:
+            self._ticker.wake()
+
+    def loop(self):
+        while not self.running_event.is_set():
+            self._wake_ev.clear()
+            pause, deadline = self._step()
+            if pause:
+                self.running_event.wait(pause)
+            self._wake_ev.wait(max(deadline - time.monotonic(), 0))
+
+    def _step(self):
+        """
+        Send changed values of members once. Return (pause, deadline) like
+        SlaveMachine._watch_step.
+        """
+        now = time.monotonic()
+        keepalive = now >= self._next_keepalive
+        feedback = now >= self._next_feedback
+        if keepalive:
+            self._next_keepalive = now + self.keepalive_interval
+        if feedback:
+            self._next_feedback = now + self.feedback_interval
+
+        values = {}
+        for sm in list(self.members):
+            try:
+                if keepalive:
+                    sm.last_values = {}     # Resend everything
+                    sm._pop_changed()
+                    skeys = sm.forward_keys
+                else:
+                    skeys = sm._pop_changed(feedback=feedback)
+
+                changed = sm._changed_values(skeys) if skeys else None
+                if changed:
+                    values[sm] = changed
+            except Exception as e:
+                logging.error('Exception in {} group loop for {!s}: {!r}'.format(
+                    self.name, sm, e))
+
+        pause = 0
+        if values:
+            try:
+                self.send(values)
+            except Exception as e:
+                logging.error('Unable to send to {} group: {!s}'.format(self.name, e))
+            pause = self.min_interval
+
+        return pause, min(self._next_keepalive, self._next_feedback)
+
+    def send(self, values, apply_at=None):
+        """
+        Send values, a dict slave machine -> list of (key, value), in one
+        bundle, applied at apply_at (master time.time() clock, apply_delay
+        from now by default).
+        """
+        if apply_at is None and self.apply_delay > 0:
+            apply_at = time.time() + self.apply_delay
+
+        messages = []
+        for sm, changed in values.items():
+            pairs = [a for kv in changed for a in kv]
+            if apply_at is not None and sm.clock.synchronized:
+                m = self.driver.message(self.PATH_AT, sm.serialnumber,
+                                        sm.remote_time(apply_at), *pairs)
+            else:
+                m = self.driver.message(self.PATH, sm.serialnumber, *pairs)
+            messages.append(m)
+
+        self.driver.send_bundle(messages)
+        self.sent += 1
+
+        for sm, changed in values.items():
+            sm._mark_sent(changed)
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.name} ({1} slaves)'.format(
+            self, len(self.members))
@@ -0,0 +1,235 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Synchronized moves
+
+A move of several axes (the local one, named machine, and slaves, named by
+serial number) is planned so they all arrive together. The slowest axis
+sets the duration, every other one is slowed down by time scaling: velocity
+scaled by k and accelerations by k², k being its own duration over the
+move's. Profiles keep their shape, stretched in time.
+
+Each axis then gets its velocity, accelerations and target ahead, and go at
+the same time: slaves apply them at a time-stamped start (their clock must
+be synchronized), in one bundle per slave group, the local drive through
+the setpoint scheduler.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from .trajectory import plan_phases, TrajectoryError
+
+logging = logging.getLogger('kastl.motion.coordinator')
+
+
+class CoordinatorError(Exception):
+    pass
+
+
+class AxisMove(object):
+    def __init__(self, axis, distance, velocity, acceleration, deceleration):
+        self.axis = axis
+        self.distance = distance
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.deceleration = deceleration
+
+    @property
+    def duration(self):
+        return move_duration(self.distance, self.velocity, self.acceleration,
+                             self.deceleration)
+
+    def scaled(self, k):
+        return AxisMove(self.axis, self.distance, self.velocity * k,
+                        self.acceleration * k * k, self.deceleration * k * k)
+
+    def __repr__(self):
+        return ('{0.__class__.__name__}: {0.axis} {0.distance} at {0.velocity:.3f} '
+                '({0.acceleration:.3f}/{0.deceleration:.3f})'.format(self))
+
+
+class MovePlan(object):
+    def __init__(self, axes, duration):
+        self.axes = axes        # axis -> AxisMove
+        self.duration = duration
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {1} axes in {0.duration:.3f}s'.format(
+            self, len(self.axes))
+
+
+def move_duration(distance, velocity, acceleration, deceleration=None):
+    "Return the duration of a trapezoidal move of distance from rest to rest"
+    try:
+        return sum(t for t, _, _ in plan_phases(0, [distance], velocity,
+                                                acceleration, deceleration))
+    except TrajectoryError as e:
+        raise CoordinatorError(str(e))
+
+
+def plan_sync(moves):
+    """
+    Return the MovePlan of moves (AxisMove at their own limits) arriving
+    together.
+    """
+    moves = [m for m in moves if m.distance]
+    if not moves:
+        return MovePlan({}, 0.)
+
+    durations = {m.axis: m.duration for m in moves}
+    duration = max(durations.values())
+
+    return MovePlan({m.axis: m.scaled(durations[m.axis] / duration) for m in moves},
+                    duration)
+
+
+class MoveCoordinator(object):
+    LOCAL = 'machine'
+
+    def __init__(self, motion_unit, **kwargs):
+        self.motion_unit = motion_unit
+
+        # Time from dispatch to start, it should cover the network delay
+        self.start_delay = float(kwargs.get('start_delay', 0.05))
+        self.cache_size = int(kwargs.get('cache_size', 32))
+
+        self.hits = 0
+        self.misses = 0
+
+        self._plans = OrderedDict()
+        self._lock = Lock()
+
+    def plan(self, distances, velocity, acceleration, deceleration=None):
+        """
+        Return the MovePlan of distances, a dict axis -> distance or
+        (distance, velocity[, acceleration]) overriding the limits of an
+        axis. Plans are cached.
+        """
+        moves = []
+        for axis, d in distances.items():
+            v, a = velocity, acceleration
+            if isinstance(d, (tuple, list)):
+                d, v, a = (tuple(d) + (v, a)[len(d) - 1:])[:3]
+            moves.append(AxisMove(axis, d, v, a, deceleration or a))
+
+        key = tuple(sorted((m.axis, round(m.distance, 6), m.velocity,
+                            m.acceleration, m.deceleration) for m in moves))
+
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+
+        plan = plan_sync(moves)
+
+        with self._lock:
+            self.misses += 1
+            self._plans[key] = plan
+            while len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def move(self, targets, velocity, acceleration, deceleration=None):
+        """
+        Move axes to targets, a dict axis -> position or (position,
+        velocity[, acceleration]), arriving together. Return the MovePlan.
+        """
+        starts = self.positions(targets.keys())
+
+        distances = {}
+        for axis, t in targets.items():
+            if isinstance(t, (tuple, list)):
+                distances[axis] = (t[0] - starts[axis],) + tuple(t[1:])
+            else:
+                distances[axis] = t - starts[axis]
+
+        plan = self.plan(distances, velocity, acceleration, deceleration)
+        self.dispatch(plan, {axis: starts[axis] + m.distance
+                             for axis, m in plan.axes.items()})
+        return plan
+
+    def positions(self, axes):
+        mu = self.motion_unit
+        slaves = self._slaves(axes)
+
+        positions = {}
+        for axis in axes:
+            if axis == self.LOCAL:
+                positions[axis] = float(mu['machine:position'])
+                continue
+
+            try:
+                value = slaves[axis].get_from_remote('machine:position', block=True)
+            except KeyError:
+                raise CoordinatorError('No slave {}'.format(axis))
+            if not isinstance(value, (int, float)):
+                raise CoordinatorError('No position from slave {}'.format(axis))
+            positions[axis] = float(value)
+
+        return positions
+
+    def dispatch(self, plan, targets, apply_at=None):
+        """
+        Send the move of every axis of plan to its target, starting all of
+        them at apply_at (time.time() clock, start_delay from now by
+        default). Return apply_at.
+        """
+        mu = self.motion_unit
+        slaves = self._slaves(plan.axes)
+
+        for axis in plan.axes:
+            if axis == self.LOCAL:
+                continue
+            if axis not in slaves:
+                raise CoordinatorError('No slave {}'.format(axis))
+            if not slaves[axis].clock.synchronized:
+                raise CoordinatorError('Clock of slave {} is not synchronized'.format(axis))
+
+        if apply_at is None:
+            apply_at = time.time() + self.start_delay
+
+        groups = {}
+        for axis, m in plan.axes.items():
+            values = [
+                ('machine:acceleration', m.acceleration),
+                ('machine:deceleration', m.deceleration),
+                ('machine:velocity_ref', abs(m.velocity)),
+                ('machine:position_ref', targets[axis]),
+            ]
+
+            if axis == self.LOCAL:
+                for key, value in values:
+                    mu.set_unfiltered(key, value)
+                mu.scheduler.schedule(apply_at, 'machine:command:go', True)
+                continue
+
+            values.append(('machine:command:go', True))
+            sm = slaves[axis]
+            if sm.group is not None:
+                groups.setdefault(sm.group, {})[sm] = values
+            else:
+                sm.set_many_to_remote(values, apply_at=apply_at)
+
+        for group, values in groups.items():
+            group.send(values, apply_at=apply_at)
+
+        logging.debug('Dispatched {!r} at {:.6f}'.format(plan, apply_at))
+        return apply_at
+
+    def _slaves(self, axes):
+        if all(axis == self.LOCAL for axis in axes):
+            return {}
+        return {sm.slave.serialnumber: sm
+                for sm in self.motion_unit.slave_machines.values()}
@@ -0,0 +1,182 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Cue engine
+
+A cue is a config section (in the config, its variant or its profile) named
+cue_<name>, listing machine keys to set, in order, with ':' written '.':
+
+    [cue_intro]
+    label = Fly in
+    acceleration = 200
+    velocity_ref = 300
+    position_ref = 1200
+    command.go = True
+
+Cues are compiled once per config revision: keys are checked and values
+parsed, then transformed for each slave by its slave_<serialnumber>
+section. Firing a cue then sends one request to the machine and one per
+slave.
+"""
+
+import logging
+from threading import Lock
+
+from ..drivers.netdata_maps import MicroflexE100Map
+from ..machines.modes.master import MasterMachineMode
+
+logging = logging.getLogger('kastl.motion.cues')
+
+_SLAVE_KEYS = frozenset(MasterMachineMode.DefaultForwardKeys).union(
+    *MasterMachineMode.ForwardKeys.values())
+
+
+def _writable_keys(attr_map):
+    "Return a dict machine key -> type of the writable keys of attr_map"
+    keys = {}
+    for k, p in attr_map.items():
+        for sk, sp in (p.items() if isinstance(p, dict) else ((None, p),)):
+            if 'w' in sp.mode:
+                keys[':'.join(n for n in ('machine', k, sk) if n)] = sp.vtype
+    return keys
+
+
+_KEYS = _writable_keys(MicroflexE100Map)
+
+
+class CueError(Exception):
+    pass
+
+
+def _parse(vtype, value):
+    if vtype == bool:
+        return value in ('True', 'true', 'y', '1')
+    return vtype(value)
+
+
+class Cue(object):
+    def __init__(self, name, label=None):
+        self.name = name
+        self.label = label or name
+        self.steps = []         # (key, value) in order
+        self.slaves = {}        # serialnumber -> [(key, value)]
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.name} ({1} keys, {2} slaves)'.format(
+            self, len(self.steps), len(self.slaves))
+
+
+class CueEngine(object):
+    PREFIX = 'cue_'
+
+    def __init__(self, motion_unit):
+        self.motion_unit = motion_unit
+        self.fired = 0
+
+        self._cues = {}
+        self._revision = None
+        self._lock = Lock()
+
+    def compile(self):
+        """
+        Compile every cue of the config. A cue failing to compile is logged
+        and left out.
+        """
+        config = self.motion_unit.config
+        revision = getattr(config, 'revision', None)
+
+        cues = {}
+        for section in config.all_sections():
+            if not section.startswith(self.PREFIX):
+                continue
+
+            name = section[len(self.PREFIX):]
+            try:
+                cues[name] = self._compile(name, config[section])
+            except Exception as e:
+                logging.error('Unable to compile cue {}: {!s}'.format(name, e))
+
+        with self._lock:
+            self._cues = cues
+            self._revision = revision
+
+        logging.debug('Compiled {} cues'.format(len(cues)))
+        return cues
+
+    def _compile(self, name, section):
+        mu = self.motion_unit
+
+        cue = Cue(name, section.get('label'))
+        for opt, value in section.items():
+            if opt == 'label':
+                continue
+
+            key = 'machine:' + opt.replace('.', ':')
+            if key not in _KEYS:
+                raise CueError('{} is not a writable key'.format(key))
+            try:
+                cue.steps.append((key, _parse(_KEYS[key], value)))
+            except ValueError as e:
+                raise CueError('Bad value for {}: {!s}'.format(key, e))
+
+        if mu.slave_machines:
+            slv_config = mu.slaves_config
+            for key, value in cue.steps:
+                if key not in _SLAVE_KEYS:
+                    continue
+
+                for sn, t in slv_config.table(key).items():
+                    if isinstance(t, Exception):
+                        logging.warning('No {} for {} in cue {}: {!s}'.format(key, sn, name, t))
+                        continue
+                    cue.slaves.setdefault(sn, []).append((key, t.function(value)))
+
+        return cue
+
+    def __getitem__(self, name):
+        if getattr(self.motion_unit.config, 'revision', None) != self._revision:
+            self.compile()
+
+        try:
+            return self._cues[name]
+        except KeyError:
+            raise CueError('No cue named {}'.format(name))
+
+    def go(self, name):
+        """
+        Fire cue name: its values are sent to slaves, then to the machine.
+        Return the cue.
+        """
+        cue = self[name]
+        mu = self.motion_unit
+
+        machine = mu.machine
+        if machine is None:
+            raise CueError('No machine registered')
+
+        if cue.slaves:
+            slaves = {sm.slave.serialnumber: sm for sm in mu.slave_machines.values()}
+            for sn, values in cue.slaves.items():
+                try:
+                    slaves[sn].set_many_to_remote(values)
+                except KeyError:
+                    logging.warning('Slave {} of cue {} is not connected'.format(sn, name))
+
+        machine.set_many_now(cue.steps)
+        for key, value in cue.steps:
+            mu.cache.invalidate(key.split(':', maxsplit=1)[1])
+
+        self.fired += 1
+        return cue
+
+    @property
+    def names(self):
+        if getattr(self.motion_unit.config, 'revision', None) != self._revision:
+            self.compile()
+        return sorted(self._cues.keys())
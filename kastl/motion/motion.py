@@ -11,19 +11,34 @@
 import sys
 import time
 import logging
+import functools
 
 from threading import Event, Thread, Lock
 
 from ..processors.osc.message import OscMessage
-from ..machines import Machine
+from ..machines import Machine, SlaveMachine
+from ..machines.modes.master import SlavesConfig
+from ..machines.cache import TelemetryCache
 from ..remotes import AbstractRemote, RemoteType, get_remote_class
-from ..filters import Filter
+from ..remotes.feedback import FeedbackEngine
+from ..filters import Filter, FilterIndex
 
 from ..drivers.utils import retry
 
 from ..configparser import parameter as _p
+from ..reactor import Reactor
 
 from .exceptions import MotionError, FatalMotionError
+from .telemetry import TelemetryService
+from .scheduler import SetpointScheduler
+from .watchdog import WatchdogService
+from .request import MotionRequestScheduler
+from .status import StatusPublisher
+from .trajectory import TrajectoryPlayer, LocalAxis, plan
+from .cues import CueEngine
+from .coordinator import MoveCoordinator
+from .smoothing import SmoothingStage
+from ..status_table import StatusTableError
 
 
 logging = logging.getLogger('kastl.motion')
@@ -32,6 +47,7 @@ logging = logging.getLogger('kastl.motion')
 class MotionUnit(object):
     def __init__(self, *args, **kwargs):
         AbstractRemote.send_message = self.send_message
+        SlaveMachine.machine = self
         # AbstractMachine.MOTIONSERVER = self
 
         self.fatal_event = Event()
@@ -45,25 +61,45 @@ class MotionUnit(object):
 
         self.comms = {}
         self.processors = {}
+        self.dispatcher = None
         self.commands = None
         self.synced_commands = None
         self.unbuffered_commands = None
 
         self.machines = {}
         self.alive_machines = {}
+        self.slave_machines = {}
         self.remotes = {}
         self.alive_remotes = {}
 
         self._last_command_time = time.time()
         self.running_ev = Event()
-        self.timeout_ev = Event()
+        self.timeout_ev = Event()       # Drive disabled by a master timeout
+        self._reenable_drive = False
 
         self.switch_callback = self._switch_cb
         self.switch_states = {}
 
-        self.target_filters = list()
+        self.target_filters = FilterIndex()
         self.local_status = dict()
 
+        self.cache = TelemetryCache(self._read_drive)
+        self.cache.add_listener(self._sampled)
+        self._slaves_config = None
+        self.telemetry = None
+        self.scheduler = None
+        self.feedback = None
+        self.motion_requests = None
+        self.status_publisher = None
+        self.trajectories = None
+        self.cues = None
+        self.coordinator = None
+        self.smoothing = None
+
+        # Drives every machine and slave, instead of threads of their own
+        self.reactor = None
+        self.watchdog = None
+
     def start(self):
         self.register_filter(alias_mask='/identify', protocol='OSC', exclusive=True, is_reply=True,
                              target=self.update_alive_machines, args_length=2)
@@ -75,6 +111,28 @@ class MotionUnit(object):
                              target=self.update_alive_units, args_length=3)
         self.register_filter(alias_mask='/remote/connect', protocol='OSC', exclusive=True,
                              target=self.connect_remote, args_length=1)
+        self.reactor = Reactor()
+        self.reactor.start()
+        self.start_watchdog(**self._config_section('watchdog'))
+        self.cache.configure(**self._config_section('cache'))
+        self.telemetry = TelemetryService(self, **self._config_section('telemetry'))
+        self.telemetry.start(self.reactor)
+        self.scheduler = SetpointScheduler(self, **self._config_section('scheduler'))
+        self.scheduler.start(self.reactor)
+        self.feedback = FeedbackEngine(self.local_status, self.cache,
+                                       **self._config_section('feedback'))
+        self.feedback.start(self.reactor)
+        self.motion_requests = MotionRequestScheduler(
+            self, **self._config_section('motion_requests'))
+        self.motion_requests.start(self.reactor)
+        self.trajectories = TrajectoryPlayer(**self._config_section('trajectory'))
+        self.trajectories.start(self.reactor)
+        self.cues = CueEngine(self)
+        self.cues.compile()
+        self.coordinator = MoveCoordinator(self, **self._config_section('coordinator'))
+        self.start_smoothing(**self._config_section('smoothing'))
+        self.start_status_publisher(**self._config_section('status_table'))
+
         self.discover_nodes()
 
         # Add a serial remote
@@ -86,6 +144,21 @@ class MotionUnit(object):
 
         self.running_ev.set()
 
+        if self.telemetry:
+            self.telemetry.stop()
+
+        if self.scheduler:
+            self.scheduler.stop()
+
+        if self.motion_requests:
+            self.motion_requests.stop()
+
+        if self.trajectories:
+            self.trajectories.stop()
+
+        if self.smoothing:
+            self.smoothing.stop()
+
         if self.machines:
             for m in self.machines.values():
                 m.exit()
@@ -94,24 +167,44 @@ class MotionUnit(object):
             for r in self.remotes.values():
                 r.exit()
 
+        if self.feedback:
+            self.feedback.stop()
+
+        if self.status_publisher:
+            self.status_publisher.stop()
+
+        if self.reactor:
+            self.reactor.stop()
+
+        if self.watchdog:
+            self.watchdog.stop()
+
     def handle(self, msg, **kwargs):
         """
         Filter a message coming from a processor, apply filters
         and decide what to do
         """
 
-        for f in self.target_filters:
-            if f.accepts(msg):
-                try:
-                    f.handle(msg)
-                    logging.debug('%s handled by %s', repr(msg), str(f))
-                    if f.is_exclusive:
-                        return
-                except Exception as e:
-                    me = MotionError('Unexpected exception: ' + str(e), e)
-                    logging.exception(me)
+        for f in self.target_filters.match(msg):
+            try:
+                f.handle(msg)
+                logging.debug('%s handled by %s', repr(msg), str(f))
+                if f.is_exclusive:
+                    return
+            except Exception as e:
+                me = MotionError('Unexpected exception: ' + str(e), e)
+                logging.exception(me)
+
+        # Not handled by an exclusive filter, run the matching command
+        try:
+            p = self.processors[msg.protocol]
+        except KeyError:
+            return
 
-        # p.execute(m)
+        if msg.command not in p.commands:
+            logging.debug('No command for %s', repr(msg))
+            return
+        p.execute(msg)
 
     def discover_nodes(self):
         """
@@ -178,7 +271,7 @@ class MotionUnit(object):
         else:
             new_filter = Filter(**kwargs)
 
-        self.target_filters.append(new_filter)
+        self.target_filters.add(new_filter)
 
     def register_machine(self, sn=None, ip=None):
         if sn is None and ip is None:
@@ -220,7 +313,7 @@ class MotionUnit(object):
 
         logging.info('Machine %s registered.', str(machine))
 
-        machine.start()
+        machine.start(reactor=self.reactor)
 
     def register_remote(self, remote_type, sn=None, ip=None):
         asn, aip = None, None
@@ -274,10 +367,101 @@ class MotionUnit(object):
         self.remotes[remote.uid] = remote
 
         remote.local_status = self.local_status     # Connect remote local status to local status
+        remote.cache = self.cache
+        remote.feedback = self.feedback
+        remote.motion_requests = self.motion_requests
+
+        timeout = float(self._config_section('watchdog').get('remote_timeout', 0))
+        if timeout > 0 and self.watchdog:
+            name = 'remote:{}'.format(remote.uid)
+            self.watchdog.unwatch(name)
+            remote.watch = self.watchdog.watch(
+                name, timeout, functools.partial(self._remote_timeout, remote),
+                recover=functools.partial(self._remote_recover, remote))
         remote.start()
         logging.debug('Registered %s', repr(remote))
         return remote
 
+    def move(self, waypoints, velocity, acceleration, deceleration=None, jerk=None):
+        """
+        Plan a move of the local axis from its position through waypoints,
+        then stream it. Return its profile.
+        """
+        start = float(self['machine:position'])
+        profile = plan(start, waypoints, velocity, acceleration, deceleration,
+                       jerk, dt=1 / self.trajectories.rate)
+        self.trajectories.play('machine', profile, LocalAxis(self))
+        return profile
+
+    def notify_slaves(self, key):
+        "Wake slaves following key so the change is forwarded right away"
+        for sm in self.slave_machines.values():
+            sm.notify(key)
+
+    def get_value_for_slave(self, slave, key, value=None):
+        """
+        Return the value of key for slave, transformed as configured in its
+        slave_<serialnumber> section. The master value is read if not given.
+        """
+        t = self.slaves_config.transform(slave.slave.serialnumber, key)
+        if t.mode == 'default':
+            return t.value
+
+        if value is None:
+            value = self[key]
+        return t.function(value)
+
+    def start_status_publisher(self, **kwargs):
+        """
+        Publish status keys in a shared-memory table for local tools. No
+        path or no keys disables it.
+        """
+        publisher = StatusPublisher(self.local_status, self.cache, **kwargs)
+        if not publisher.path or not publisher.keys:
+            return
+
+        try:
+            publisher.start(self.reactor)
+            self.status_publisher = publisher
+        except (OSError, StatusTableError) as e:
+            logging.error('Unable to publish status in %s: %s', publisher.path, e)
+
+    def start_smoothing(self, **kwargs):
+        """
+        Smooth setpoints of the configured keys before they reach the
+        drive. No keys disables it.
+        """
+        smoothing = SmoothingStage(self, **kwargs)
+        if not smoothing.filters:
+            return
+
+        smoothing.start(self.reactor)
+        self.smoothing = smoothing
+
+    def start_watchdog(self, **kwargs):
+        """
+        Start the watchdog service and watch links of the motion unit: master
+        (in slave mode) and drive. A timeout of 0 disables a watch.
+        """
+        self.watchdog = WatchdogService(**kwargs)
+
+        timeout = float(kwargs.get('master_timeout', 0))
+        if timeout > 0:
+            self.watchdog.watch('master', timeout, self._master_timeout,
+                                recover=self._master_recover)
+
+        timeout = float(kwargs.get('drive_timeout', 0))
+        if timeout > 0:
+            self.watchdog.watch('drive', timeout, self._drive_timeout,
+                                recover=self._drive_recover)
+
+        self.watchdog.start()
+
+    def heartbeat(self, name):
+        "Feed the watch of a link"
+        if self.watchdog:
+            self.watchdog.feed(name)
+
     def connect_remote(self, m):
         try:
             tp = RemoteType[m.args[0]]
@@ -295,6 +479,8 @@ class MotionUnit(object):
             self.send_message(command.protocol, command.answer)
 
     def send_message(self, msg):
+        if self.dispatcher is not None:
+            return self.dispatcher.send_message(msg)
         self.comms[msg.protocol].send_message(msg)
 
 
@@ -336,6 +522,21 @@ class MotionUnit(object):
         except TypeError:
             return 0
 
+    @property
+    def slaves_config(self):
+        "Value transforms of the slave machines"
+        if self._slaves_config is None:
+            self._slaves_config = SlavesConfig(self.config, self.slave_machines)
+        elif self._slaves_config.keys() != frozenset(
+                sm.slave.serialnumber for sm in self.slave_machines.values()):
+            self._slaves_config.update_slave_configs(self.slave_machines)
+        return self._slaves_config
+
+    @property
+    def machine(self):
+        "The machine driven by this unit, the first registered"
+        return next(iter(self.machines.values()), None)
+
     @property
     def ip_address(self):
         ip, mask = self.ethernet_interface.ips[-1].split('/')
@@ -355,6 +556,60 @@ class MotionUnit(object):
 
 
     # Privates
+    def _read_drive(self, key):
+        key = 'machine:' + key.replace('.', ':')
+        value = self._get_destination(key).read(key)
+        self.heartbeat('drive')
+        return value
+
+    def _sampled(self, key, value):
+        # A new value read from the machine, slaves following it are woken
+        self.notify_slaves('machine:' + key.replace('.', ':'))
+
+    def _master_timeout(self, watch):
+        logging.error('No message from master for %ss, disabling drive', watch.timeout)
+        self.timeout_ev.set()
+        self._disable_drive()
+
+    def _master_recover(self, watch):
+        # The next command of the master enables the drive again
+        logging.info('Master is back, drive enabled on its next command')
+        self.timeout_ev.clear()
+        self._reenable_drive = True
+
+    def _disable_drive(self):
+        "Disable the drive now, bypassing smoothing and slaves"
+        machine = self.machine
+        if machine is None:
+            logging.error('No machine registered, unable to disable drive')
+            return
+
+        machine.set_now('machine:command:enable', False)
+        self.cache.invalidate('command:enable')
+
+    def _drive_timeout(self, watch):
+        logging.error('Drive link lost for %ss', watch.timeout)
+        self.fatal_event.set()
+
+    def _drive_recover(self, watch):
+        self.fatal_event.clear()
+
+    def _remote_timeout(self, remote, watch):
+        logging.error('No message from %s for %ss, disabling drive', remote, watch.timeout)
+        remote.timeount_ev.set()
+        if self.motion_requests:
+            self.motion_requests.release(remote)
+        self._disable_drive()
+
+    def _remote_recover(self, remote, watch):
+        remote.timeount_ev.clear()
+
+    def _config_section(self, section):
+        try:
+            return dict(self.config[section])
+        except KeyError:
+            return dict()
+
     def _switch_cb(self, sw_state):
         if sw_state['function']:
             n, f, h = sw_state['name'], sw_state['function'], sw_state['hit']
@@ -373,37 +628,60 @@ class MotionUnit(object):
                     logging.info('Switch: {0} toggled ({1}) with {2}'.format(
                         f, 'on' if not sw_st else 'off', n))
 
-    def __getitem__(self, key):
-        dst = self._get_destination(key)
-        key = key.split(':', maxsplit=1)[1]
+    def _get_destination(self, key):
+        "Return the machine holding key"
+        if key.split(':', maxsplit=1)[0] != 'machine':
+            raise KeyError(key)
 
-        if dst is not self:
-            return dst[key]
+        machine = self.machine
+        if machine is None:
+            raise MotionError('No machine registered')
+        return machine
 
-        return self.machine_keys[key]
+    def __getitem__(self, key):
+        self._get_destination(key)
+        return self.cache.get(key.split(':', maxsplit=1)[1])
 
     def __setitem__(self, key, value):
         if isinstance(value, (tuple, list)) and len(value) == 1:
             value, = value
 
         dst = self._get_destination(key)
-        key = key.split(':', maxsplit=1)[1]
-
-        if dst is not self:
-            dst[key] = value
-            return dst[key]
-
-        if self.slave_mode:
-            if self._timeout_event.is_set() and not self['machine:status:drive_enable']:
-                self.machine_keys['machine:command:enable'] = True
-                self._timeout_event.clear()
-            self._last_command_time = time.time()
-        elif self.master_mode:
-            if 'command:enable' in key:
-                for sm in self.slave_machines.values():
-                    sm.set_to_remote('machine:command:enable', True if value else False)
-
-        self.machine_keys[key] = value
+        nk = key.split(':', maxsplit=1)[1]
+
+        self._last_command_time = time.time()
+        if self._reenable_drive:
+            self._reenable_drive = False
+            if nk != 'command:enable':
+                dst.set_now('machine:command:enable', True)
+                self.cache.invalidate('command:enable')
+
+        if nk == 'command:enable':
+            for sm in self.slave_machines.values():
+                sm.set_to_remote('machine:command:enable', True if value else False)
+
+        if self.smoothing and nk in self.smoothing:
+            self.smoothing.put(nk, value)
+        else:
+            dst.set_now(key, value)
+            self.cache.invalidate(nk)
+
+        self.notify_slaves(key)
+
+    def set_unfiltered(self, key, value):
+        """
+        Set key bypassing setpoint smoothing, for setpoints already shaped
+        (streamed or planned moves).
+        """
+        dst = self._get_destination(key)
+        nk = key.split(':', maxsplit=1)[1]
+        if self.smoothing and nk in self.smoothing:
+            self.smoothing.bypass(nk, value)
+        else:
+            dst.set_now(key, value)
+            self.cache.invalidate(nk)
+
+        self.notify_slaves(key)
 
     def getitem(self, key):
         return getattr(self, key)
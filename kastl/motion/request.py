@@ -7,11 +7,27 @@
 # Distributed under terms of the GPLv3+ license.
 
 """
+Motion requests
 
+Requests issued by remotes are applied by a single reactor ticker, never in
+the message path. A request supersedes any queued request of the same kind on
+the same target. Each target (axis) is owned by one remote at a time: the
+owner keeps it as long as it sends requests within the lease, or until a
+remote with a higher priority takes it over.
 """
 
+import logging
+import time
+from collections import OrderedDict
+from threading import Event, Lock
 
-from threading import Event
+from ..reactor import ReactorService
+
+logging = logging.getLogger('kastl.motion.request')
+
+
+class MotionRequestError(Exception):
+    pass
 
 
 class MotionRequest(object):
@@ -25,21 +41,189 @@ class MotionRequest(object):
         'deceleration': float,
     }
 
+    # Machine key written by each request type, velocity is read-only
+    KEYS = {
+        'velocity': 'velocity_ref',
+        'acceleration': 'acceleration',
+        'deceleration': 'deceleration',
+    }
+
     def __init__(self, request_type, *args, **kwargs):
         if request_type not in self.TYPES:
             raise ValueError('No request type named %s', request_type)
 
+        self.request_type = request_type
+        self.target = kwargs.get('target', 'machine')
+        self.remote = kwargs.get('remote', None)
+        self.callback = kwargs.get('callback', None)
+
         self.done_ev = Event()
         self.result = None
+        self.error = None
+        self.superseded = False
         self.args = args
+        self.stamp = time.time()
+
+    @property
+    def key(self):
+        return '{}:{}'.format(self.target, self.KEYS[self.request_type])
+
+    @property
+    def value(self):
+        return self.TYPES[self.request_type](self.args[0])
 
     def set_done(self, result=None):
         if result is not None:
             self.result = result
 
         self.done_ev.set()
+        self._callback()
+
+    def set_error(self, error):
+        self.error = error
+        self.done_ev.set()
+        self._callback()
+
+    def supersede(self, newer):
+        self.superseded = True
+        self.result = newer
+        self.done_ev.set()
+        self._callback()
+
+    def _callback(self):
+        if self.callback is None:
+            return
+        try:
+            self.callback(self)
+        except Exception as e:
+            logging.exception('Exception in motion request callback: %s', e)
 
     @property
     def done(self):
         return self.done_ev.is_set()
 
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.key} {1}'.format(
+            self, ' '.join(map(str, self.args)))
+
+
+class AxisArbiter(object):
+    """
+    Give each target to one owner at a time.
+    """
+
+    def __init__(self, lease=1.0):
+        self.lease = lease
+        self._owners = {}   # target -> (owner, priority, expires)
+        self._lock = Lock()
+
+    def acquire(self, target, owner, priority=0, now=None):
+        """
+        Return True if owner now owns target: it was free, expired, already
+        owned by owner or by a lower priority.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            current = self._owners.get(target)
+            if current is not None:
+                cowner, cpriority, expires = current
+                if cowner is not owner and expires > now and cpriority >= priority:
+                    return False
+                if cowner is not owner:
+                    logging.info('%s taken over by %r', target, owner)
+            self._owners[target] = (owner, priority, now + self.lease)
+            return True
+
+    def release(self, owner, target=None):
+        with self._lock:
+            for t, (o, _, _) in list(self._owners.items()):
+                if o is owner and (target is None or t == target):
+                    del self._owners[t]
+
+    def owner(self, target, now=None):
+        now = time.time() if now is None else now
+        current = self._owners.get(target)
+        if current is None or current[2] <= now:
+            return None
+        return current[0]
+
+
+class MotionRequestScheduler(ReactorService):
+    def __init__(self, motion_unit, **kwargs):
+        super().__init__()
+        self.motion_unit = motion_unit
+        self.arbiter = AxisArbiter(float(kwargs.get('ownership_lease', 1)))
+        self.max_pending = int(kwargs.get('max_pending', 64))
+
+        self.applied = 0
+        self.superseded = 0
+        self.refused = 0
+
+        self._pending = OrderedDict()   # (target, type) -> request
+        self._lock = Lock()
+
+    def submit(self, request):
+        """
+        Queue request and return at once. Its callback is called when it is
+        applied, superseded or refused.
+        """
+        priority = getattr(request.remote, 'MOTION_PRIORITY', 0)
+        if not self.arbiter.acquire(request.target, request.remote, priority):
+            self.refused += 1
+            request.set_error(MotionRequestError('{} is owned by {!r}'.format(
+                request.target, self.arbiter.owner(request.target))))
+            return request
+
+        slot = (request.target, request.request_type)
+        with self._lock:
+            older = self._pending.pop(slot, None)
+            if older is None and len(self._pending) >= self.max_pending:
+                error = MotionRequestError('Too many pending motion requests')
+            else:
+                error = None
+                self._pending[slot] = request
+
+        if error is None:
+            self.wake()
+        if older is not None:
+            self.superseded += 1
+            older.supersede(request)
+        if error is not None:
+            self.refused += 1
+            request.set_error(error)
+
+        return request
+
+    def release(self, remote):
+        "Release targets owned by remote and drop its pending requests"
+        self.arbiter.release(remote)
+
+        with self._lock:
+            dropped = [s for s, r in self._pending.items() if r.remote is remote]
+            dropped = [self._pending.pop(s) for s in dropped]
+
+        for r in dropped:
+            r.set_error(MotionRequestError('Request cancelled'))
+
+    def apply(self, request):
+        try:
+            self.motion_unit[request.key] = request.value
+            self.applied += 1
+            request.set_done(request.value)
+        except Exception as e:
+            logging.error('Unable to apply %r: %s', request, e)
+            request.set_error(e)
+
+    def tick(self, now):
+        "Apply pending requests, oldest first"
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return None
+                _, request = self._pending.popitem(last=False)
+
+            self.apply(request)
+
+    @property
+    def pending(self):
+        return len(self._pending)
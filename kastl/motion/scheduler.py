@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Setpoint scheduler
+
+Values received with an "apply at" time (in local clock, converted by the
+master) are written to the machine at that time, so several slaves start
+together whatever the network jitter.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from threading import Lock
+
+from ..reactor import ReactorService
+
+logging = logging.getLogger('kastl.motion.scheduler')
+
+
+class SchedulerError(Exception):
+    pass
+
+
+class SetpointScheduler(ReactorService):
+    def __init__(self, motion_unit, **kwargs):
+        super().__init__()
+        self.motion_unit = motion_unit
+
+        # Values later than this are refused, it would rather be a clock issue
+        self.max_delay = float(kwargs.get('max_delay', 10))
+
+        self.applied = 0
+        self.late = 0
+        self.max_lateness = 0
+
+        self._queue = []
+        self._counter = itertools.count()
+        self._lock = Lock()
+
+    def schedule(self, apply_at, key, value):
+        """
+        Write value to key at apply_at (time.time() clock). Past times are
+        applied right away.
+        """
+        if apply_at - time.time() > self.max_delay:
+            raise SchedulerError('{} is scheduled too far in the future'.format(key))
+
+        with self._lock:
+            heapq.heappush(self._queue, (apply_at, next(self._counter), key, value))
+        self.wake()
+
+    def cancel(self, key=None):
+        "Drop pending values (of key, or all)"
+        with self._lock:
+            if key is None:
+                self._queue = []
+            else:
+                self._queue = [e for e in self._queue if e[2] != key]
+                heapq.heapify(self._queue)
+
+    def tick(self, now):
+        """
+        Apply due values and return the next apply time.
+        """
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue))
+            next_time = self._queue[0][0] if self._queue else None
+
+        for apply_at, _, key, value in due:
+            lateness = now - apply_at
+            self.max_lateness = max(self.max_lateness, lateness)
+            if lateness > 0.001:
+                self.late += 1
+            try:
+                self.motion_unit[key] = value
+                self.applied += 1
+            except Exception as e:
+                logging.error('Unable to apply {}: {!s}'.format(key, e))
+
+        return next_time
+
+    @property
+    def pending(self):
+        return len(self._queue)
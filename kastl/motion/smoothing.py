@@ -0,0 +1,200 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Setpoint smoothing
+
+Values of smoothed keys set on the motion unit don't go to the drive right
+away: they become the target of a filter, stepped at a fixed rate. Each
+step moves the output toward the target through a first-order low-pass,
+then a slew rate limit. Changes of the target smaller than the dead-band
+are ignored, and the output is written only when it moved by more than the
+threshold since the last write, or when it reaches the target.
+"""
+
+import logging
+import math
+import time
+from threading import Lock
+
+from ..reactor import ReactorService
+
+logging = logging.getLogger('kastl.motion.smoothing')
+
+
+class SmoothingError(Exception):
+    pass
+
+
+class SetpointFilter(object):
+    EPSILON = 1e-9
+
+    def __init__(self, slew=0, time_constant=0, deadband=0, threshold=0):
+        self.slew = float(slew)                     # units/s, 0 is unlimited
+        self.time_constant = float(time_constant)   # s, 0 is no low-pass
+        self.deadband = float(deadband)
+        self.threshold = float(threshold)
+
+        self.target = None
+        self.filtered = None
+        self.output = None
+        self.written = None
+
+    def reset(self, value):
+        self.target = self.filtered = self.output = self.written = float(value)
+
+    def put(self, value):
+        """
+        Set the target. Return False if the change is within the dead-band.
+        """
+        value = float(value)
+        if self.target is None:
+            self.reset(value)
+            self.written = None
+            return True
+
+        # A stop always goes through
+        if value and abs(value - self.target) < self.deadband:
+            return False
+
+        self.target = value
+        return True
+
+    def step(self, dt):
+        """
+        Move the output by dt seconds. Return the value to write, or None.
+        """
+        if self.target is None or self.idle:
+            return None
+
+        if self.time_constant > 0:
+            filtered = self.filtered + (self.target - self.filtered) * dt / (self.time_constant + dt)
+            # Snap to the target once a step no longer gets closer
+            if filtered == self.filtered or \
+                    abs(self.target - filtered) <= max(self.threshold, self.EPSILON):
+                filtered = self.target
+            self.filtered = filtered
+        else:
+            self.filtered = self.target
+
+        delta = self.filtered - self.output
+        if self.slew > 0 and abs(delta) > self.slew * dt:
+            self.output += math.copysign(self.slew * dt, delta)
+        else:
+            self.output = self.filtered
+
+        if self.written is None or abs(self.output - self.written) > self.threshold or \
+                (self.output == self.target and self.written != self.target):
+            self.written = self.output
+            return self.output
+        return None
+
+    @property
+    def idle(self):
+        return self.output == self.target and self.written == self.target
+
+
+class SmoothingStage(ReactorService):
+    """
+    Filters of keys of the registered machine, configured per key with
+    <key>_slew, <key>_time_constant, <key>_deadband and <key>_threshold,
+    falling back on slew, time_constant, deadband and threshold.
+    """
+
+    OPTIONS = ('slew', 'time_constant', 'deadband', 'threshold')
+
+    def __init__(self, motion_unit, **kwargs):
+        super().__init__()
+        self.motion_unit = motion_unit
+
+        self.rate = float(kwargs.get('rate', 50))
+        if self.rate <= 0:
+            raise SmoothingError('Rate must be positive')
+
+        keys = kwargs.get('keys', '')
+        if isinstance(keys, str):
+            keys = [k.strip() for k in keys.split(',')]
+
+        self.filters = {}
+        for key in (k for k in keys if k):
+            options = {o: kwargs.get('{}_{}'.format(key, o), kwargs.get(o, 0))
+                       for o in self.OPTIONS}
+            self.filters[key] = SetpointFilter(**options)
+
+        self.received = 0
+        self.ignored = 0
+        self.writes = 0
+
+        self._lock = Lock()
+
+    def __contains__(self, key):
+        return key in self.filters
+
+    def put(self, key, value):
+        "Set the target of key, written by the next ticks"
+        f = self.filters[key]
+        current = self._current(key) if f.target is None else None
+        with self._lock:
+            if f.target is None and current is not None:
+                f.reset(current)
+            accepted = f.put(value)
+
+        self.received += 1
+        if not accepted:
+            self.ignored += 1
+            return
+        self.wake()
+
+    def bypass(self, key, value):
+        "Write value to key now, the filter restarts from it"
+        with self._lock:
+            self.filters[key].reset(value)
+        self._write(key, value)
+
+    def _write(self, key, value):
+        mu = self.motion_unit
+        if mu.machine is None:
+            raise SmoothingError('No machine registered')
+
+        mu.machine.set_now('machine:' + key, value)
+        mu.cache.invalidate(key)
+
+    def _current(self, key):
+        # The current setpoint, to start from rather than jumping from 0. Read
+        # without holding the lock or waiting, so ticks are never held up
+        try:
+            return self.motion_unit.cache.get(key, block=False)
+        except Exception as e:
+            logging.debug('No current value of {}: {!s}'.format(key, e))
+            return None
+
+    def step(self):
+        # Tick at rate while a filter is busy, then wait to be woken
+        period = 1 / self.rate
+        busy = self.tick(period)
+        return period, time.monotonic() + (period if busy else self.idle_interval)
+
+    def tick(self, dt):
+        """
+        Step every filter by dt and write changed outputs. Return False once
+        every filter is idle.
+        """
+        with self._lock:
+            outputs = [(k, f.step(dt)) for k, f in self.filters.items()]
+            busy = any(f.target is not None and not f.idle for f in self.filters.values())
+
+        for key, value in outputs:
+            if value is None:
+                continue
+            try:
+                self._write(key, value)
+                self.writes += 1
+            except Exception as e:
+                logging.error('Unable to write {}: {!s}'.format(key, e))
+
+        return busy
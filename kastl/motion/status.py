@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Status publisher
+
+Keeps the shared-memory status table up to date: keys are sampled at a
+fixed rate through the telemetry cache, and values read by anyone else in
+between are written as soon as they change.
+"""
+
+import logging
+import time
+from threading import Lock
+
+from ..machines.cache import get_status
+from ..reactor import ReactorService
+from ..status_table import StatusTable, StatusTableError
+
+logging = logging.getLogger('kastl.motion.status')
+
+
+class StatusPublisher(ReactorService):
+    def __init__(self, local_status=None, cache=None, **kwargs):
+        super().__init__()
+        self.local_status = local_status if local_status is not None else {}
+        self.cache = cache
+
+        self.path = kwargs.get('path', '/dev/shm/kastl.status')
+        self.rate = float(kwargs.get('rate', 20))
+        keys = kwargs.get('keys', '')
+        if isinstance(keys, str):
+            keys = [k.strip() for k in keys.split(',')]
+        self.keys = tuple(k for k in keys if k)
+
+        self.table = None
+        self._table_lock = Lock()
+        self._next_tick = 0
+
+    def start(self, reactor):
+        if self._ticker is not None:
+            raise StatusTableError('Status publisher already started')
+
+        self.table = StatusTable(self.path, self.keys)
+        self.table.open()
+        if self.cache is not None:
+            self.cache.add_listener(self._cache_changed)
+
+        self._next_tick = time.monotonic()
+        super().start(reactor)
+
+    def stop(self):
+        if self.cache is not None:
+            self.cache.remove_listener(self._cache_changed)
+        super().stop()
+
+        # A listener already called may still be writing
+        with self._table_lock:
+            table, self.table = self.table, None
+        if table:
+            table.close()
+
+    exit = stop
+
+    def sample(self, key):
+        "Return key from local status, or else from the telemetry cache"
+        return get_status(self.local_status, self.cache, key, block=False)
+
+    def step(self):
+        self.tick()
+        # Late, don't try to catch up
+        self._next_tick = max(self._next_tick + 1 / self.rate, time.monotonic())
+        return 0, self._next_tick
+
+    def tick(self, now=None):
+        now = time.time() if now is None else now
+        for k in self.keys:
+            try:
+                self.table.set(k, self.sample(k), now)
+            except Exception as e:
+                logging.debug('Unable to sample %s: %s', k, e)
+
+    def _cache_changed(self, key, value):
+        with self._table_lock:
+            if self.table is not None:
+                self.table.set('machine.' + key, value)
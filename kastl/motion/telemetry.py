@@ -0,0 +1,195 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Telemetry subscriptions
+
+A remote node subscribes to a set of keys at a given rate and receives a
+push message each time one of those values changes, instead of polling
+every key with /machine/get.
+"""
+
+import time
+import logging
+from threading import Lock
+
+from ..processors.osc.message import OscMessage, OscAddress
+from ..reactor import ReactorService
+
+logging = logging.getLogger('kastl.motion.telemetry')
+
+
+class TelemetryError(Exception):
+    pass
+
+
+class Subscription(object):
+    """
+    Keys pushed to a target at a given rate until the lease expires.
+    """
+
+    def __init__(self, target, keys, rate, lease):
+        self.target = target
+        self.keys = ()
+        self.last_values = {}
+        self.next_push = 0
+
+        self.update(keys, rate, lease)
+
+    def update(self, keys, rate, lease):
+        if rate <= 0:
+            raise TelemetryError('Rate must be positive')
+
+        keys = tuple(keys)
+        if keys != self.keys:
+            self.keys = keys
+            self.last_values = {}
+
+        self.interval = 1 / rate
+        self.lease = lease
+        self.renew()
+
+    def renew(self, now=None):
+        self.expires = (now or time.time()) + self.lease
+
+    def expired(self, now):
+        return now > self.expires
+
+    def changes(self, samples):
+        """
+        Return a flat list of key, value for values changed since last push.
+        """
+        changed = []
+        for k in self.keys:
+            try:
+                v = samples[k]
+            except KeyError:
+                continue
+
+            if k in self.last_values and self.last_values[k] == v:
+                continue
+
+            self.last_values[k] = v
+            changed.extend((k, v))
+
+        return changed
+
+    @property
+    def uid(self):
+        return (self.target.hostname, self.target.port)
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.target!r} {1} @ {2:.1f}Hz'.format(
+            self, ' '.join(self.keys), 1 / self.interval)
+
+
+class TelemetryService(ReactorService):
+    """
+    Push subscribed values to remote nodes.
+
+    A single reactor ticker serves every subscription: on each tick, keys
+    needed by due subscriptions are sampled once and only changed values are
+    sent.
+    """
+
+    PUSH_PATH = '/machine/subscribe/data'
+
+    def __init__(self, motion_unit, **kwargs):
+        super().__init__()
+        self.motion_unit = motion_unit
+
+        self.lease = float(kwargs.get('lease', 10))
+        self.max_rate = float(kwargs.get('max_rate', 50))
+        self.max_subscriptions = int(kwargs.get('max_subscriptions', 16))
+
+        self._subscriptions = {}
+        self._lock = Lock()
+
+    def subscribe(self, target, keys, rate):
+        """
+        Create or renew a subscription for target.
+
+        Returns the lease duration in seconds.
+        """
+        if not keys:
+            raise TelemetryError('No keys to subscribe to')
+
+        rate = min(float(rate), self.max_rate)
+        target = OscAddress(hostname=target.hostname, port=target.port)
+        uid = (target.hostname, target.port)
+
+        with self._lock:
+            sub = self._subscriptions.get(uid)
+            if sub is not None:
+                sub.update(keys, rate, self.lease)
+            else:
+                if len(self._subscriptions) >= self.max_subscriptions:
+                    raise TelemetryError('Too many subscriptions')
+                sub = Subscription(target, keys, rate, self.lease)
+                self._subscriptions[uid] = sub
+                logging.info('New subscription: %r', sub)
+
+        self.wake()
+        return self.lease
+
+    def unsubscribe(self, target):
+        with self._lock:
+            sub = self._subscriptions.pop((target.hostname, target.port), None)
+
+        if sub is None:
+            raise TelemetryError('No subscription for {!r}'.format(target))
+        logging.info('Removed subscription: %r', sub)
+
+    def sample(self, key):
+        v = self.motion_unit.local_status.get(key)
+        if v is None:
+            return self.motion_unit[key]
+        if callable(v):
+            return v()
+        return v
+
+    def tick(self, now):
+        """
+        Push due subscriptions and return the next push time.
+        """
+        with self._lock:
+            for uid in [u for u, s in self._subscriptions.items() if s.expired(now)]:
+                logging.info('Subscription expired: %r', self._subscriptions.pop(uid))
+            subs = list(self._subscriptions.values())
+
+        due = [s for s in subs if s.next_push <= now]
+
+        samples = {}
+        for sub in due:
+            for k in sub.keys:
+                if k in samples:
+                    continue
+                try:
+                    samples[k] = self.sample(k)
+                except Exception as e:
+                    logging.debug('Unable to sample %s: %s', k, e)
+
+        for sub in due:
+            sub.next_push = now + sub.interval
+            changed = sub.changes(samples)
+            if not changed:
+                continue
+
+            m = OscMessage(self.PUSH_PATH, *changed, receiver=sub.target)
+            try:
+                self.motion_unit.send_message(m)
+            except Exception as e:
+                logging.error('Unable to push to %r: %s', sub.target, e)
+
+        if not subs:
+            return None
+        return min(s.next_push for s in subs)
+
+    @property
+    def subscriptions(self):
+        return list(self._subscriptions.values())
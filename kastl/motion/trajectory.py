@@ -0,0 +1,336 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Trajectory generator
+
+A move through one or more waypoints is planned once, up front, and sampled
+at a fixed period into velocity and position arrays. Playing it then costs
+an array index per tick.
+
+Segments are trapezoidal. Consecutive segments in the same direction are
+blended: a look-ahead pass computes the highest velocity at each waypoint
+that still lets every segment accelerate and decelerate within its length,
+so the axis doesn't stop at each waypoint. With a jerk limit, the sampled
+velocity is smoothed by a moving average as long as the acceleration time
+(acceleration / jerk), which turns each ramp into an S-curve and lengthens
+the move by that time.
+"""
+
+import logging
+import math
+import time
+from array import array
+from threading import Event, Lock
+
+from ..reactor import ReactorService
+
+logging = logging.getLogger('kastl.motion.trajectory')
+
+
+class TrajectoryError(Exception):
+    pass
+
+
+def _segment_phases(length, v_in, v_out, v_max, accel, decel):
+    """
+    Return [(duration, start velocity, acceleration)] of a trapezoidal
+    segment, unsigned.
+    """
+    peak = math.sqrt(max((2 * length * accel * decel + decel * v_in ** 2 +
+                          accel * v_out ** 2) / (accel + decel), 0))
+    v_c = min(v_max, peak)
+
+    t_a = max(v_c - v_in, 0) / accel
+    t_d = max(v_c - v_out, 0) / decel
+    d_a = (v_c ** 2 - v_in ** 2) / (2 * accel)
+    d_d = (v_c ** 2 - v_out ** 2) / (2 * decel)
+    t_c = max(length - d_a - d_d, 0) / v_c if v_c > 0 else 0
+
+    return [(t, v, a) for t, v, a in ((t_a, v_in, accel),
+                                      (t_c, v_c, 0),
+                                      (t_d, v_c, -decel)) if t > 0]
+
+
+def plan_phases(start, waypoints, velocity, acceleration, deceleration=None):
+    """
+    Return [(duration, start velocity, acceleration)] of a move from start
+    through waypoints, signed. A waypoint is a position or a (position,
+    velocity) tuple.
+    """
+    decel = deceleration or acceleration
+    if velocity <= 0 or acceleration <= 0 or decel <= 0:
+        raise TrajectoryError('Velocity and accelerations must be positive')
+
+    segments = []
+    position = start
+    for w in waypoints:
+        target, v_max = w if isinstance(w, (tuple, list)) else (w, velocity)
+        d = target - position
+        position = target
+        if d:
+            segments.append((abs(d), math.copysign(1, d), min(v_max, velocity)))
+
+    if not segments:
+        return []
+
+    # Junction velocities, limited by both segments and stopping on reversal
+    junctions = [0.]
+    for (_, d0, v0), (_, d1, v1) in zip(segments, segments[1:]):
+        junctions.append(min(v0, v1) if d0 == d1 else 0.)
+    junctions.append(0.)
+
+    for i in range(len(segments) - 1, -1, -1):
+        junctions[i] = min(junctions[i], math.sqrt(junctions[i + 1] ** 2 +
+                                                   2 * decel * segments[i][0]))
+    for i in range(len(segments)):
+        junctions[i + 1] = min(junctions[i + 1], math.sqrt(junctions[i] ** 2 +
+                                                           2 * acceleration * segments[i][0]))
+
+    phases = []
+    for i, (length, direction, v_max) in enumerate(segments):
+        for t, v, a in _segment_phases(length, junctions[i], junctions[i + 1],
+                                       v_max, acceleration, decel):
+            phases.append((t, direction * v, direction * a))
+    return phases
+
+
+class Profile(object):
+    """
+    Velocities and positions of a move, sampled every dt from its start.
+    """
+
+    def __init__(self, start, velocities, dt):
+        self.start = start
+        self.dt = dt
+        self.velocities = velocities
+
+        self.positions = array('d')
+        p = start
+        previous = 0.
+        for v in velocities:
+            p += (previous + v) * dt / 2
+            previous = v
+            self.positions.append(p)
+
+    @property
+    def target(self):
+        return self.positions[-1] if self.positions else self.start
+
+    @property
+    def duration(self):
+        return (len(self.velocities) - 1) * self.dt if self.velocities else 0
+
+    def sample(self, t):
+        "Return the (position, velocity) at t seconds from the start"
+        if not self.velocities:
+            return self.start, 0.
+        i = min(max(int(t / self.dt + 0.5), 0), len(self.velocities) - 1)
+        return self.positions[i], self.velocities[i]
+
+    def __len__(self):
+        return len(self.velocities)
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.start} -> {0.target} in {0.duration:.3f}s'.format(self)
+
+
+def plan(start, waypoints, velocity, acceleration, deceleration=None,
+         jerk=None, dt=0.01):
+    """
+    Return the Profile of a move from start through waypoints. Without jerk
+    the profile is trapezoidal, with it an S-curve.
+    """
+    if dt <= 0:
+        raise TrajectoryError('Sample period must be positive')
+
+    phases = plan_phases(start, waypoints, velocity, acceleration, deceleration)
+    if not phases:
+        return Profile(start, array('d', [0.]), dt)
+
+    duration = sum(t for t, _, _ in phases)
+    velocities = array('d')
+    phase, phase_start = 0, 0.
+    for k in range(int(math.ceil(duration / dt)) + 1):
+        t = k * dt
+        while phase < len(phases) - 1 and t >= phase_start + phases[phase][0]:
+            phase_start += phases[phase][0]
+            phase += 1
+        length, v, a = phases[phase]
+        velocities.append(v + a * min(t - phase_start, length))
+    velocities[-1] = 0.
+
+    if jerk:
+        n = max(int(round(acceleration / jerk / dt)), 1)
+        velocities = _moving_average(velocities, n)
+
+    # Sampling leaves a small error on the distance, spread it on the whole
+    # move, each way, so the profile ends exactly on target
+    ratios = {}
+    for sign in (1, -1):
+        length = sum(d for d in (sign * (v * t + a * t * t / 2)
+                                 for t, v, a in phases) if d > 0)
+        travelled = sum(sign * v for v in velocities if sign * v > 0) * dt
+        ratios[sign] = length / travelled if travelled else 1
+    velocities = array('d', (v * ratios[1 if v > 0 else -1] for v in velocities))
+
+    return Profile(start, velocities, dt)
+
+
+def move(start, target, velocity, acceleration, deceleration=None,
+         jerk=None, dt=0.01):
+    return plan(start, [target], velocity, acceleration, deceleration, jerk, dt)
+
+
+def _moving_average(values, n):
+    if n <= 1:
+        return values
+
+    out = array('d')
+    total = 0.
+    padded = list(values) + [0.] * (n - 1)
+    for i, v in enumerate(padded):
+        total += v
+        if i >= n:
+            total -= padded[i - n]
+        out.append(total / n)
+    return out
+
+
+class LocalAxis(object):
+    "Write setpoints to the local machine"
+
+    def __init__(self, motion_unit):
+        self.motion_unit = motion_unit
+
+    def write(self, key, value):
+        self.motion_unit.set_unfiltered('machine:' + key, value)
+
+
+class SlaveAxis(object):
+    "Write setpoints to a slave through its driver, without waiting"
+
+    def __init__(self, slave_machine):
+        self.slave_machine = slave_machine
+
+    def write(self, key, value):
+        self.slave_machine.driver.set('machine:' + key, value, block=False)
+
+
+class Play(object):
+    def __init__(self, profile, axis, key, start_at, callback=None):
+        self.profile = profile
+        self.axis = axis
+        self.key = key
+        self.start_at = start_at
+        self.callback = callback
+
+        self.values = profile.velocities if key == 'velocity_ref' else profile.positions
+        self.last_index = -1
+        self.done_ev = Event()
+
+
+class TrajectoryPlayer(ReactorService):
+    """
+    Stream profiles to axes at their sample period.
+    """
+
+    KEYS = ('velocity_ref', 'position_ref')
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.rate = float(kwargs.get('rate', 100))
+        self.key = kwargs.get('key', 'velocity_ref')
+        if self.key not in self.KEYS:
+            raise TrajectoryError('Unable to stream {}'.format(self.key))
+
+        self.writes = 0
+        self.late = 0
+
+        self._plays = {}
+        self._lock = Lock()
+
+    def play(self, name, profile, axis, key=None, start_at=None, callback=None):
+        """
+        Stream profile to axis (anything with write(key, value)) from
+        start_at (time.time(), now by default). It replaces any profile
+        playing on name. callback(play) is called once it is done.
+        """
+        key = key or self.key
+        if key not in self.KEYS:
+            raise TrajectoryError('Unable to stream {}'.format(key))
+
+        p = Play(profile, axis, key, start_at or time.time(), callback)
+        with self._lock:
+            self._plays[name] = p
+        self.wake()
+        return p
+
+    def cancel(self, name):
+        "Stop streaming on name, a streamed velocity is set back to 0"
+        with self._lock:
+            p = self._plays.pop(name, None)
+        if p is None:
+            return None
+
+        if p.key == 'velocity_ref':
+            try:
+                p.axis.write(p.key, 0.)
+            except Exception as e:
+                logging.error('Unable to stop {}: {!s}'.format(name, e))
+        p.done_ev.set()
+        return p
+
+    def tick(self, now):
+        """
+        Write due samples and return the time of the next one.
+        """
+        with self._lock:
+            plays = list(self._plays.items())
+
+        next_tick = None
+        for name, p in plays:
+            dt = p.profile.dt
+            elapsed = now - p.start_at
+            if elapsed < 0:
+                due = p.start_at
+            else:
+                i = min(int(elapsed / dt + 1e-6), len(p.values) - 1)
+                if i > p.last_index + 1:
+                    self.late += 1
+                if i != p.last_index:
+                    try:
+                        p.axis.write(p.key, p.values[i])
+                        self.writes += 1
+                    except Exception as e:
+                        logging.error('Unable to write {} on {}: {!s}'.format(p.key, name, e))
+                    p.last_index = i
+
+                if i == len(p.values) - 1:
+                    self._finish(name, p)
+                    continue
+                due = p.start_at + (i + 1) * dt
+
+            next_tick = due if next_tick is None else min(next_tick, due)
+
+        return next_tick
+
+    def _finish(self, name, p):
+        with self._lock:
+            if self._plays.get(name) is p:
+                del self._plays[name]
+        p.done_ev.set()
+        if p.callback is not None:
+            try:
+                p.callback(p)
+            except Exception as e:
+                logging.exception('Exception in trajectory callback: {!s}'.format(e))
+
+    @property
+    def playing(self):
+        return list(self._plays.keys())
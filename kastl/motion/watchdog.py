@@ -0,0 +1,300 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Watchdog service
+
+Components register watches (remote silence, slave silence, drive link...)
+with a timeout and a callback. Feeding a watch only stores the time: watches
+sit in a hierarchical timer wheel at their last known deadline and are looked
+at again when it comes, then put back at the new one if they were fed
+meanwhile. A heartbeat is O(1) and each watch is handled at most once per
+timeout. Expired watches fire within two ticks of their deadline.
+
+A watch is armed by its first feed, so links never used never fire. A fired
+watch stays tripped until fed again, then its recover callback is called.
+"""
+
+import logging
+import math
+import time
+from threading import Event, Lock, Thread
+
+logging = logging.getLogger('kastl.motion.watchdog')
+
+
+class WatchdogError(Exception):
+    pass
+
+
+class TimerWheel(object):
+    """
+    Items due at a given time, in slots of tick seconds. Level 0 holds the
+    next sizes[0] ticks, each next level slots as wide as the whole level
+    below: their items are moved down when their slot comes.
+    """
+
+    def __init__(self, tick=0.01, sizes=(256, 64, 64), now=0):
+        self.tick = tick
+        self.sizes = tuple(sizes)
+
+        self.spans = []
+        span = 1
+        for n in self.sizes:
+            self.spans.append(span)
+            span *= n
+
+        self.levels = [[{} for _ in range(n)] for n in self.sizes]
+        self.current = int(now / tick)
+        self._places = {}
+
+    def _ticks(self, when):
+        return int(math.ceil(when / self.tick))
+
+    def add(self, item, when):
+        self.remove(item)
+        t = max(self._ticks(when), self.current + 1)
+
+        for level, (n, span) in enumerate(zip(self.sizes, self.spans)):
+            if t // span - self.current // span < n:
+                break
+        else:
+            # Farther than the wheel: park it in the last slot to come, it
+            # will be placed again from there
+            t = (self.current // span + n - 1) * span
+
+        slot = (t // span) % n
+        self.levels[level][slot][item] = when
+        self._places[item] = (level, slot)
+
+    def remove(self, item):
+        place = self._places.pop(item, None)
+        if place is not None:
+            level, slot = place
+            del self.levels[level][slot][item]
+
+    def advance(self, now):
+        """
+        Move to now and return [(item, when)] of items due.
+        """
+        target = int(now / self.tick)
+        due = []
+
+        while self.current < target:
+            self.current += 1
+            c = self.current
+
+            for level in range(len(self.sizes) - 1, 0, -1):
+                span = self.spans[level]
+                if c % span:
+                    continue
+                self._cascade(self.levels[level], (c // span) % self.sizes[level], due)
+
+            self._cascade(self.levels[0], c % self.sizes[0], due)
+
+        return due
+
+    def _cascade(self, level, slot, due):
+        items, level[slot] = level[slot], {}
+        for item, when in items.items():
+            del self._places[item]
+            if self._ticks(when) <= self.current:
+                due.append((item, when))
+            else:
+                self.add(item, when)
+
+    def __contains__(self, item):
+        return item in self._places
+
+    def __len__(self):
+        return len(self._places)
+
+
+class Watch(object):
+    __slots__ = ('name', 'timeout', 'callback', 'recover', 'repeat',
+                 'last', 'armed', 'tripped', '_service')
+
+    def __init__(self, service, name, timeout, callback, recover=None, repeat=False):
+        self._service = service
+        self.name = name
+        self.timeout = timeout
+        self.callback = callback
+        self.recover = recover
+        self.repeat = repeat
+
+        self.last = None
+        self.armed = False
+        self.tripped = False
+
+    def feed(self, now=None):
+        "Heartbeat: the watched component is alive"
+        self.last = time.monotonic() if now is None else now
+        if not self.armed or self.tripped:
+            self._service._arm(self)
+
+    heartbeat = feed
+
+    def disarm(self):
+        self._service._disarm(self)
+
+    @property
+    def deadline(self):
+        return None if self.last is None else self.last + self.timeout
+
+    def __repr__(self):
+        state = 'tripped' if self.tripped else 'armed' if self.armed else 'disarmed'
+        return '{0.__class__.__name__}: {0.name} ({0.timeout}s, {1})'.format(self, state)
+
+
+class WatchdogService(object):
+    def __init__(self, **kwargs):
+        self.tick = float(kwargs.get('tick', 0.01))
+
+        self.fired = 0
+        self.recovered = 0
+        self.max_latency = 0
+
+        self._watches = {}
+        self._wheel = TimerWheel(self.tick, now=time.monotonic())
+        self._lock = Lock()
+        self.running_ev = Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            raise WatchdogError('Watchdog already started')
+
+        self.running_ev.clear()
+        self._thread = Thread(target=self.loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.running_ev.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    exit = stop
+
+    def watch(self, name, timeout, callback, recover=None, repeat=False):
+        """
+        Register a watch calling callback(watch) when not fed for timeout
+        seconds. A repeating watch is armed at once and fires every timeout
+        until disarmed, whether fed or not.
+        """
+        if timeout <= 0:
+            raise WatchdogError('Invalid timeout for {}: {}'.format(name, timeout))
+
+        with self._lock:
+            if name in self._watches:
+                raise WatchdogError('{} is already watched'.format(name))
+            w = self._watches[name] = Watch(self, name, float(timeout), callback,
+                                            recover, repeat)
+        if repeat:
+            w.feed()
+        return w
+
+    def unwatch(self, name):
+        with self._lock:
+            w = self._watches.pop(name, None)
+            if w is not None:
+                w.armed = False
+                self._wheel.remove(w)
+
+    def feed(self, name, now=None):
+        try:
+            self._watches[name].feed(now)
+        except KeyError:
+            pass
+
+    def get(self, name):
+        return self._watches.get(name)
+
+    def _arm(self, w):
+        recovered = False
+        with self._lock:
+            if self._watches.get(w.name) is not w:
+                return      # Unwatched
+            recovered, w.tripped = w.tripped, False
+            w.armed = True
+            self._wheel.add(w, w.last + w.timeout)
+
+        if recovered:
+            self.recovered += 1
+            logging.info('{} recovered'.format(w.name))
+            self._call(w, w.recover)
+
+    def _disarm(self, w):
+        with self._lock:
+            w.armed = False
+            w.tripped = False
+            self._wheel.remove(w)
+
+    def check(self, now=None):
+        """
+        Fire watches whose deadline is over. Return the fired watches.
+        """
+        now = time.monotonic() if now is None else now
+        fired = []
+
+        with self._lock:
+            for w, _ in self._wheel.advance(now):
+                deadline = w.last + w.timeout
+                if deadline > now:
+                    self._wheel.add(w, deadline)    # Fed meanwhile
+                    continue
+
+                self.max_latency = max(self.max_latency, now - deadline)
+                if w.repeat:
+                    w.last = now
+                    self._wheel.add(w, now + w.timeout)
+                else:
+                    w.tripped = True
+                fired.append(w)
+
+        for w in fired:
+            self.fired += 1
+            if not w.repeat:
+                logging.warning('{} timed out after {}s'.format(w.name, w.timeout))
+            self._call(w, w.callback)
+
+        return fired
+
+    def _call(self, w, callback):
+        if callback is None:
+            return
+        try:
+            callback(w)
+        except Exception as e:
+            logging.exception('Exception in {} watchdog callback: {!s}'.format(w.name, e))
+
+    def loop(self):
+        next_check = time.monotonic()
+        while not self.running_ev.is_set():
+            self.check()
+            next_check += self.tick
+            delay = next_check - time.monotonic()
+            if delay < 0:
+                next_check = time.monotonic()   # Late, don't try to catch up
+                delay = 0
+            self.running_ev.wait(delay)
+
+    @property
+    def stats(self):
+        return {
+            'watches': len(self._watches),
+            'armed': len(self._wheel),
+            'tripped': sum(1 for w in self._watches.values() if w.tripped),
+            'fired': self.fired,
+            'recovered': self.recovered,
+            'max_latency': self.max_latency,
+        }
+
+    def __contains__(self, name):
+        return name in self._watches
@@ -61,6 +61,8 @@ class OscMessage(AbstractMessage):
         if not (self.sender or self.receiver):
             self.receiver = OscAddress(**kwargs)
 
+        self._frozen = None
+
 
     @property
     def command(self):
@@ -70,7 +72,18 @@ class OscMessage(AbstractMessage):
     def args(self):
         return tuple(self._args)
 
+    def freeze(self):
+        """
+        Encode the message once: copies share the encoded message, whatever
+        their receiver. Arguments must not change afterwards.
+        """
+        self._frozen = None
+        self._frozen = self.to_message()
+        return self
+
     def to_message(self):
+        if self._frozen is not None:
+            return self._frozen
         if self.types:
             a = []
             for i in zip(self.types, self.args):
@@ -89,7 +102,7 @@ class OscMessage(AbstractMessage):
             uid = self.args[0]
             try:
                 uid = uuid.UUID(uid)
-            except ValueError:
+            except (ValueError, TypeError, AttributeError):
                 return False
             return uid
         except IndexError:
@@ -53,6 +53,25 @@ class OscServer(lo.Server):
             logging.debug("Sending to %s: %s" % (message.receiver, message))
         self.send((message.receiver.hostname, message.receiver.port), osc_msg)
 
+    def send_messages(self, messages):
+        """
+        Send messages, grouping those with the same receiver in one bundle.
+        """
+        targets = {}
+        for message in messages:
+            if message.receiver.port is None:
+                message.receiver.port = self.reply_port
+            t = (message.receiver.hostname, message.receiver.port)
+            targets.setdefault(t, []).append(message)
+
+        for t, msgs in targets.items():
+            if len(msgs) == 1:
+                self.send(t, msgs[0].to_message())
+                continue
+
+            logging.debug("Sending bundle of %d messages to %s:%d" % (len(msgs), t[0], t[1]))
+            self.send(t, lo.Bundle(*[m.to_message() for m in msgs]))
+
     @lo.make_method(None, None)
     def dispatch(self, path, args, types, sender):
         if not self.loopback and sender.hostname == self.machine.ip_address \
@@ -28,6 +28,9 @@ class SerialCommandString(object):
         if cmd_bytes:
             self._b = bs.pack('bits', cmd_bytes)
             self._c = SerialCommandStruct(*[b.bytes for b in self._b.unpack(self.CmdFormat)])
+        elif 'fields' in kwargs:
+            # Already split, as sent by the transport process
+            self._c = SerialCommandStruct(*kwargs['fields'])
         else:
             self._c = SerialCommandStruct(b'', b'\x00\x00', b'', b'', b'')
             self['serial_number'] = self.SerialNumber.encode()
@@ -117,8 +120,13 @@ class SerialMessage(AbstractMessage):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        self.cmd_bytes = SerialCommandString(cmd_bytes=kwargs['cmd_bytes']) \
-            if 'cmd_bytes' in kwargs else SerialCommandString()
+        if 'cmd_bytes' in kwargs:
+            self.cmd_bytes = SerialCommandString(cmd_bytes=kwargs['cmd_bytes'])
+        elif 'fields' in kwargs:
+            self.cmd_bytes = SerialCommandString(fields=kwargs['fields'])
+        else:
+            self.cmd_bytes = SerialCommandString()
+        self._frozen = None
 
 
     @property
@@ -137,8 +145,19 @@ class SerialMessage(AbstractMessage):
     def length(self):
         return self.cmd_bytes.length
 
+    def freeze(self):
+        """
+        Pack the message once, for messages sent several times. It must not
+        change afterwards.
+        """
+        self._frozen = None
+        self._frozen = self.cmd_bytes.tobytes
+        return self
+
     @property
     def tobytes(self):
+        if self._frozen is not None:
+            return self._frozen
         return self.cmd_bytes.tobytes
 
     def __len__(self):
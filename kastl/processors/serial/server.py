@@ -97,6 +97,14 @@ class SerialServer(sr.Serial):
         self.write(message.tobytes)
         self.flush()
 
+    def send_messages(self, messages):
+        if not self.running:
+            logging.error('Serial port is not opened. Aborting.')
+            return
+
+        self.write(b''.join([m.tobytes for m in messages]))
+        self.flush()
+
     def close(self):
         logging.debug("Closing serial server")
         self.running = False
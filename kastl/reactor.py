@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Reactor
+
+A single thread running callbacks, timers and file readers for every slave
+and machine, instead of a few threads each. Callbacks must not block: a
+callback waiting for a reply would wait forever, the reply being handled by
+the same thread. Timers and ticker deadlines use the time.monotonic() clock.
+"""
+
+import heapq
+import itertools
+import logging
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+logging = logging.getLogger('kastl.reactor')
+
+
+class ReactorError(Exception):
+    pass
+
+
+class Timer(object):
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.callback!r} at {0.when:.3f}'.format(self)
+
+
+class PeriodicTimer(object):
+    """
+    Call callback every interval until cancelled.
+    """
+
+    def __init__(self, reactor, interval, callback, args):
+        self.reactor = reactor
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+
+        self._timer = reactor.call_later(interval, self._run)
+
+    def _run(self):
+        # Reschedule first so the period doesn't include the callback duration
+        self._timer = self.reactor.call_at(self._timer.when + self.interval, self._run)
+        self.callback(*self.args)
+
+    def cancel(self):
+        self._timer.cancel()
+
+    @property
+    def cancelled(self):
+        return self._timer.cancelled
+
+
+class Ticker(object):
+    """
+    Run step repeatedly in the reactor. step returns (pause, deadline): the
+    next step runs at deadline, or earlier when woken, but never less than
+    pause after the previous one.
+    """
+
+    def __init__(self, reactor, step):
+        self.reactor = reactor
+        self.step = step
+
+        self._timer = None
+        self._not_before = 0
+        self._wake_pending = False
+        self.cancelled = False
+
+    def start(self):
+        self.cancelled = False
+        self.reactor.call_soon(self._tick)
+
+    def cancel(self):
+        self.cancelled = True
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def wake(self):
+        "Run the next step as soon as allowed. May be called from any thread."
+        if self._wake_pending:
+            return
+        self._wake_pending = True
+        self.reactor.call_soon(self._wake)
+
+    def _wake(self):
+        self._wake_pending = False
+        if self.cancelled or self._timer is None or self._timer.when <= self._not_before:
+            return
+        self._timer.cancel()
+        self._timer = self.reactor.call_at(self._not_before, self._tick)
+
+    def _tick(self):
+        self._timer = None
+        if self.cancelled:
+            return
+
+        try:
+            pause, deadline = self.step()
+        except Exception as e:
+            logging.exception('Exception in {!r}: {!s}'.format(self.step, e))
+            pause, deadline = 0, time.monotonic() + 1
+
+        self._not_before = time.monotonic() + pause
+        self._timer = self.reactor.call_at(max(deadline, self._not_before), self._tick)
+
+
+class ReactorService(object):
+    """
+    A service stepped by a Ticker in the reactor, instead of a thread of its
+    own. Subclasses implement tick(now), now on the time.time() clock,
+    returning the time of the next tick or None to wait until woken.
+    """
+
+    idle_interval = 1.
+
+    def __init__(self):
+        self.reactor = None
+        self._ticker = None
+
+    def start(self, reactor):
+        if self._ticker is not None:
+            raise ReactorError('{} already started'.format(self.__class__.__name__))
+
+        self.reactor = reactor
+        self._ticker = reactor.ticker(self.step)
+        self._ticker.start()
+
+    def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+
+    exit = stop
+
+    def wake(self):
+        "Tick as soon as possible. May be called from any thread."
+        if self._ticker is not None:
+            self._ticker.wake()
+
+    def step(self):
+        now = time.time()
+        when = self.tick(now)
+        delay = self.idle_interval if when is None else max(when - now, 0)
+        return 0, time.monotonic() + delay
+
+    def tick(self, now):
+        raise NotImplementedError
+
+
+class Reactor(object):
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._timers = []
+        self._ready = deque()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+        self._rsock, self._wsock = socket.socketpair()
+        self._rsock.setblocking(False)
+        self._wsock.setblocking(False)
+        self._selector.register(self._rsock, selectors.EVENT_READ, self._read_wakeup)
+        self._woken = False
+
+        self.running_ev = threading.Event()
+        self._thread = None
+        self._thread_id = None
+
+        self.iterations = 0
+        self.callbacks = 0
+
+    def start(self):
+        if self._thread:
+            raise ReactorError('Reactor already started')
+
+        self.running_ev.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.running_ev.set()
+        self._wakeup()
+        if self._thread and not self.in_reactor():
+            self._thread.join()
+        self._thread = None
+
+    exit = stop
+
+    def close(self):
+        self._selector.close()
+        self._rsock.close()
+        self._wsock.close()
+
+    def in_reactor(self):
+        return threading.get_ident() == self._thread_id
+
+    def call_soon(self, callback, *args):
+        """
+        Run callback in the reactor thread as soon as possible. May be called
+        from any thread.
+        """
+        with self._lock:
+            self._ready.append((callback, args))
+        if not self.in_reactor():
+            self._wakeup()
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    def call_at(self, when, callback, *args):
+        timer = Timer(when, callback, args)
+        with self._lock:
+            heapq.heappush(self._timers, (when, next(self._counter), timer))
+        if not self.in_reactor():
+            self._wakeup()
+        return timer
+
+    def call_every(self, interval, callback, *args):
+        return PeriodicTimer(self, interval, callback, args)
+
+    def ticker(self, step):
+        return Ticker(self, step)
+
+    def add_reader(self, fileobj, callback):
+        self._selector.register(fileobj, selectors.EVENT_READ, callback)
+        self._wakeup()
+
+    def remove_reader(self, fileobj):
+        self._selector.unregister(fileobj)
+
+    def _wakeup(self):
+        with self._lock:
+            if self._woken:
+                return
+            self._woken = True
+        try:
+            self._wsock.send(b'\0')
+        except OSError:
+            pass    # Buffer full, the reactor is awake anyway
+
+    def _read_wakeup(self, sock):
+        with self._lock:
+            self._woken = False
+        try:
+            while sock.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    def run(self):
+        self._thread_id = threading.get_ident()
+        try:
+            while not self.running_ev.is_set():
+                self.run_once()
+        finally:
+            self._thread_id = None
+
+    def run_once(self, timeout=None):
+        with self._lock:
+            if self._ready:
+                timeout = 0
+            elif self._timers:
+                delay = max(self._timers[0][0] - time.monotonic(), 0)
+                timeout = delay if timeout is None else min(timeout, delay)
+
+        for key, _ in self._selector.select(timeout):
+            self._run(key.data, (key.fileobj,))
+
+        now = time.monotonic()
+        with self._lock:
+            while self._timers and self._timers[0][0] <= now:
+                _, _, timer = heapq.heappop(self._timers)
+                if not timer.cancelled:
+                    self._ready.append((timer.callback, timer.args))
+
+            # Callbacks added while running these go to the next iteration
+            ready, self._ready = self._ready, deque()
+
+        for callback, args in ready:
+            self._run(callback, args)
+
+        self.iterations += 1
+
+    def _run(self, callback, args):
+        self.callbacks += 1
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.exception('Exception in reactor callback {!r}: {!s}'.format(callback, e))
+
+    @property
+    def pending(self):
+        return len(self._ready) + len(self._timers)
+
+    @property
+    def stats(self):
+        return {
+            'iterations': self.iterations,
+            'callbacks': self.callbacks,
+            'pending': self.pending,
+        }
@@ -14,7 +14,9 @@ from threading import Event, Thread
 from queue import Queue
 import time
 
-from ..filters import Filter
+from ..filters import Filter, FilterIndex
+from ..machines.cache import get_status
+from ..motion.request import MotionRequest
 
 
 class AbstractRemote(object):
@@ -23,8 +25,10 @@ class AbstractRemote(object):
     """
 
     FEEDBACK_INTERVAL = 0.250
+    FEEDBACK_KEYS = ()
     HAS_FEEDBACK = False
     HAS_IP = False
+    MOTION_PRIORITY = 0
 
     def __init__(self, *args, **kwargs):
         self.running_ev = Event()
@@ -38,14 +42,22 @@ class AbstractRemote(object):
         self.remote_port = None
 
         self.feedback_interval = self.FEEDBACK_INTERVAL
+        self.feedback_keys = tuple(self.FEEDBACK_KEYS)
+        self.feedback = None            # Feedback engine, set by the motion
+                                        # unit
 
         self.messages_queue = Queue()
 
-        self.filters = list()
+        self.filters = FilterIndex()
 
         self._main_thread = None
 
         self.local_status = dict()
+        self.cache = None               # Machine telemetry cache, set by the
+                                        # motion unit
+        self.watch = None               # Silence watch, set by the motion unit
+        self.motion_requests = None     # Motion request scheduler, set by the
+                                        # motion unit
 
         # Order is important here because the handle will stop filtering in an
         # exclusive filter accepts the message
@@ -73,6 +85,42 @@ class AbstractRemote(object):
         self.stop()
 
     def main_loop(self, *args, **kwargs):
+        """
+        Stream feedback through the feedback engine until stopped.
+        """
+        self.start_feedback()
+        try:
+            self.running_ev.wait()
+        finally:
+            self.stop_feedback()
+
+    def start_feedback(self):
+        if self.HAS_FEEDBACK and self.feedback is not None and self.feedback_keys:
+            self.feedback.add(self)
+
+    def stop_feedback(self):
+        if self.feedback is not None:
+            self.feedback.remove(self)
+
+    def set_feedback(self, keys, interval=None):
+        "Change feedback keys (and interval), an empty keys stops feedback"
+        self.feedback_keys = tuple(keys)
+        if interval is not None:
+            self.feedback_interval = float(interval)
+
+        self.stop_feedback()
+        if self._main_thread and not self.running_ev.is_set():
+            self.start_feedback()
+
+    def encode_feedback(self, pairs):
+        """
+        Return a feedback frame for a flat list of key, value. Frames are
+        shared by every remote of the same protocol: nothing specific to
+        this remote may go in it.
+        """
+        raise NotImplementedError
+
+    def send_feedback(self, frame):
         raise NotImplementedError
 
     def handle(self, msg, **kwargs):
@@ -81,15 +129,21 @@ class AbstractRemote(object):
         and decide what to do
         """
 
-        for f in self.filters:
-            if f.accepts(msg):
-                f.handle(msg)
-                if f.is_exclusive:
-                    return
+        for f in self.filters.match(msg):
+            f.handle(msg)
+            if f.is_exclusive:
+                return
 
     def send_message(self, m):
         raise NotImplementedError
 
+    def get_status(self, key):
+        """
+        Return key from local status, or else read it through the machine
+        telemetry cache.
+        """
+        return get_status(self.local_status, self.cache, key)
+
     def handle_config(self, m):
         raise NotImplementedError
 
@@ -102,6 +156,26 @@ class AbstractRemote(object):
     def handle_remote(self, m):
         raise NotImplementedError
 
+    def request_motion(self, m, k, request_type, *args):
+        """
+        Submit a motion request, m is replied to when it is done. Never wait
+        for it here: this runs in the message path.
+        """
+        if self.motion_requests is None:
+            self.reply_error(m, k, 'No motion request scheduler')
+            return
+
+        mr = MotionRequest(request_type, *args, remote=self,
+                           callback=lambda r: self.motion_done(m, k, r))
+        self.motion_requests.submit(mr)
+
+    def motion_done(self, m, k, mr):
+        if mr.error is not None:
+            self.reply_error(m, k, str(mr.error))
+        else:
+            # Superseded requests are replied ok too, the newer value stands
+            self.reply_ok(m, k, *mr.args)
+
     def register_filter(self, new_filter=None, **kwargs):
         if new_filter:
             if not isinstance(new_filter, Filter):
@@ -110,10 +184,12 @@ class AbstractRemote(object):
         else:
             new_filter = Filter(**kwargs)
 
-        self.filters.append(new_filter)
+        self.filters.add(new_filter)
 
     def timeout_reset(self, m):
         self._last_message_time = time.time()
+        if self.watch is not None:
+            self.watch.feed()
 
     def reply_ok(self, msg, *args, **kwargs):
         self.reply(msg, *args, add_path='ok', **kwargs)
@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Remote feedback streaming
+
+Remotes with feedback declare keys and an interval. Remotes of a protocol
+asking for the same keys at the same interval share a stream: on each tick
+every key of due streams is sampled once, each stream encodes one frame of
+changed values and sends it to all its remotes. A full frame is sent when a
+remote joins and every keyframe_interval, so lost frames are recovered.
+"""
+
+import logging
+from threading import Lock
+
+from ..machines.cache import get_status
+from ..reactor import ReactorService
+
+logging = logging.getLogger('kastl.remotes.feedback')
+
+
+class FeedbackError(Exception):
+    pass
+
+
+class FeedbackStream(object):
+    def __init__(self, protocol, keys, interval, encoder):
+        self.protocol = protocol
+        self.keys = keys
+        self.interval = interval
+        self.encoder = encoder
+
+        self.remotes = []
+        self.last_values = {}
+        self.next_frame = 0
+        self.next_keyframe = 0
+
+        self.frames = 0
+
+    @property
+    def uid(self):
+        return (self.protocol, self.keys, self.interval)
+
+    def changes(self, samples, full=False):
+        "Return a flat list of key, value changed since the last frame"
+        changed = []
+        for k in self.keys:
+            try:
+                v = samples[k]
+            except KeyError:
+                continue
+
+            if v is None:
+                continue
+            if not full and k in self.last_values and self.last_values[k] == v:
+                continue
+
+            self.last_values[k] = v
+            changed.extend((k, v))
+
+        return changed
+
+    def __repr__(self):
+        return '{0.__class__.__name__}: {0.protocol} {1} @ {2:.1f}Hz ({3} remotes)'.format(
+            self, ' '.join(self.keys), 1 / self.interval, len(self.remotes))
+
+
+class FeedbackEngine(ReactorService):
+    def __init__(self, local_status=None, cache=None, **kwargs):
+        super().__init__()
+        self.local_status = local_status if local_status is not None else {}
+        self.cache = cache
+
+        self.max_rate = float(kwargs.get('max_rate', 50))
+        self.keyframe_interval = float(kwargs.get('keyframe_interval', 5))
+
+        self.samples = 0
+        self.frames = 0
+
+        self._failed = set()    # Keys failing to sample, logged once
+        self._streams = {}
+        self._remotes = {}      # remote -> stream
+        self._lock = Lock()
+
+    def add(self, remote):
+        """
+        Stream the feedback keys of remote at its feedback interval.
+        """
+        keys = tuple(remote.feedback_keys)
+        if not keys:
+            raise FeedbackError('No feedback keys for {!r}'.format(remote))
+
+        interval = max(float(remote.feedback_interval), 1 / self.max_rate)
+        uid = (remote.PROTOCOL, keys, interval)
+
+        with self._lock:
+            self._remove(remote)
+
+            stream = self._streams.get(uid)
+            if stream is None:
+                stream = FeedbackStream(remote.PROTOCOL, keys, interval,
+                                        remote.encode_feedback)
+                self._streams[uid] = stream
+            stream.remotes.append(remote)
+            stream.next_keyframe = 0    # Send it everything next time
+            self._remotes[remote] = stream
+
+        self.wake()
+        return stream
+
+    def remove(self, remote):
+        with self._lock:
+            self._remove(remote)
+
+    def _remove(self, remote):
+        stream = self._remotes.pop(remote, None)
+        if stream is None:
+            return
+
+        stream.remotes.remove(remote)
+        if not stream.remotes:
+            del self._streams[stream.uid]
+        else:
+            # Encode with a remote still streaming these keys
+            stream.encoder = stream.remotes[0].encode_feedback
+
+    def sample(self, key):
+        "Return key from local status, or else from the telemetry cache"
+        return get_status(self.local_status, self.cache, key, block=False)
+
+    def tick(self, now):
+        """
+        Send due frames and return the time of the next one.
+        """
+        with self._lock:
+            streams = list(self._streams.values())
+            due = [s for s in streams if s.next_frame <= now]
+            members = {s: list(s.remotes) for s in due}
+
+        samples = {}
+        for stream in due:
+            for k in stream.keys:
+                if k in samples:
+                    continue
+                try:
+                    samples[k] = self.sample(k)
+                    self.samples += 1
+                except Exception as e:
+                    if k not in self._failed:
+                        self._failed.add(k)
+                        logging.warning('Unable to sample %s: %s', k, e)
+                    continue
+
+                if k in self._failed:
+                    self._failed.discard(k)
+                    logging.info('Sampling %s again', k)
+
+        for stream in due:
+            stream.next_frame = now + stream.interval
+            full = now >= stream.next_keyframe
+            if full:
+                stream.next_keyframe = now + self.keyframe_interval
+
+            changed = stream.changes(samples, full)
+            if not changed:
+                continue
+
+            try:
+                frame = stream.encoder(changed)
+            except Exception as e:
+                logging.error('Unable to encode feedback for %r: %s', stream, e)
+                continue
+
+            stream.frames += 1
+            self.frames += 1
+            for remote in members[stream]:
+                try:
+                    remote.send_feedback(frame)
+                except Exception as e:
+                    logging.error('Unable to send feedback to %r: %s', remote, e)
+
+        if not streams:
+            return None
+        return min(s.next_frame for s in streams)
+
+    @property
+    def streams(self):
+        return list(self._streams.values())
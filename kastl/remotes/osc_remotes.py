@@ -10,10 +10,11 @@
 OSC remotes
 """
 
+from copy import copy
+
 from .exceptions import RemoteError, RemoteTimeoutError
-from ..motion.exceptions import MotionError
 from .abstract_remote import AbstractRemote
-from ..processors.osc import OscMessage
+from ..processors.osc import OscMessage, OscAddress
 from ..motion.request import MotionRequest
 
 import logging
@@ -25,6 +26,7 @@ logging = logging.getLogger('kastl.remotes.serial')
 class OscRemote(AbstractRemote):
     PROTOCOL = "Osc"
     HAS_IP = True
+    FEEDBACK_PATH = '/remote/feedback'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -43,8 +45,20 @@ class OscRemote(AbstractRemote):
     def message(self, *args, **kwargs):
         return OscMessage(*args, **kwargs)
 
+    def encode_feedback(self, pairs):
+        m = OscMessage(self.FEEDBACK_PATH, *pairs, hostname=None, port=None)
+        return m.freeze()
+
+    def send_feedback(self, frame):
+        m = copy(frame)
+        m.receiver = OscAddress(hostname=self.remote_ip, port=self.remote_port)
+        return self.send_message(m)
+
 
 class OscDarioRemote(OscRemote):
+    HAS_FEEDBACK = True
+    FEEDBACK_KEYS = ('machine.status', 'machine.error_code',
+                     'machine.velocity', 'machine.position')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -58,39 +72,26 @@ class OscDarioRemote(OscRemote):
         self.register_filter(protocol=self.PROTOCOL, target=self.handle_remote,
                              alias_mask='/remote/', exclusive=True)
 
-    def main_loop(self, *args, **kwargs):
-        while not self.running_ev.is_set():
-            self.running_ev.wait(self.feedback_interval)
-
     def handle_get(self, m):
         k = m.args[0].decode()
 
         try:
-            v = self.local_status[k]
-            if callable(v):
-                v = v()
+            v = self.get_status(k)
             self.reply_ok(m, k, v)
         except KeyError:
             self.reply_error(m, k, 'No value for key.')
+        except Exception as e:
+            self.reply_error(m, k, str(e))
 
     def handle_set(self, m):
         try:
-            k, a, = m.args
+            k, *a = m.args
             nk = k.decode()
             if nk.startswith('machine.'):
-                nk = nk[7:] # Strip machine. from key
+                nk = nk[len('machine.'):] # Strip machine. from key
 
             if nk in MotionRequest.TYPES:
-                mr = MotionRequest(nk, *a)
-                self.command_queue.put(mr)
-                mr.done_ev.wait(self.request_timeout)
-                if mr.done:
-                    self.reply_ok(m, k, *a)
-                else:
-                    e = MotionError('Timeout while setting %s to %s' %
-                                            str(k), ', '.join([str(sa) for si in a]))
-                    self.reply_error(m, k, e)
-                    raise e
+                self.request_motion(m, k, nk, *a)
             else:
                 print(k, a)
         except Exception as e:
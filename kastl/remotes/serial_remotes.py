@@ -11,7 +11,6 @@ Serial remotes
 """
 
 from .exceptions import RemoteError, RemoteTimeoutError
-from ..motion.exceptions import MotionError
 from .abstract_remote import AbstractRemote
 from ..processors.serial import SerialMessage
 from ..motion.request import MotionRequest
@@ -25,6 +24,7 @@ logging = logging.getLogger('kastl.remotes.serial')
 class SerialRemote(AbstractRemote):
     PROTOCOL = 'Serial'
     HAS_IP = False
+    FEEDBACK_COMMAND = 'machine.feedback'
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -41,40 +41,26 @@ class SerialRemote(AbstractRemote):
                              alias_mask='machine.set',
                              exclusive=True)
 
-    def main_loop(self, *args, **kwargs):
-        while not self.running_ev.is_set():
-            # Here we should send feedback data when requested
-            self.running_ev.wait(self.FEEDBACK_INTERVAL)
-
     def handle_get(self, m):
         k = m.args[0].decode()
 
         try:
-            v = self.local_status[k]
-            if callable(v):
-                v = v()
+            v = self.get_status(k)
             self.reply_ok(m, k, v)
         except KeyError:
             self.reply_error(m, k, 'No value for key.')
+        except Exception as e:
+            self.reply_error(m, k, str(e))
 
     def handle_set(self, m):
         try:
-            k, a, = m.args
+            k, *a = m.args
             nk = k.decode()
             if nk.startswith('machine.'):
-                nk = nk[7:] # Strip machine. from key
+                nk = nk[len('machine.'):] # Strip machine. from key
 
             if nk in MotionRequest.TYPES:
-                mr = MotionRequest(nk, *a)
-                self.command_queue.put(mr)
-                mr.done_ev.wait(self.request_timeout)
-                if mr.done:
-                    self.reply_ok(m, k, *a)
-                else:
-                    e = MotionError('Timeout while setting %s to %s' %
-                                            str(k), ', '.join([str(sa) for si in a]))
-                    self.reply_error(m, k, e)
-                    raise e
+                self.request_motion(m, k, nk, *a)
             else:
                 print(k, a)
         except Exception as e:
@@ -92,6 +78,21 @@ class SerialRemote(AbstractRemote):
     def message(self, *args, **kwargs):
         return SerialMessage(*args, **kwargs)
 
+    def encode_feedback(self, pairs):
+        """
+        Keys are sent as their index in feedback_keys: names don't fit in a
+        serial argument.
+        """
+        m = self.message()
+        m += self.FEEDBACK_COMMAND
+        for k, v in zip(pairs[0::2], pairs[1::2]):
+            m += self.feedback_keys.index(k)
+            m += v
+        return m.freeze()
+
+    def send_feedback(self, frame):
+        return self.send_message(frame)
+
     @property
     def uid(self):
         return self.__class__.__name__
@@ -0,0 +1,274 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Shared-memory status table
+
+The motion unit publishes status values in a memory mapped file (in
+/dev/shm) with a fixed layout, so local tools (GUI, loggers, diagnostics)
+read them without any round trip to the motion unit, and without a syscall
+once the file is mapped.
+
+Layout, little endian:
+
+    header      64 bytes: magic, version, flags, count, record size,
+                offset of records
+    names       count * 64 bytes, utf-8 key names padded with NUL
+    records     count * 64 bytes: sequence (u64), stamp (f64), type (u8),
+                7 pad bytes, 40 bytes of value
+
+Each record is guarded by a seqlock: the writer makes its sequence odd,
+writes the record and makes it even again. A reader retries while the
+sequence is odd or changed during the read, so it never sees half a value
+(it only yields to the writer in that case). There is one writer per table.
+
+The writer builds a new file and moves it over the path, so a restarted
+unit never changes the layout under a reader: the old table is flagged
+closed and readers open the new one (see StatusReader.reopen).
+"""
+
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+
+MAGIC = b'KASTLST\0'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHHIII')
+HEADER_SIZE = 64
+NAME_SIZE = 64
+RECORD_SIZE = 64
+
+SEQ = struct.Struct('<Q')
+RECORD = struct.Struct('<QdB7x')
+VALUE_SIZE = RECORD_SIZE - RECORD.size
+
+FLAG_CLOSED = 0x1
+
+T_NONE, T_FLOAT, T_INT, T_BOOL, T_STR = range(5)
+
+_VALUES = {
+    T_FLOAT: struct.Struct('<d'),
+    T_INT: struct.Struct('<q'),
+    T_BOOL: struct.Struct('<?'),
+    T_STR: struct.Struct('<B{}s'.format(VALUE_SIZE - 1)),
+}
+
+
+class StatusTableError(Exception):
+    pass
+
+
+def _encode(value):
+    if value is None:
+        return T_NONE, b''
+    if isinstance(value, bool):
+        return T_BOOL, _VALUES[T_BOOL].pack(value)
+    if isinstance(value, int):
+        return T_INT, _VALUES[T_INT].pack(value)
+    if isinstance(value, float):
+        return T_FLOAT, _VALUES[T_FLOAT].pack(value)
+
+    if isinstance(value, bytes):
+        value = value.decode(errors='replace')
+    b = str(value).encode()[:VALUE_SIZE - 1]
+    return T_STR, _VALUES[T_STR].pack(len(b), b)
+
+
+def _decode(vtype, buf, offset):
+    if vtype == T_NONE:
+        return None
+    if vtype == T_STR:
+        n, b = _VALUES[T_STR].unpack_from(buf, offset)
+        return b[:n].decode(errors='replace')
+    try:
+        return _VALUES[vtype].unpack_from(buf, offset)[0]
+    except KeyError:
+        raise StatusTableError('Unknown value type: {}'.format(vtype))
+
+
+class StatusTable(object):
+    """
+    Writer side of a status table.
+    """
+
+    def __init__(self, path, keys):
+        self.path = path
+        self.keys = tuple(keys)
+        if not self.keys:
+            raise StatusTableError('No keys for status table')
+        for k in self.keys:
+            if len(k.encode()) >= NAME_SIZE:
+                raise StatusTableError('Key too long: {}'.format(k))
+
+        self._index = {k: i for i, k in enumerate(self.keys)}
+        self._records_offset = HEADER_SIZE + NAME_SIZE * len(self.keys)
+        self._lock = Lock()
+        self._map = None
+
+        self.writes = 0
+
+    @property
+    def size(self):
+        return self._records_offset + RECORD_SIZE * len(self.keys)
+
+    def open(self):
+        if self._map is not None:
+            raise StatusTableError('Status table already open')
+
+        tmp = '{}.{}'.format(self.path, os.getpid())
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            self._map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, 0, len(self.keys),
+                         RECORD_SIZE, self._records_offset)
+        for i, k in enumerate(self.keys):
+            name = k.encode()
+            offset = HEADER_SIZE + NAME_SIZE * i
+            self._map[offset:offset + len(name)] = name
+
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if self._map is None:
+            return
+
+        with self._lock:
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, FLAG_CLOSED,
+                             len(self.keys), RECORD_SIZE, self._records_offset)
+            self._map.close()
+            self._map = None
+
+    def set(self, key, value, stamp=None):
+        """
+        Write value of key. Keys not in the table are ignored.
+        """
+        try:
+            i = self._index[key]
+        except KeyError:
+            return False
+
+        vtype, data = _encode(value)
+        stamp = time.time() if stamp is None else stamp
+        offset = self._records_offset + RECORD_SIZE * i
+
+        with self._lock:
+            if self._map is None:
+                raise StatusTableError('Status table not open')
+
+            seq, = SEQ.unpack_from(self._map, offset)
+            SEQ.pack_into(self._map, offset, seq + 1)
+            RECORD.pack_into(self._map, offset, seq + 1, stamp, vtype)
+            self._map[offset + RECORD.size:offset + RECORD.size + len(data)] = data
+            SEQ.pack_into(self._map, offset, seq + 2)
+            self.writes += 1
+
+        return True
+
+    def update(self, values, stamp=None):
+        stamp = time.time() if stamp is None else stamp
+        for k, v in values.items():
+            self.set(k, v, stamp)
+
+    def __contains__(self, key):
+        return key in self._index
+
+
+class StatusReader(object):
+    """
+    Reader side of a status table, for any local process:
+
+        reader = StatusReader('/dev/shm/kastl.status')
+        reader['machine.velocity']
+        reader.snapshot()
+    """
+
+    def __init__(self, path, retries=1000):
+        self.path = path
+        self.retries = retries
+        self._map = None
+        self.open()
+
+    def open(self):
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, record_size, records_offset = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise StatusTableError('Not a status table: {}'.format(self.path))
+        if version != VERSION or record_size != RECORD_SIZE:
+            raise StatusTableError('Unsupported status table version: {}'.format(version))
+
+        self._records_offset = records_offset
+        self.keys = []
+        for i in range(count):
+            offset = HEADER_SIZE + NAME_SIZE * i
+            name = self._map[offset:offset + NAME_SIZE].rstrip(b'\0')
+            self.keys.append(name.decode())
+        self._index = {k: i for i, k in enumerate(self.keys)}
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    @property
+    def closed(self):
+        "True when the writer closed this table, reopen to get the new one"
+        _, _, flags, _, _, _ = HEADER.unpack_from(self._map, 0)
+        return bool(flags & FLAG_CLOSED)
+
+    def reopen(self):
+        self.close()
+        self.open()
+
+    def read(self, key):
+        """
+        Return (value, stamp) of key. Stamp is 0 if it was never written.
+        """
+        offset = self._records_offset + RECORD_SIZE * self._index[key]
+        buf = self._map
+
+        for _ in range(self.retries):
+            seq, stamp, vtype = RECORD.unpack_from(buf, offset)
+            if not seq & 1:
+                value = _decode(vtype, buf, offset + RECORD.size)
+                if SEQ.unpack_from(buf, offset)[0] == seq:
+                    return value, stamp
+            time.sleep(0)   # Let the writer finish
+
+        raise StatusTableError('Unable to read {}: writer busy'.format(key))
+
+    def __getitem__(self, key):
+        return self.read(key)[0]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def snapshot(self):
+        "Return {key: (value, stamp)}, each record consistent"
+        return {k: self.read(k) for k in self.keys}
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
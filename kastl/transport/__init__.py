@@ -0,0 +1,18 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Transport process
+
+OSC and serial transports run in a child process and exchange decoded
+messages with the motion process through shared-memory rings.
+"""
+
+from .ring import SharedRing, RingError
+from .records import encode_message, decode_message, RecordError
+from .process import TransportProcess, TransportProxy, TransportError
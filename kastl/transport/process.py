@@ -0,0 +1,278 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Transport process
+
+OSC and serial servers run in a forked child process: packets are received,
+parsed and encoded there, and sent from there. The motion process only
+decodes records from a ring per transport and hands messages to its
+processors, and encodes outgoing messages to another ring. Network storms
+and log floods are paid for by the child, and dropped there when the motion
+process can't keep up.
+
+Each ring has one writer and one reader: in each process, threads writing
+to the same ring take its lock.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+from threading import Event, Lock, Thread
+
+from .ring import SharedRing
+from .records import (encode_message, encode_control, decode_message,
+                      decode_control, decode_kind, KIND_CONTROL, RecordError)
+
+logging = logging.getLogger('kastl.transport')
+
+
+class TransportError(Exception):
+    pass
+
+
+class _Link(object):
+    """
+    Both rings of a transport, and the lock of the writer side.
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.inbound = SharedRing(size)     # transport -> motion
+        self.outbound = SharedRing(size)    # motion -> transport
+        self.lock = Lock()
+
+    def put(self, ring, record):
+        with self.lock:
+            return ring.put(record)
+
+
+class _RingSink(object):
+    """
+    Processor of a server in the transport process: messages go to the
+    motion process.
+    """
+
+    def __init__(self, link):
+        self.link = link
+
+    def enqueue(self, message):
+        try:
+            record = encode_message(message)
+        except Exception as e:
+            logging.error('Unable to encode {!r}: {!s}'.format(message, e))
+            return
+
+        if not self.link.put(self.link.inbound, record):
+            logging.warning('{} inbound ring is full, message dropped'.format(self.link.name))
+
+
+class _TransportHost(object):
+    """
+    The motion unit as seen by servers in the transport process.
+    """
+
+    def __init__(self, machine, processors):
+        self._machine = machine
+        self.processors = processors
+
+    def __getattr__(self, name):
+        return getattr(self._machine, name)
+
+
+class TransportProxy(object):
+    """
+    Stands for a server in the motion process, for the dispatcher.
+    """
+
+    def __init__(self, transport, name):
+        self.transport = transport
+        self.name = name
+        self.link = transport.links[name]
+
+    def start(self):
+        pass    # Started by the transport, before any thread
+
+    def send_message(self, message):
+        self._put(encode_message(message))
+
+    def send_messages(self, messages):
+        for m in messages:
+            self.send_message(m)
+
+    def send_announce(self):
+        self._put(encode_control('announce'))
+
+    def send_alive(self):
+        self._put(encode_control('alive'))
+
+    def _put(self, record):
+        if not self.link.put(self.link.outbound, record):
+            raise TransportError('{} outbound ring is full'.format(self.name))
+
+    def exit(self):
+        self.transport.stop()
+
+    close = exit
+
+
+class TransportProcess(object):
+    def __init__(self, machine, names, **kwargs):
+        self.machine = machine
+        self.names = tuple(names)
+
+        ring_size = int(kwargs.get('ring_size', 262144))
+        self.batch_size = int(kwargs.get('batch_size', 32))
+        self.stop_timeout = float(kwargs.get('stop_timeout', 2))
+
+        self.links = {name: _Link(name, ring_size) for name in self.names}
+        self.proxies = {name: TransportProxy(self, name) for name in self.names}
+
+        self.received = 0
+        self.running_ev = Event()
+        self._process = None
+        self._threads = []
+
+    def start(self):
+        """
+        Fork the transport process. Start it before the motion unit starts
+        its threads: fork only copies the calling one.
+        """
+        if self._process:
+            raise TransportError('Transport process already started')
+
+        self.running_ev.clear()
+        ctx = multiprocessing.get_context('fork')
+        self._process = ctx.Process(target=self._transport_main,
+                                    name='kastl-transport')
+        self._process.daemon = True
+        self._process.start()
+        logging.info('Transport process started (pid {})'.format(self._process.pid))
+
+        for link in self.links.values():
+            t = Thread(target=self.loop, args=(link,))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        if self.running_ev.is_set():
+            return
+        self.running_ev.set()
+
+        if self._process:
+            for link in self.links.values():
+                link.put(link.outbound, encode_control('exit'))
+            self._process.join(self.stop_timeout)
+            if self._process.is_alive():
+                logging.warning('Transport process still running, terminating it')
+                self._process.terminate()
+                self._process.join()
+
+        for link in self.links.values():
+            link.inbound.wake()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    exit = stop
+
+    # Motion process side
+    def loop(self, link):
+        processor = self.machine.processors[link.name]
+
+        while not self.running_ev.is_set():
+            if not link.inbound.wait(1):
+                continue
+
+            for record in link.inbound.get_many(self.batch_size):
+                try:
+                    m = decode_message(record)
+                except RecordError as e:
+                    logging.error('Bad record from {} transport: {!s}'.format(link.name, e))
+                    continue
+
+                self.received += 1
+                processor.enqueue(m)
+
+    @property
+    def dropped(self):
+        return {name: (l.inbound.dropped, l.outbound.dropped)
+                for name, l in self.links.items()}
+
+    # Transport process side
+    def _transport_main(self):
+        # The motion process handles signals and tells us when to exit
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        from ..processors.osc.server import OscServer
+        from ..processors.serial.server import SerialServer
+        classes = {'OSC': OscServer, 'Serial': SerialServer}
+
+        host = _TransportHost(self.machine, {name: _RingSink(l)
+                                             for name, l in self.links.items()})
+        servers = {name: classes[name](host) for name in self.names}
+
+        senders = []
+        for name, server in servers.items():
+            server.start()
+            t = Thread(target=self._send_loop, args=(self.links[name], server))
+            t.daemon = True
+            t.start()
+            senders.append(t)
+
+        for t in senders:
+            t.join()
+
+        for server in servers.values():
+            server.exit()
+
+    def _send_loop(self, link, server):
+        parent = os.getppid()
+
+        while True:
+            if not link.outbound.wait(1):
+                if os.getppid() != parent:
+                    logging.error('Motion process is gone, exiting')
+                    return
+                continue
+
+            batch = []
+            for record in link.outbound.get_many():
+                if decode_kind(record) != KIND_CONTROL:
+                    try:
+                        batch.append(decode_message(record))
+                    except RecordError as e:
+                        logging.error('Bad record for {} transport: {!s}'.format(link.name, e))
+                    continue
+
+                self._send(server, batch)
+                batch = []
+
+                name = decode_control(record)
+                if name == 'exit':
+                    return
+                try:
+                    getattr(server, 'send_' + name)()
+                except Exception as e:
+                    logging.error('Unable to send {} on {}: {!s}'.format(name, link.name, e))
+
+            self._send(server, batch)
+
+    def _send(self, server, batch):
+        if not batch:
+            return
+        try:
+            if len(batch) > 1:
+                server.send_messages(batch)
+            else:
+                server.send_message(batch[0])
+        except Exception as e:
+            logging.error('Error while sending to {} server: {!s}'.format(
+                server.__class__.__name__, e))
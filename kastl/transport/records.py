@@ -0,0 +1,214 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Binary records exchanged with the transport process
+
+Every record starts with kind and flags (one byte each), little endian:
+
+    OSC         port (i32, -1 if unset), host, path, types (u16 length +
+                utf-8 each), argument count (u16), then each argument as a
+                tag byte and its value:
+                    N T F       None, True, False
+                    q d         int64, float64
+                    s b B       u32 length + utf-8, bytes, blob (list of
+                                byte values)
+    Serial      protocol, length, serial_number, data, end (u16 length +
+                bytes each), as split by the transport process
+    Control     name (u16 length + utf-8): announce, alive...
+"""
+
+import struct
+
+from ..processors.osc.message import OscMessage, OscAddress
+from ..processors.serial.message import SerialMessage
+
+KIND_OSC = 1
+KIND_SERIAL = 2
+KIND_CONTROL = 3
+
+FLAG_LOG = 0x1          # msg_type is log
+FLAG_SENDER = 0x2       # OSC address is the sender, not the receiver
+
+HEAD = struct.Struct('<BB')
+I32 = struct.Struct('<i')
+U16 = struct.Struct('<H')
+U32 = struct.Struct('<I')
+Q = struct.Struct('<q')
+D = struct.Struct('<d')
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class RecordError(Exception):
+    pass
+
+
+def _str16(parts, value):
+    b = value.encode() if isinstance(value, str) else bytes(value)
+    parts.append(U16.pack(len(b)))
+    parts.append(b)
+
+
+def _bytes32(parts, tag, b):
+    parts.append(tag)
+    parts.append(U32.pack(len(b)))
+    parts.append(b)
+
+
+def _arg(parts, a):
+    if a is None:
+        parts.append(b'N')
+    elif a is True:
+        parts.append(b'T')
+    elif a is False:
+        parts.append(b'F')
+    elif isinstance(a, int) and INT64_MIN <= a <= INT64_MAX:
+        parts.append(b'q')
+        parts.append(Q.pack(a))
+    elif isinstance(a, float):
+        parts.append(b'd')
+        parts.append(D.pack(a))
+    elif isinstance(a, (bytes, bytearray)):
+        _bytes32(parts, b'b', bytes(a))
+    elif isinstance(a, list) and all(isinstance(i, int) for i in a):
+        _bytes32(parts, b'B', bytes(a))
+    else:
+        _bytes32(parts, b's', str(a).encode())
+
+
+def encode_control(name):
+    parts = [HEAD.pack(KIND_CONTROL, 0)]
+    _str16(parts, name)
+    return b''.join(parts)
+
+
+def encode_message(msg):
+    """
+    Return msg (an OscMessage or a SerialMessage) as a record.
+    """
+    flags = FLAG_LOG if msg.msg_type == 'log' else 0
+
+    if isinstance(msg, OscMessage):
+        address = msg.receiver
+        if address is None:
+            address = msg.sender
+            flags |= FLAG_SENDER
+
+        port = -1
+        host = ''
+        if address is not None:
+            host = address.hostname or ''
+            port = -1 if address.port is None else address.port
+
+        parts = [HEAD.pack(KIND_OSC, flags), I32.pack(port)]
+        _str16(parts, host)
+        _str16(parts, str(msg.path))
+        _str16(parts, msg.types or '')
+
+        args = msg.args
+        parts.append(U16.pack(len(args)))
+        for a in args:
+            _arg(parts, a)
+        return b''.join(parts)
+
+    if isinstance(msg, SerialMessage):
+        parts = [HEAD.pack(KIND_SERIAL, flags)]
+        for field in msg.cmd_bytes._c:
+            _str16(parts, field)
+        return b''.join(parts)
+
+    raise RecordError('Unable to encode {!r}'.format(msg))
+
+
+class _Reader(object):
+    __slots__ = ('buf', 'pos')
+
+    def __init__(self, buf, pos=0):
+        self.buf = buf
+        self.pos = pos
+
+    def unpack(self, st):
+        v = st.unpack_from(self.buf, self.pos)
+        self.pos += st.size
+        return v[0] if len(v) == 1 else v
+
+    def take(self, n):
+        b = bytes(self.buf[self.pos:self.pos + n])
+        if len(b) != n:
+            raise RecordError('Truncated record')
+        self.pos += n
+        return b
+
+    def str16(self):
+        return self.take(self.unpack(U16))
+
+    def arg(self):
+        tag = self.take(1)
+        if tag == b'N':
+            return None
+        if tag == b'T':
+            return True
+        if tag == b'F':
+            return False
+        if tag == b'q':
+            return self.unpack(Q)
+        if tag == b'd':
+            return self.unpack(D)
+
+        b = self.take(self.unpack(U32))
+        if tag == b's':
+            return b.decode()
+        if tag == b'b':
+            return b
+        if tag == b'B':
+            return list(b)
+        raise RecordError('Unknown argument tag: {!r}'.format(tag))
+
+
+def decode_kind(record):
+    return record[0]
+
+
+def decode_control(record):
+    r = _Reader(record, HEAD.size)
+    return r.str16().decode()
+
+
+def decode_message(record):
+    """
+    Return the OscMessage or SerialMessage of record.
+    """
+    try:
+        r = _Reader(record)
+        kind, flags = r.unpack(HEAD)
+        msg_type = 'log' if flags & FLAG_LOG else None
+
+        if kind == KIND_OSC:
+            port = r.unpack(I32)
+            host = r.str16().decode()
+            path = r.str16().decode()
+            types = r.str16().decode() or None
+            args = [r.arg() for _ in range(r.unpack(U16))]
+
+            if flags & FLAG_SENDER:
+                return OscMessage(path, *args, types=types, msg_type=msg_type,
+                                  sender=OscAddress(hostname=host, port=port))
+
+            m = OscMessage(path, *args, types=types, msg_type=msg_type,
+                           hostname=host)
+            m.receiver.port = None if port < 0 else port
+            return m
+
+        if kind == KIND_SERIAL:
+            fields = [r.str16() for _ in range(5)]
+            return SerialMessage(fields=fields, msg_type=msg_type)
+    except struct.error as e:
+        raise RecordError('Truncated record: {!s}'.format(e))
+
+    raise RecordError('Unknown record kind: {}'.format(kind))
@@ -0,0 +1,171 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+Single producer, single consumer ring in shared memory
+
+The ring lives in an anonymous shared mapping, created before the transport
+process is forked so both processes see it. Records are a 32 bits length
+followed by the record, aligned on 8 bytes. A record never wraps: when it
+doesn't fit before the end, a pad marker sends the reader back to the start.
+
+The writer only moves head and the reader only moves tail, each in its own
+cache line, so neither takes a lock. A reader with nothing to read raises
+its waiting flag and sleeps on a pipe; the writer only writes to the pipe
+when that flag is up, so a busy ring costs no syscall on either side.
+"""
+
+import mmap
+import os
+import select
+import struct
+
+U64 = struct.Struct('<Q')
+U32 = struct.Struct('<I')
+
+HEAD = 0
+TAIL = 64
+WAITING = 128
+DATA = 192
+
+PAD = 0xffffffff
+ALIGN = 8
+
+
+class RingError(Exception):
+    pass
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) & ~(ALIGN - 1)
+
+
+class SharedRing(object):
+    def __init__(self, size=262144):
+        if size & (size - 1) or size < 1024:
+            raise RingError('Ring size must be a power of 2 of at least 1024')
+
+        self.size = size
+        self.max_record = size // 4
+
+        self._map = mmap.mmap(-1, DATA + size)
+        self._rfd, self._wfd = os.pipe()
+        os.set_blocking(self._wfd, False)
+
+        self.dropped = 0
+
+    def _get(self, offset):
+        return U64.unpack_from(self._map, offset)[0]
+
+    def _set(self, offset, value):
+        U64.pack_into(self._map, offset, value)
+
+    # Writer side
+    def put(self, record):
+        """
+        Append record, return False if the ring is full.
+        """
+        n = len(record)
+        if n > self.max_record:
+            raise RingError('Record too long: {} bytes'.format(n))
+
+        head = self._get(HEAD)
+        tail = self._get(TAIL)
+        pos = head % self.size
+        need = _aligned(4 + n)
+
+        pad = self.size - pos if pos + need > self.size else 0
+        if head + pad + need - tail > self.size:
+            self.dropped += 1
+            return False
+
+        if pad:
+            U32.pack_into(self._map, DATA + pos, PAD)
+            head += pad
+            pos = 0
+
+        U32.pack_into(self._map, DATA + pos, n)
+        self._map[DATA + pos + 4:DATA + pos + 4 + n] = record
+        self._set(HEAD, head + need)
+
+        if self._map[WAITING]:
+            self._map[WAITING] = 0
+            try:
+                os.write(self._wfd, b'\0')
+            except BlockingIOError:
+                pass    # Already woken
+
+        return True
+
+    # Reader side
+    def get(self):
+        """
+        Return the next record, None if the ring is empty.
+        """
+        tail = self._get(TAIL)
+        if tail == self._get(HEAD):
+            return None
+
+        pos = tail % self.size
+        n, = U32.unpack_from(self._map, DATA + pos)
+        if n == PAD:
+            tail += self.size - pos
+            pos = 0
+            n, = U32.unpack_from(self._map, DATA)
+
+        record = self._map[DATA + pos + 4:DATA + pos + 4 + n]
+        self._set(TAIL, tail + _aligned(4 + n))
+        return record
+
+    def get_many(self, limit=None):
+        records = []
+        while limit is None or len(records) < limit:
+            record = self.get()
+            if record is None:
+                break
+            records.append(record)
+        return records
+
+    def wait(self, timeout=None):
+        """
+        Wait until the ring is not empty or timeout expired. Return True if
+        there is something to read.
+        """
+        if self._get(TAIL) != self._get(HEAD):
+            return True
+
+        self._map[WAITING] = 1
+        if self._get(TAIL) != self._get(HEAD):
+            self._map[WAITING] = 0
+            return True
+
+        r, _, _ = select.select([self._rfd], [], [], timeout)
+        if r:
+            os.read(self._rfd, 64)
+        self._map[WAITING] = 0
+
+        return self._get(TAIL) != self._get(HEAD)
+
+    def wake(self):
+        "Wake the reader, even if the ring is empty"
+        try:
+            os.write(self._wfd, b'\0')
+        except BlockingIOError:
+            pass
+
+    @property
+    def pending(self):
+        return self._get(HEAD) - self._get(TAIL)
+
+    def close(self):
+        for fd in (self._rfd, self._wfd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._map.close()
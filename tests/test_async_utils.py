@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pytest
+
+from kastl.async_utils import coroutine, Channel
+
+
+@coroutine
+def collector(results, limit=None):
+    while True:
+        message = (yield)
+        results.append(message)
+        if limit is not None and len(results) >= limit:
+            return
+
+
+class Test_Channel(object):
+    def test_name(self):
+        Channel('test_name')
+        with pytest.raises(ValueError):
+            Channel('test_name')
+
+    def test_send(self):
+        ch = Channel('test_send')
+        r1, r2 = [], []
+        c1, c2 = collector(r1), collector(r2)
+        ch.suscribe(c1)
+        ch.suscribe(c2)
+
+        with pytest.raises(ValueError):
+            ch.suscribe(c1)
+
+        ch.send(1)
+        assert r1 == [1] and r2 == [1]
+
+        ch.unsuscribe(c1)
+        ch.send(2)
+        assert r1 == [1] and r2 == [1, 2]
+
+        with pytest.raises(ValueError):
+            ch.unsuscribe(c1)
+
+    def test_prune(self):
+        ch = Channel('test_prune')
+        r1, r2 = [], []
+        ch.suscribe(collector(r1, limit=1))
+        ch.suscribe(collector(r2))
+
+        ch.send(1)
+        assert len(ch) == 1
+        ch.send(2)
+        assert r1 == [1] and r2 == [1, 2]
+
+    def test_queued(self):
+        ch = Channel('test_queued')
+        r = []
+        ch.suscribe(collector(r), maxsize=4)
+
+        for i in range(3):
+            ch.send(i)
+
+        for _ in range(100):
+            if len(r) == 3:
+                break
+            time.sleep(0.01)
+
+        assert r == [0, 1, 2]
+        ch.close()
+        assert len(ch) == 0
+
+    def test_failing_subscriber(self):
+        @coroutine
+        def failing():
+            yield
+            raise ValueError('Bad message')
+
+        ch = Channel('test_failing_subscriber')
+        r = []
+        ch.suscribe(failing())
+        ch.suscribe(collector(r))
+
+        ch.send(1)
+        assert r == [1]
+        ch.send(2)
+        assert r == [1, 2] and len(ch) == 1
+
+    def test_close_busy(self):
+        @coroutine
+        def slow(results):
+            while True:
+                results.append((yield))
+                time.sleep(0.05)
+
+        ch = Channel('test_close_busy')
+        r = []
+        ch.suscribe(slow(r), maxsize=4)
+        ch.send(1)
+        time.sleep(0.01)
+
+        ch.close()      # Must not close the coroutine while it runs
+        assert r == [1]
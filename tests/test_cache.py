@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+from threading import Event, Thread
+
+import pytest
+
+from kastl.machines.cache import TelemetryCache, TelemetryCacheError, get_status
+
+
+class Test_TelemetryCache(object):
+    def setup_method(self, method):
+        self.reads = []
+        self.values = {'velocity': 1, 'acceleration': 10}
+        self.cache = TelemetryCache(self.read, ttl=10, static_keys=('acceleration',))
+
+    def read(self, key):
+        self.reads.append(key)
+        return self.values[key]
+
+    def test_hit_miss(self):
+        assert self.cache.get('velocity') == 1
+        assert self.cache.get('velocity') == 1
+        assert self.reads == ['velocity']
+        assert self.cache.stats['hits'] == 1
+        assert self.cache.stats['misses'] == 1
+
+    def test_ttl(self):
+        self.cache.configure(ttl='0', **{'velocity_ttl': '10', 'status.drive_enable_ttl': '1'})
+        assert self.cache.key_ttl('velocity') == 10
+        assert self.cache.key_ttl('status:drive_enable') == 1
+        assert self.cache.key_ttl('position') == 0
+        assert self.cache.key_ttl('acceleration') is None
+
+    def test_expire(self):
+        self.cache.ttl = 0
+        self.cache.get('velocity')
+        self.values['velocity'] = 2
+        assert self.cache.get('velocity') == 2
+
+    def test_write_through(self):
+        self.cache.put('acceleration', 20)
+        assert self.cache.get('acceleration') == 20
+        assert self.reads == []
+
+    def test_errors(self):
+        with pytest.raises(KeyError):
+            self.cache.get('position')
+        assert self.cache.stats['errors'] == 1
+        assert 'position' not in self.cache
+
+    def test_single_flight(self):
+        started, release = Event(), Event()
+
+        def slow_read(key):
+            started.set()
+            release.wait()
+            return self.read(key)
+
+        self.cache.reader = slow_read
+        results = []
+        threads = [Thread(target=lambda: results.append(self.cache.get('velocity')))
+                   for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for t in threads[1:]:
+            t.start()
+        while self.cache.waits < 3:
+            time.sleep(0.001)
+        with pytest.raises(TelemetryCacheError):
+            self.cache.get('velocity', block=False)
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert results == [1] * 4
+        assert self.reads == ['velocity']
+
+    def test_listener(self):
+        changes = []
+        cb = lambda k, v: changes.append((k, v))
+        self.cache.add_listener(cb)
+        self.cache.ttl = 0
+
+        self.cache.get('velocity')
+        self.cache.get('velocity')
+        self.values['velocity'] = 3
+        self.cache.get('velocity')
+        assert changes == [('velocity', 3)]
+
+        self.cache.remove_listener(cb)
+        self.values['velocity'] = 4
+        self.cache.get('velocity')
+        assert changes == [('velocity', 3)]
+
+    def test_get_status(self):
+        local_status = {'machine.status.ready': lambda: True, 'name': 'A'}
+
+        assert get_status(local_status, self.cache, 'machine.status.ready') is True
+        assert get_status(local_status, self.cache, 'name') == 'A'
+        assert get_status(local_status, self.cache, 'machine.velocity') == 1
+        assert self.reads == ['velocity']
+
+        with pytest.raises(KeyError):
+            get_status(local_status, None, 'machine.velocity')
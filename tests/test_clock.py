@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import pytest
+
+from kastl.machines.clock import ClockEstimator, ClockError, to_us, from_us
+from kastl.machines.rtt import RttEstimator
+from kastl.motion.scheduler import SetpointScheduler, SchedulerError
+
+
+def exchange(clock, t0, offset, up, down, process=0.0001, drift=0.0):
+    """
+    Simulate an exchange sent at t0 with a remote clock ahead by offset
+    (plus drift per second) and the given one way delays.
+    """
+    remote = lambda t: t + offset + drift * t
+    t1 = remote(t0 + up)
+    t2 = t1 + process
+    t3 = t0 + up + process + down
+    return clock.add(t0, t1, t2, t3)
+
+
+class Test_ClockEstimator(object):
+    def test_not_synchronized(self):
+        clock = ClockEstimator()
+        assert not clock.synchronized
+        with pytest.raises(ClockError):
+            clock.to_remote(0)
+
+    def test_offset(self):
+        clock = ClockEstimator()
+        sample = exchange(clock, 100, 2.5, 0.001, 0.001)
+        assert sample.offset == pytest.approx(2.5)
+        assert sample.delay == pytest.approx(0.002)
+        assert clock.to_remote(100) == pytest.approx(102.5)
+        assert clock.to_local(102.5) == pytest.approx(100)
+
+    def test_jitter(self):
+        clock = ClockEstimator(window=8)
+        # Asymmetric (jittered) exchanges have longer round trips
+        for i, (up, down) in enumerate([(0.001, 0.001), (0.020, 0.001),
+                                        (0.001, 0.015), (0.001, 0.001)]):
+            exchange(clock, 100 + i, -1.0, up, down)
+
+        assert clock.offset == pytest.approx(-1.0, abs=1e-6)
+
+    def test_drift(self):
+        clock = ClockEstimator(window=8)
+        for i in range(8):
+            exchange(clock, 100 + i * 10, 1.0, 0.001, 0.001, drift=1e-5)
+
+        assert clock.drift == pytest.approx(1e-5, rel=1e-3)
+        assert clock.offset_at(300) == pytest.approx(1.0 + 1e-5 * 300, abs=1e-6)
+
+    def test_us(self):
+        t = 1500000000.123456
+        assert from_us(to_us(t)) == pytest.approx(t, abs=1e-6)
+
+
+class Test_SetpointScheduler(object):
+    def setup_method(self, method):
+        self.values = []
+        self.scheduler = SetpointScheduler(self)
+
+    def __setitem__(self, key, value):
+        self.values.append((key, value))
+
+    def test_tick(self):
+        self.scheduler.schedule(10, 'velocity_ref', 2)
+        self.scheduler.schedule(5, 'velocity_ref', 1)
+
+        assert self.scheduler.tick(4) == 5
+        assert self.values == []
+        assert self.scheduler.tick(10) is None
+        assert self.values == [('velocity_ref', 1), ('velocity_ref', 2)]
+        assert self.scheduler.late == 1
+
+    def test_too_far(self):
+        with pytest.raises(SchedulerError):
+            self.scheduler.schedule(float('inf'), 'velocity_ref', 1)
+
+    def test_cancel(self):
+        self.scheduler.schedule(5, 'velocity_ref', 1)
+        self.scheduler.schedule(5, 'acceleration', 1)
+        self.scheduler.cancel('velocity_ref')
+        self.scheduler.tick(5)
+        assert self.values == [('acceleration', 1)]
+
+
+class Test_RttEstimator(object):
+    def test_estimate(self):
+        rtt = RttEstimator(min_timeout=0.01, max_timeout=1)
+        assert rtt.rto(0.5) == 0.5
+
+        for v in (0.010, 0.012, 0.011, 0.050):
+            rtt.add(v)
+
+        assert 0.010 < rtt.srtt < 0.050
+        assert rtt.percentile(50) == 0.011
+        assert rtt.percentile(100) == 0.050
+        assert 0.01 <= rtt.rto() <= 1
+
+    def test_backoff(self):
+        rtt = RttEstimator(min_timeout=0.01, max_timeout=1)
+        rtt.add(0.02)
+        rto = rtt.rto()
+        rtt.timeout()
+        assert rtt.rto() == pytest.approx(2 * rto)
+        for _ in range(10):
+            rtt.timeout()
+        assert rtt.rto() == 1
+        rtt.add(0.02)
+        assert rtt.rto() < 1
+        assert rtt.timeouts == 11
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+
+import pytest
+
+from kastl.machines import Machine, Slave, SlaveMachine
+from kastl.machines.slave import SlaveGroup
+from kastl.motion import MotionUnit
+from kastl.motion.coordinator import (MoveCoordinator, CoordinatorError,
+                                      move_duration)
+from kastl.motion.scheduler import SetpointScheduler
+from kastl.processors.osc.message import OscMessage
+
+
+def slave_machine(sn, group=None, synchronized=True):
+    config = {'group': group} if group else {}
+    sm = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                      motion_mode='velocity', config=config)
+    sm.slave = Slave(sn, '127.0.0.1', 'Osc', 'velocity', {})
+    if synchronized:
+        t0 = time.time()
+        sm.clock.add(t0, t0 + 0.001, t0 + 0.001, t0 + 0.002)
+    return sm
+
+
+class Test_MoveCoordinator(object):
+    def setup_method(self, method):
+        self.mu = MotionUnit()
+        self.mu.scheduler = SetpointScheduler(self.mu)
+
+        self.machine = Machine(serialnumber='M1', ip_address='127.0.0.1', port=6969)
+        self.mu.machines[('M1', '127.0.0.1')] = self.machine
+        self.sent = []
+        self.machine.driver._send = self.sent.append
+        self.machine.update_pushed_status(OscMessage(
+            Machine.PUSH_PATH, 'machine:position', 0.))
+
+        self.mu.slave_machines = {sn: slave_machine(sn, group)
+                                  for sn, group in (('A', None), ('C', 'front'),
+                                                    ('D', 'front'))}
+        self.mu.slave_machines['B'] = slave_machine('B', synchronized=False)
+
+        config = {'slave_group_front': {'address': '239.0.0.1:7000'}}
+        self.group = SlaveGroup.from_slaves(self.mu.slave_machines, config)['front']
+        self.bundles = []
+        self.group.driver.send_bundle = self.bundles.append
+
+        self.co = MoveCoordinator(self.mu, start_delay=0.1)
+
+    def test_plan(self):
+        plan = self.co.plan({'machine': 10, 'A': -2, 'C': 0}, velocity=2, acceleration=1)
+
+        assert plan.duration == pytest.approx(7)
+        assert sorted(plan.axes) == ['A', 'machine']
+        assert plan.axes['machine'].velocity == pytest.approx(2)
+
+        a = plan.axes['A']
+        assert move_duration(a.distance, a.velocity, a.acceleration) == pytest.approx(7)
+        assert a.acceleration == pytest.approx(a.velocity ** 2 / 4)
+
+    def test_axis_limits(self):
+        plan = self.co.plan({'machine': 10, 'A': (10, 1)}, velocity=2, acceleration=1)
+
+        assert plan.duration == pytest.approx(11)
+        assert plan.axes['A'].velocity == pytest.approx(1)
+        assert plan.axes['machine'].velocity < 2
+
+    def test_cache(self):
+        p = self.co.plan({'machine': 10, 'A': 5}, velocity=2, acceleration=1)
+        assert self.co.plan({'A': 5, 'machine': 10}, velocity=2, acceleration=1) is p
+        assert (self.co.hits, self.co.misses) == (1, 1)
+
+        self.co.cache_size = 1
+        self.co.plan({'machine': 1}, velocity=2, acceleration=1)
+        assert self.co.plan({'machine': 10, 'A': 5}, velocity=2, acceleration=1) is not p
+
+    def test_move(self):
+        plan = self.co.move({'machine': 10}, velocity=2, acceleration=1)
+
+        assert plan.axes['machine'].distance == 10
+        assert ('/machine/set', ('machine:position_ref', 10)) in [
+            (str(m.path), tuple(m.args)) for m in self.sent]
+        assert self.mu.scheduler.pending == 1
+
+        self.mu.scheduler.tick(time.time() + 1)
+        assert (str(self.sent[-1].path), tuple(self.sent[-1].args)) == \
+            ('/machine/set', ('machine:command:go', True))
+
+    def test_dispatch(self):
+        plan = self.co.plan({'machine': 10, 'A': 2, 'C': 4, 'D': 6},
+                            velocity=2, acceleration=1)
+        apply_at = self.co.dispatch(plan, {'machine': 10, 'A': 2, 'C': 4, 'D': 6})
+
+        rq = self.mu.slave_machines['A'].bridge.get(block=False)
+        assert rq.attribute == 'set_many_at'
+        assert rq.args[0] == self.mu.slave_machines['A'].remote_time(apply_at)
+        assert list(rq.args[-4:]) == ['machine:position_ref', 2, 'machine:command:go', True]
+
+        assert len(self.bundles) == 1
+        msgs = sorted(self.bundles[0], key=lambda m: m.args[0])
+        assert [str(m.path) for m in msgs] == [SlaveGroup.PATH_AT] * 2
+        assert [m.args[0] for m in msgs] == ['C', 'D']
+        assert list(msgs[1].args[-4:]) == ['machine:position_ref', 6, 'machine:command:go', True]
+        assert self.mu.slave_machines['C'].bridge.empty()
+
+    def test_unsynchronized(self):
+        plan = self.co.plan({'machine': 10, 'B': 7}, velocity=2, acceleration=1)
+        with pytest.raises(CoordinatorError):
+            self.co.dispatch(plan, {'machine': 10, 'B': 7})
+        assert self.mu.scheduler.pending == 0
+        assert self.sent == []
+
+        with pytest.raises(CoordinatorError):
+            self.co.move({'E': 1}, velocity=2, acceleration=1)
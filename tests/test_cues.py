@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import pytest
+
+from kastl.configparser import AbstractConfigParser
+from kastl.machines import Machine, Slave, SlaveMachine
+from kastl.motion import MotionUnit
+from kastl.motion.cues import CueEngine, CueError
+
+CONFIG = """
+[cue_intro]
+label = Fly in
+acceleration = 200
+velocity_ref = 30
+command.go = True
+
+[cue_bad]
+status = 1
+
+[cue_typo]
+velocity_ref = fast
+
+[slave_A]
+machine.velocity_ref_mode = multiply
+machine.velocity_ref_value = 2
+"""
+
+
+class Test_CueEngine(object):
+    def setup_method(self, method):
+        self.mu = MotionUnit()
+        self.mu.config = AbstractConfigParser()
+        self.mu.config.read_string(CONFIG)
+
+        self.machine = Machine(serialnumber='M1', ip_address='127.0.0.1', port=6969)
+        self.mu.machines[('M1', '127.0.0.1')] = self.machine
+        self.sent = []
+        self.machine.driver._send = self.sent.append
+
+        self.slave = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                                  motion_mode='velocity', config={})
+        self.slave.slave = Slave('A', '127.0.0.1', 'Osc', 'velocity', {})
+        self.mu.slave_machines['A'] = self.slave
+
+        self.cues = CueEngine(self.mu)
+
+    def test_compile(self):
+        cues = self.cues.compile()
+        assert list(cues) == ['intro']
+
+        cue = cues['intro']
+        assert cue.label == 'Fly in'
+        assert cue.steps == [('machine:acceleration', 200.),
+                             ('machine:velocity_ref', 30.),
+                             ('machine:command:go', True)]
+        assert cue.slaves == {'A': [('machine:acceleration', 200.),
+                                    ('machine:velocity_ref', 60.),
+                                    ('machine:command:go', True)]}
+
+    def test_go(self):
+        self.mu.cache.put('velocity_ref', 10)
+        self.cues.go('intro')
+
+        assert [(str(m.path), tuple(m.args)) for m in self.sent] == [
+            ('/machine/set_many', ('machine:acceleration', 200., 'machine:velocity_ref', 30.,
+                                   'machine:command:go', True))]
+        assert self.mu.cache.peek('velocity_ref') is None
+        assert self.cues.fired == 1
+
+        rq = self.slave.bridge.get(block=False)
+        assert rq.attribute == 'set_many'
+        assert list(rq.args) == ['machine:acceleration', 200., 'machine:velocity_ref', 60.,
+                                 'machine:command:go', True]
+
+        with pytest.raises(CueError):
+            self.cues.go('bad')
+
+    def test_no_machine(self):
+        self.mu.machines.clear()
+        with pytest.raises(CueError):
+            self.cues.go('intro')
+        assert self.slave.bridge.empty()
+
+    def test_revision(self):
+        assert self.cues.names == ['intro']
+
+        self.mu.config.set('cue_intro', 'velocity_ref', '40')
+        self.mu.config.remove_section('slave_A')
+        cue = self.cues['intro']
+        assert cue.steps[1] == ('machine:velocity_ref', 40.)
+        assert cue.slaves == {}
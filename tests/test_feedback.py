@@ -0,0 +1,124 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import pytest
+
+from kastl.remotes.feedback import FeedbackEngine, FeedbackError
+
+
+class FakeRemote(object):
+    PROTOCOL = 'Fake'
+
+    encoded = 0
+
+    def __init__(self, keys, interval=0.1):
+        self.feedback_keys = keys
+        self.feedback_interval = interval
+        self.frames = []
+
+    def encode_feedback(self, pairs):
+        FakeRemote.encoded += 1
+        return tuple(pairs)
+
+    def send_feedback(self, frame):
+        self.frames.append(frame)
+
+
+class Test_FeedbackEngine(object):
+    def setup_method(self, method):
+        self.reads = []
+        self.status = {'machine.velocity': 1., 'machine.position': 10.}
+        self.engine = FeedbackEngine(self.status, keyframe_interval=10)
+        FakeRemote.encoded = 0
+
+    def test_shared_stream(self):
+        r1 = FakeRemote(('machine.velocity', 'machine.position'))
+        r2 = FakeRemote(('machine.velocity', 'machine.position'))
+        r3 = FakeRemote(('machine.velocity',))
+
+        self.engine.add(r1)
+        self.engine.add(r2)
+        self.engine.add(r3)
+        assert len(self.engine.streams) == 2
+
+        assert self.engine.tick(0) == pytest.approx(0.1)
+        assert self.engine.samples == 2
+        assert FakeRemote.encoded == 2
+        assert r1.frames == r2.frames == [('machine.velocity', 1., 'machine.position', 10.)]
+        assert r1.frames[0] is r2.frames[0]
+        assert r3.frames == [('machine.velocity', 1.)]
+
+    def test_deltas(self):
+        r = FakeRemote(('machine.velocity', 'machine.position'))
+        self.engine.add(r)
+
+        self.engine.tick(0)
+        self.engine.tick(0.1)
+        assert len(r.frames) == 1   # Nothing changed
+
+        self.status['machine.velocity'] = 2.
+        self.engine.tick(0.2)
+        assert r.frames[-1] == ('machine.velocity', 2.)
+
+        # Keyframe
+        self.engine.tick(10)
+        assert r.frames[-1] == ('machine.velocity', 2., 'machine.position', 10.)
+
+    def test_join(self):
+        r1 = FakeRemote(('machine.velocity', 'machine.position'))
+        r2 = FakeRemote(('machine.velocity', 'machine.position'))
+
+        self.engine.add(r1)
+        self.engine.tick(0)
+
+        self.engine.add(r2)
+        self.engine.tick(0.1)
+        assert r2.frames == [('machine.velocity', 1., 'machine.position', 10.)]
+
+    def test_remove(self):
+        r = FakeRemote(('machine.velocity',))
+        self.engine.add(r)
+        self.engine.remove(r)
+
+        assert self.engine.streams == []
+        assert self.engine.tick(0) is None
+
+    def test_max_rate(self):
+        r = FakeRemote(('machine.velocity',), interval=0)
+        stream = self.engine.add(r)
+        assert stream.interval == 1 / self.engine.max_rate
+
+    def test_no_keys(self):
+        with pytest.raises(FeedbackError):
+            self.engine.add(FakeRemote(()))
+
+    def test_encoder(self):
+        r1 = FakeRemote(('machine.velocity',))
+        r2 = FakeRemote(('machine.velocity',))
+        stream = self.engine.add(r1)
+        self.engine.add(r2)
+
+        r1.feedback_keys = ('machine.position',)
+        self.engine.add(r1)
+        assert stream.encoder == r2.encode_feedback
+
+    def test_sample_failure(self, caplog):
+        r = FakeRemote(('machine.velocity', 'machine.missing'))
+        self.engine.add(r)
+
+        self.engine.tick(0)
+        self.engine.tick(1)
+        assert [rec.levelname for rec in caplog.records] == ['WARNING']
+
+        self.status['machine.missing'] = 2
+        self.engine.tick(2)
+        assert r.frames[-1] == ('machine.missing', 2)
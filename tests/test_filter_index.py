@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import pytest
+
+from kastl.filters import Filter, FilterIndex
+from kastl.processors.osc.message import OscMessage, OscAddress
+
+
+class Test_FilterIndex(object):
+    def setup_class(self):
+        self.filters = list()
+        self.filters.append(Filter(protocol='Osc', alias_mask='/identify', args_length=2))
+        self.filters.append(Filter(protocol='Osc', alias_mask='/identify', args_length=3))
+        self.filters.append(Filter(protocol='Osc', alias_mask='/alive', exclusive=True))
+        self.filters.append(Filter(sender='127.0.0.1', exclusive=True))
+        self.filters.append(Filter(sender='127.0.0.2', exclusive=True))
+        self.filters.append(Filter(protocol='Serial'))
+        self.filters.append(Filter(protocol='Osc', alias_mask='/config/'))
+        self.filters.append(Filter(protocol='Osc'))
+        self.filters.append(Filter(alias_mask='/'))
+
+        self.index = FilterIndex()
+        for f in self.filters:
+            self.index.add(f)
+
+    def test_order(self):
+        assert len(self.index) == len(self.filters)
+        assert list(self.index) == self.filters
+        assert [f.order for f in self.filters] == list(range(len(self.filters)))
+
+    def test_type(self):
+        with pytest.raises(TypeError):
+            FilterIndex().add(object())
+
+    def test_match(self):
+        messages = (
+            self.message('/identify', 'sn', 'ip'),
+            self.message('/identify', 'sn', 'ip', 'type', sender='127.0.0.3'),
+            self.message('/alive'),
+            self.message('/config/get', 'key', sender='127.0.0.2'),
+            self.message('/config', sender='127.0.0.4'),
+            self.message('empty', sender='127.0.0.4'),
+        )
+
+        for msg in messages:
+            expected = [f for f in self.filters if f.accepts(msg)]
+            assert list(self.index.match(msg)) == expected
+
+    def test_no_match(self):
+        index = FilterIndex()
+        index.add(Filter(protocol='Serial'))
+
+        assert list(index.match(self.message('/alive'))) == []
+
+    def message(self, *args, **kwargs):
+        s = kwargs.pop('sender', '127.0.0.1')
+        msg = OscMessage(*args, hostname='127.0.0.1', **kwargs)
+        msg.sender = OscAddress(hostname=s)
+        return msg
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from kastl.futures import FutureRegistry, FutureTimeout, request_path
+
+
+class FakeFuture(object):
+    def __init__(self, name):
+        self.name = name
+        self.exception = None
+
+    def set_exception(self, e):
+        self.exception = e
+
+
+class Test_FutureRegistry(object):
+    def setup_method(self, method):
+        self.reg = FutureRegistry(timeout=1.0)
+
+    def test_request_path(self):
+        assert request_path('/machine/get/ok') == '/machine/get'
+        assert request_path('/machine/get/error') == '/machine/get'
+        assert request_path('/machine/get') == '/machine/get'
+        assert request_path('/ok') == '/ok'
+
+    def test_path_fifo(self):
+        f1, f2 = FakeFuture(1), FakeFuture(2)
+        self.reg.add(f1, '/machine/get', now=0)
+        self.reg.add(f2, '/machine/get', now=0)
+
+        assert self.reg.pop('/machine/get/ok') is f1
+        assert self.reg.pop('/machine/get/error') is f2
+        assert self.reg.pop('/machine/get/ok') is None
+        assert len(self.reg) == 0
+
+    def test_uid(self):
+        f1, f2 = FakeFuture(1), FakeFuture(2)
+        self.reg.add(f1, '/slave/get', uid=1, now=0)
+        self.reg.add(f2, '/slave/get', uid=2, now=0)
+
+        assert self.reg.pop('/slave/get/ok', uid=2) is f2
+        assert self.reg.pop('/slave/get/ok', uid=1) is f1
+
+        with pytest.raises(ValueError):
+            self.reg.add(f1, '/slave/get', uid=3, now=0)
+            self.reg.add(f2, '/slave/get', uid=3, now=0)
+
+    def test_expire(self):
+        f1, f2, f3 = FakeFuture(1), FakeFuture(2), FakeFuture(3)
+        self.reg.add(f1, '/a', now=0)
+        self.reg.add(f2, '/a', now=0.5)
+        self.reg.add(f3, '/b', uid=3, now=0.5)
+
+        assert self.reg.next_deadline() == 1.0
+        assert self.reg.expire(1.0) == [f1]
+        assert isinstance(f1.exception, FutureTimeout)
+
+        assert self.reg.pop('/b/ok', uid=3) is f3
+        assert self.reg.expire(2.0) == [f2]
+        assert self.reg.next_deadline() is None
+        assert len(self.reg) == 0
+        assert self.reg.pop('/a/ok') is None
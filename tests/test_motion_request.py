@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+from threading import Event
+
+from kastl.motion.request import (AxisArbiter, MotionRequest,
+                                  MotionRequestError, MotionRequestScheduler)
+from kastl.reactor import Reactor
+
+
+class FakeUnit(object):
+    def __init__(self):
+        self.values = []
+        self.gate = Event()
+        self.gate.set()
+
+    def __setitem__(self, key, value):
+        self.gate.wait(1)
+        self.values.append((key, value))
+
+
+class FakeRemote(object):
+    MOTION_PRIORITY = 0
+
+
+class Test_AxisArbiter(object):
+    def setup_method(self, method):
+        self.arbiter = AxisArbiter(lease=1)
+        self.r1 = FakeRemote()
+        self.r2 = FakeRemote()
+
+    def test_lease(self):
+        assert self.arbiter.acquire('machine', self.r1, now=0)
+        assert not self.arbiter.acquire('machine', self.r2, now=0.5)
+        assert self.arbiter.acquire('machine', self.r1, now=0.9)   # Renewed
+        assert not self.arbiter.acquire('machine', self.r2, now=1.5)
+        assert self.arbiter.acquire('machine', self.r2, now=2)
+        assert self.arbiter.owner('machine', now=2) is self.r2
+
+    def test_priority(self):
+        assert self.arbiter.acquire('machine', self.r1, now=0)
+        assert self.arbiter.acquire('machine', self.r2, priority=1, now=0.1)
+        assert not self.arbiter.acquire('machine', self.r1, now=0.2)
+
+    def test_release(self):
+        self.arbiter.acquire('machine', self.r1, now=0)
+        self.arbiter.release(self.r1)
+        assert self.arbiter.acquire('machine', self.r2, now=0)
+
+
+class Test_MotionRequestScheduler(object):
+    def setup_method(self, method):
+        self.unit = FakeUnit()
+        self.scheduler = MotionRequestScheduler(self.unit, ownership_lease=10)
+        self.done = []
+        self.reactor = Reactor()
+        self.reactor.start()
+
+    def teardown_method(self, method):
+        self.unit.gate.set()
+        self.scheduler.stop()
+        self.reactor.stop()
+        self.reactor.close()
+
+    def request(self, request_type, value, remote=None):
+        return MotionRequest(request_type, value, remote=remote,
+                             callback=self.done.append)
+
+    def test_apply(self):
+        self.scheduler.start(self.reactor)
+        r = self.scheduler.submit(self.request('velocity', '2.5'))
+
+        assert r.done_ev.wait(1)
+        assert self.unit.values == [('machine:velocity_ref', 2.5)]
+        assert self.done == [r]
+        assert r.error is None
+
+    def test_supersede(self):
+        r1 = self.scheduler.submit(self.request('velocity', 1))
+        r2 = self.scheduler.submit(self.request('acceleration', 1))
+        r3 = self.scheduler.submit(self.request('velocity', 2))
+
+        assert r1.superseded and r1.result is r3
+        assert self.done == [r1]
+        assert self.scheduler.pending == 2
+
+        self.scheduler.start(self.reactor)
+        assert r3.done_ev.wait(1)
+        assert r2.done_ev.wait(1)
+        assert sorted(self.unit.values) == [('machine:acceleration', 1.),
+                                            ('machine:velocity_ref', 2.)]
+
+    def test_non_blocking(self):
+        self.unit.gate.clear()      # The drive hangs
+        self.scheduler.start(self.reactor)
+
+        start = time.time()
+        for i in range(10):
+            self.scheduler.submit(self.request('velocity', i))
+        assert time.time() - start < 0.1
+
+        self.unit.gate.set()
+        time.sleep(0.1)
+        assert self.unit.values[-1] == ('machine:velocity_ref', 9.)
+
+    def test_arbitration(self):
+        r1, r2 = FakeRemote(), FakeRemote()
+        self.scheduler.submit(self.request('velocity', 1, r1))
+        refused = self.scheduler.submit(self.request('velocity', 2, r2))
+
+        assert isinstance(refused.error, MotionRequestError)
+        assert self.scheduler.refused == 1
+
+        self.scheduler.release(r1)
+        assert isinstance(self.done[-1].error, MotionRequestError)
+        assert self.scheduler.pending == 0
+
+        taken = self.scheduler.submit(self.request('velocity', 2, r2))
+        assert taken.error is None
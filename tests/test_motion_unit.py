@@ -0,0 +1,179 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+from threading import Event
+
+import pytest
+
+from kastl.configparser import AbstractConfigParser
+from kastl.machines import Machine, MachineError, Slave, SlaveMachine
+from kastl.motion import MotionUnit
+from kastl.motion.exceptions import MotionError
+from kastl.motion.request import MotionRequest, MotionRequestScheduler
+from kastl.motion.status import StatusPublisher
+from kastl.motion.trajectory import TrajectoryPlayer
+from kastl.motion.watchdog import Watch
+from kastl.processors.osc.message import OscMessage
+from kastl.processors.processors import OscProcessor
+from kastl.reactor import Reactor
+from kastl.remotes.feedback import FeedbackEngine
+
+
+class Test_MotionUnit(object):
+    def setup_method(self, method):
+        self.mu = MotionUnit()
+        self.machine = Machine(serialnumber='A1', ip_address='127.0.0.1', port=6969)
+        self.mu.machines[('A1', '127.0.0.1')] = self.machine
+
+        self.sent = []
+        self.machine.driver._send = self.sent.append
+        self.machine.update_pushed_status(OscMessage(
+            Machine.PUSH_PATH, 'machine:velocity', 2.5, 'machine:position', 0.,
+            'machine:velocity_ref', 1., 'machine:status:drive_enable', True))
+
+    def test_get(self):
+        assert self.mu.machine is self.machine
+        assert self.mu['machine:velocity'] == 2.5
+        assert self.mu.cache.peek('velocity') == 2.5
+        assert self.sent == []
+
+        with pytest.raises(KeyError):
+            self.mu['remote:velocity']
+
+    def test_read_in_reactor(self):
+        reactor = self.machine.reactor = Reactor()
+        reactor.start()
+        try:
+            done = Event()
+            errors = []
+
+            def read():
+                try:
+                    self.machine.read('machine:torque')
+                except MachineError as e:
+                    errors.append(e)
+                done.set()
+
+            reactor.call_soon(read)
+            assert done.wait(1)
+        finally:
+            reactor.stop()
+            reactor.close()
+
+        assert len(errors) == 1
+        assert self.sent == []
+
+    def test_samples(self):
+        feedback = FeedbackEngine(self.mu.local_status, self.mu.cache)
+        assert feedback.sample('machine.status.drive_enable') is True
+
+        publisher = StatusPublisher(self.mu.local_status, self.mu.cache)
+        assert publisher.sample('machine.velocity') == 2.5
+
+    def test_set(self):
+        assert self.mu['machine:velocity_ref'] == 1.
+        self.mu['machine:velocity_ref'] = [3]
+        self.mu['machine:command:enable'] = False
+
+        assert [(str(m.path), tuple(m.args)) for m in self.sent] == [
+            ('/machine/set', ('machine:velocity_ref', 3)),
+            ('/machine/set', ('machine:command:enable', False))]
+        assert self.mu.cache.peek('velocity_ref') is None
+
+    def test_motion_request(self):
+        request = MotionRequest('velocity', '1.5')
+        MotionRequestScheduler(self.mu).apply(request)
+
+        assert request.error is None
+        assert [(str(m.path), tuple(m.args)) for m in self.sent] == [
+            ('/machine/set', ('machine:velocity_ref', 1.5))]
+
+    def test_move(self):
+        self.mu.trajectories = TrajectoryPlayer(rate=100)
+        profile = self.mu.move([1], velocity=2, acceleration=4)
+        assert profile.duration > 0
+
+        self.mu.trajectories.tick(time.time() + profile.duration + 1)
+        assert [(str(m.path), m.args[0]) for m in self.sent] == [
+            ('/machine/set', 'machine:velocity_ref')]
+
+        self.mu.machines.clear()
+        with pytest.raises(MotionError):
+            self.mu.move([1], velocity=2, acceleration=4)
+
+    def test_timeouts(self):
+        class Remote(object):
+            timeount_ev = Event()
+
+        watch = Watch(None, 'master', 0.5, None)
+        self.mu._master_timeout(watch)
+        self.mu._remote_timeout(Remote(), watch)
+
+        assert self.mu.timeout_ev.is_set()
+        assert Remote.timeount_ev.is_set()
+        assert [(str(m.path), tuple(m.args)) for m in self.sent] == [
+            ('/machine/set', ('machine:command:enable', False))] * 2
+
+    def test_master_recover(self):
+        watch = Watch(None, 'master', 0.5, None)
+        self.mu._master_timeout(watch)
+        self.mu._master_recover(watch)
+        assert not self.mu.timeout_ev.is_set()
+
+        self.mu['machine:velocity_ref'] = 3
+        self.mu['machine:velocity_ref'] = 4
+        assert [(str(m.path), tuple(m.args)) for m in self.sent] == [
+            ('/machine/set', ('machine:command:enable', False)),
+            ('/machine/set', ('machine:command:enable', True)),
+            ('/machine/set', ('machine:velocity_ref', 3)),
+            ('/machine/set', ('machine:velocity_ref', 4))]
+
+    def test_handle(self, caplog):
+        processor = self.mu.processors['OSC'] = OscProcessor(self.mu)
+        executed = []
+        processor.execute = executed.append
+
+        self.mu.handle(OscMessage('/remote/feedback', 1))
+        self.mu.handle(OscMessage('/cue/list'))
+
+        assert [m.command for m in executed] == ['/cue/list']
+        assert not [r for r in caplog.records if r.levelname == 'ERROR']
+
+    def test_slave_forwarding(self):
+        self.mu.config = AbstractConfigParser()
+        self.mu.config.read_string('[slave_SN1]\n'
+                                   'machine.acceleration_mode = multiply\n'
+                                   'machine.acceleration_value = 2\n')
+        sm = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                          motion_mode='velocity', config={})
+        sm.slave = Slave('SN1', '127.0.0.1', 'Osc', 'velocity', {})
+        self.mu.slave_machines['SN1'] = sm
+
+        self.mu['machine:acceleration'] = 5
+        self.machine.update_pushed_status(OscMessage(
+            Machine.PUSH_PATH, 'machine:acceleration', 5.))
+        assert sm._changed_values(sm._pop_changed()) == [('machine:acceleration', 10.)]
+
+        # Sampled changes of a source are forwarded too
+        self.mu.cache.ttl = 0
+        self.mu['machine:velocity']
+        self.machine.update_pushed_status(OscMessage(
+            Machine.PUSH_PATH, 'machine:velocity', 3.))
+        self.mu['machine:velocity']
+        assert sm._changed_values(sm._pop_changed()) == [('machine:velocity_ref', 3.)]
+
+    def test_no_machine(self):
+        self.mu.machines.clear()
+
+        with pytest.raises(MotionError):
+            self.mu['machine:velocity_ref'] = 3
@@ -0,0 +1,176 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+from threading import Event
+
+from kastl.reactor import Reactor
+from kastl.machines.slave import Slave, SlaveMachine
+
+
+class Test_Reactor(object):
+    def setup_method(self, method):
+        self.reactor = Reactor()
+        self.reactor.start()
+
+    def teardown_method(self, method):
+        self.reactor.stop()
+        self.reactor.close()
+
+    def test_call_soon(self):
+        ev = Event()
+        calls = []
+
+        self.reactor.call_soon(calls.append, 1)
+        self.reactor.call_soon(calls.append, 2)
+        self.reactor.call_soon(ev.set)
+
+        assert ev.wait(1)
+        assert calls == [1, 2]
+
+    def test_timers(self):
+        ev = Event()
+        calls = []
+
+        self.reactor.call_later(0.05, calls.append, 'late')
+        self.reactor.call_later(0.01, calls.append, 'early')
+        self.reactor.call_later(0.02, calls.append, 'cancelled').cancel()
+        self.reactor.call_later(0.1, ev.set)
+
+        assert ev.wait(1)
+        assert calls == ['early', 'late']
+
+    def test_call_every(self):
+        ev = Event()
+        calls = []
+
+        def cb():
+            calls.append(time.monotonic())
+            if len(calls) == 3:
+                ev.set()
+
+        timer = self.reactor.call_every(0.01, cb)
+        assert ev.wait(1)
+        timer.cancel()
+
+    def test_exception(self):
+        ev = Event()
+        self.reactor.call_soon(lambda: 1 / 0)
+        self.reactor.call_soon(ev.set)
+        assert ev.wait(1)
+
+    def test_ticker(self):
+        steps = []
+
+        def step():
+            steps.append(time.monotonic())
+            return 0.05, time.monotonic() + 10
+
+        ticker = self.reactor.ticker(step)
+        ticker.start()
+        time.sleep(0.02)
+        assert len(steps) == 1
+
+        # Woken, but not before pause
+        ticker.wake()
+        time.sleep(0.01)
+        assert len(steps) == 1
+        time.sleep(0.08)
+        assert len(steps) == 2
+        assert steps[1] - steps[0] >= 0.05
+
+        ticker.cancel()
+
+
+class FakeDriver(object):
+    "Answers every request at once, in the reactor"
+
+    def __init__(self):
+        self.sent = []
+
+    def attach(self, reactor):
+        self.reactor = reactor
+
+    def connect(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def _reply(self, path, args, callback):
+        self.sent.append((path, args))
+        reply = type('Reply', (), {'path': path + '/ok', 'args': (1,) + args})()
+        future = type('Future', (), {'exception': None, 'raw_result': reply})()
+        self.reactor.call_soon(callback, future)
+
+    def set(self, key, *args, **kwargs):
+        self._reply('/slave/set', (key,) + args, kwargs['callback'])
+
+    def set_many(self, *args, **kwargs):
+        pairs = tuple(a for k, v in zip(args[0::2], args[1::2]) for a in (k, 'ok', v))
+        self._reply('/slave/set_many', pairs, kwargs['callback'])
+
+    def get_time(self, **kwargs):
+        now = int(time.time() * 1000000)
+        self._reply('/slave/time', (now, now, now), kwargs['callback'])
+
+
+class FakeMaster(object):
+    def __init__(self):
+        self.machine_keys = self
+        self.value = 1.
+
+    def get_value_for_slave(self, slave, key, value=None):
+        return self.value
+
+
+class Test_SlaveInReactor(object):
+    def setup_method(self, method):
+        self.reactor = Reactor()
+        self.reactor.start()
+
+        self.sm = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                               motion_mode='velocity', config={})
+        self.sm.slave = Slave('SN1', '127.0.0.1', 'Osc', 'velocity', {})
+        self.sm.machine = FakeMaster()
+        self.sm.driver = FakeDriver()
+
+    def teardown_method(self, method):
+        self.sm.exit()
+        self.reactor.stop()
+        self.reactor.close()
+
+    def sent(self, path):
+        return [args for p, args in self.sm.driver.sent if p == path]
+
+    def test_start(self):
+        self.sm.start(reactor=self.reactor)
+        time.sleep(0.1)
+
+        assert self.sent('/slave/set') == [
+            ('machine:command:control_mode', 2),
+            ('machine:command:enable', False),
+        ]
+        # Keepalive sends every key
+        assert len(self.sent('/slave/set_many')) == 1
+        assert self.sm.clock.synchronized
+        assert self.sm._in_flight == 0
+
+    def test_notify(self):
+        self.sm.start(reactor=self.reactor)
+        time.sleep(0.1)
+
+        self.sm.machine.value = 2.
+        self.sm.notify('machine:velocity')
+        time.sleep(0.1)
+
+        assert self.sent('/slave/set_many')[-1] == ('machine:velocity_ref', 'ok', 2.)
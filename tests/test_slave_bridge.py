@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+from queue import Empty
+
+import pytest
+
+from kastl.machines.slave import SlaveBridge, SlaveRequest
+
+
+def setitem(key, value):
+    return SlaveRequest(key, value, setitem=True)
+
+
+def set_many(*pairs):
+    return SlaveRequest('set_many', *pairs)
+
+
+class Test_SlaveBridge(object):
+    def setup_method(self, method):
+        self.bridge = SlaveBridge(('machine:velocity_ref', 'machine:acceleration'))
+
+    def drain(self):
+        items = []
+        while True:
+            try:
+                items.append(self.bridge.get(block=False))
+            except Empty:
+                return items
+            self.bridge.task_done()
+
+    def test_latest_value_wins(self):
+        for v in range(10):
+            self.bridge.put(setitem('machine:velocity_ref', v))
+
+        items = self.drain()
+        assert len(items) == 1
+        assert items[0].args == (9,)
+        assert self.bridge.superseded == 9
+
+    def test_superseded_callbacks(self):
+        replies = []
+        for v in range(3):
+            rq = setitem('machine:velocity_ref', v)
+            rq.set_callback(lambda data, v=v: replies.append((v, data)))
+            self.bridge.put(rq)
+
+        item, = self.drain()
+        item.callback('ok')
+        assert sorted(replies) == [(0, 'ok'), (1, 'ok'), (2, 'ok')]
+
+    def test_set_many_coalesced(self):
+        self.bridge.put(set_many('machine:velocity_ref', 1, 'machine:acceleration', 2))
+        self.bridge.put(set_many('machine:velocity_ref', 3))
+
+        items = self.drain()
+        assert len(items) == 1
+        assert items[0].values == {'machine:velocity_ref': 3, 'machine:acceleration': 2}
+
+    def test_commands_are_barriers(self):
+        self.bridge.put(setitem('machine:velocity_ref', 1))
+        self.bridge.put(setitem('machine:command:enable', False))
+        self.bridge.put(setitem('machine:velocity_ref', 2))
+        self.bridge.put(setitem('machine:velocity_ref', 3))
+        self.bridge.put(setitem('machine:command:enable', True))
+
+        items = [(rq.item, rq.args[0]) for rq in self.drain()]
+        assert items == [
+            ('machine:velocity_ref', 1),
+            ('machine:command:enable', False),
+            ('machine:velocity_ref', 3),
+            ('machine:command:enable', True),
+        ]
+
+    def test_no_overtaking(self):
+        self.bridge.put(set_many('machine:velocity_ref', 1))
+        self.bridge.put(setitem('machine:velocity_ref', 2))
+        self.bridge.put(set_many('machine:velocity_ref', 3))
+
+        items = [rq.values['machine:velocity_ref'] for rq in self.drain()]
+        assert items[-1] == 3
+
+    def test_stats(self):
+        self.bridge.put(setitem('machine:velocity_ref', 1))
+        assert self.bridge.stats['pending'] == 1
+        self.drain()
+
+        stats = self.bridge.stats
+        assert stats['pending'] == 0
+        assert stats['setpoints'] == 1
+        assert stats['max_age'] >= stats['last_age'] >= 0
+
+    def test_get_timeout(self):
+        with pytest.raises(Empty):
+            self.bridge.get(timeout=0.01)
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+from threading import Thread
+
+from kastl.machines.slave import Slave, SlaveKey, SlaveMachine, SlaveGroup
+from kastl.processors.osc.message import OscMessage
+
+
+class Test_SlaveForwarding(object):
+    def setup_method(self, method):
+        self.sm = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                               motion_mode='velocity', config={})
+        self.sm.slave = Slave('SN1', '127.0.0.1', 'Osc', 'velocity', {})
+
+    def test_keys(self):
+        assert self.sm.source_keys == frozenset((
+            'machine:velocity', 'machine:acceleration', 'machine:deceleration'))
+        assert self.sm.feedback_keys == (
+            SlaveKey('machine:velocity_ref', 'machine:velocity'),)
+
+    def test_notify(self):
+        self.sm.notify('machine:torque_ref')
+        assert not self.sm._change_ev.is_set()
+
+        self.sm.notify('machine:acceleration')
+        assert self.sm._change_ev.is_set()
+
+        assert self.sm._pop_changed() == (SlaveKey('machine:acceleration', None),)
+        assert not self.sm._change_ev.is_set()
+        assert self.sm._pop_changed() == ()
+
+    def test_feedback(self):
+        assert self.sm._pop_changed(feedback=True) == self.sm.feedback_keys
+
+    def test_superseded_set(self):
+        results = []
+        waiter = Thread(target=lambda: results.append(
+            self.sm.set_to_remote('machine:velocity_ref', 1, block=True)))
+        waiter.start()
+        while self.sm.bridge.empty():
+            time.sleep(0.001)
+
+        self.sm.set_to_remote('machine:velocity_ref', 2)
+        rq = self.sm.bridge.get(block=False)
+        rq.callback(OscMessage('/slave/set/ok', 1, 'machine:velocity_ref', 2))
+
+        waiter.join(1)
+        assert results == [2]
+
+
+class Test_SlaveAdapt(object):
+    def setup_method(self, method):
+        self.sm = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                               motion_mode='velocity',
+                               config={'window': 8, 'min_interval': 0.01,
+                                       'feedback_interval': 0.05})
+        self.sm.slave = Slave('SN1', '127.0.0.1', 'Osc', 'velocity', {})
+
+    def test_fast_link(self):
+        for _ in range(20):
+            self.sm.rtt.add(0.002)
+        self.sm.adapt()
+
+        assert self.sm.timeout == self.sm.rtt.min_timeout
+        assert self.sm.window_size == 1
+        assert self.sm.min_interval == 0.01
+        assert self.sm.feedback_interval == 0.05
+
+    def test_slow_link(self):
+        for rtt in (0.2, 0.3, 0.25, 0.4) * 5:
+            self.sm.rtt.add(rtt)
+        self.sm.adapt()
+
+        assert self.sm.timeout > 0.3
+        assert self.sm.window_size == 8
+        assert self.sm.feedback_interval == 0.4
+        assert self.sm.min_interval > 0.01
+
+    def test_stats(self):
+        stats = self.sm.link_stats
+        assert stats['srtt'] is None
+        assert stats['window_size'] == 8
+        assert stats['queue_pending'] == 0
+
+
+class Test_SlaveGroup(object):
+    def setup_method(self, method):
+        self.members = {}
+        for sn in ('SN1', 'SN2'):
+            sm = SlaveMachine(address='127.0.0.1:6969', driver_type='Osc',
+                              motion_mode='velocity', config={'group': 'front'})
+            sm.slave = Slave(sn, '127.0.0.1', 'Osc', 'velocity', {})
+            self.members[sn] = sm
+
+        config = {'slave_group_front': {'address': '239.0.0.1:7000'}}
+        self.group = SlaveGroup.from_slaves(self.members, config)['front']
+
+        self.bundles = []
+        self.group.driver.send_bundle = self.bundles.append
+
+    def test_members(self):
+        assert len(self.group.members) == 2
+        assert all(sm.group is self.group for sm in self.members.values())
+        assert self.group.driver.target.port == 7000
+
+    def test_send(self):
+        sm1, sm2 = self.members['SN1'], self.members['SN2']
+        self.group.send({
+            sm1: [('machine:velocity_ref', 10)],
+            sm2: [('machine:velocity_ref', 20), ('machine:acceleration', 5)],
+        })
+
+        assert len(self.bundles) == 1
+        msgs = sorted(self.bundles[0], key=lambda m: m.args[0])
+        assert [m.path for m in msgs] == [SlaveGroup.PATH] * 2
+        assert list(msgs[1].args) == ['SN2', 'machine:velocity_ref', 20,
+                                      'machine:acceleration', 5]
+        assert sm2.last_values == {'machine:velocity_ref': 20, 'machine:acceleration': 5}
+
+    def test_notify(self):
+        self.members['SN1'].notify('machine:velocity')
+        assert self.group._wake_ev.is_set()
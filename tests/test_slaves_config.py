@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+from collections import namedtuple
+
+import pytest
+
+from kastl.machines.modes.abstract_machinemode import MachineModeException
+from kastl.machines.modes.master import SlavesConfig, compile_transform
+
+_Slave = namedtuple('_Slave', ('serialnumber',))
+_SlaveMachine = namedtuple('_SlaveMachine', ('slave',))
+
+
+class _Config(dict):
+    revision = 0
+
+
+class Test_SlavesConfig(object):
+    def setup_method(self, method):
+        self.config = _Config({
+            'slave_A': {
+                'machine.velocity_ref_mode': 'multiply',
+                'machine.velocity_ref_value': '2',
+            },
+            'slave_B': {
+                'machine.velocity_ref_mode': 'default',
+                'machine.velocity_ref_value': '5',
+            },
+            'slave_C': {
+                'machine.velocity_ref_mode': 'divide',
+            },
+        })
+        slaves = {sn: _SlaveMachine(_Slave(sn)) for sn in 'ABC'}
+        self.sc = SlavesConfig(self.config, slaves)
+
+    def test_transforms(self):
+        assert compile_transform('forward').function(-3) == -3
+        assert compile_transform('add', 1).function(-3) == 4
+        assert compile_transform('substract', 1).function(-3) == -2
+
+        with pytest.raises(MachineModeException):
+            compile_transform('unknown', 1)
+
+    def test_table(self):
+        table = self.sc.table('machine:velocity_ref')
+        assert table['A'].function(3) == 6
+        assert table['B'].function(3) == 5
+        assert isinstance(table['C'], MachineModeException)
+
+        with pytest.raises(MachineModeException):
+            self.sc.transform('C', 'machine:velocity_ref')
+
+        assert self.sc.transform('A', 'machine:acceleration').mode == 'forward'
+
+    def test_revision(self):
+        table = self.sc.table('machine:velocity_ref')
+        assert self.sc.table('machine:velocity_ref') is table
+
+        self.config['slave_A']['machine.velocity_ref_value'] = '3'
+        assert self.sc.table('machine:velocity_ref') is table
+
+        self.config.revision += 1
+        assert self.sc.transform('A', 'machine:velocity_ref').function(3) == 9
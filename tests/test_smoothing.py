@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import pytest
+
+from kastl.machines import Machine
+from kastl.motion import MotionUnit
+from kastl.motion.smoothing import SetpointFilter, SmoothingStage
+from kastl.processors.osc.message import OscMessage
+
+
+def run(f, dt, steps):
+    return [v for v in (f.step(dt) for _ in range(steps)) if v is not None]
+
+
+class Test_SetpointFilter(object):
+    def test_slew(self):
+        f = SetpointFilter(slew=10)
+        f.reset(0)
+        f.put(1)
+
+        assert run(f, 0.02, 10) == pytest.approx([0.2, 0.4, 0.6, 0.8, 1.0])
+        assert f.idle
+
+    def test_low_pass(self):
+        f = SetpointFilter(time_constant=0.1, threshold=0.01)
+        f.reset(0)
+        f.put(1)
+
+        values = run(f, 0.01, 200)
+        assert values == sorted(values)
+        assert values[-1] == 1
+        assert len(values) < 100
+        assert f.idle
+
+    def test_no_threshold(self):
+        f = SetpointFilter(time_constant=0.1)
+        f.reset(0)
+        f.put(1)
+
+        values = run(f, 0.01, 100000)
+        assert values[-1] == 1
+        assert f.idle
+
+    def test_deadband(self):
+        f = SetpointFilter(deadband=0.5)
+        f.reset(10)
+
+        assert not f.put(10.3)
+        assert f.put(11)
+        assert run(f, 0.02, 5) == [11]
+        f.reset(0.3)
+        assert f.put(0)
+
+
+class Test_SmoothingStage(object):
+    def setup_method(self, method):
+        self.mu = MotionUnit()
+        machine = Machine(serialnumber='M1', ip_address='127.0.0.1', port=6969)
+        machine.update_pushed_status(OscMessage(Machine.PUSH_PATH, 'machine:velocity_ref', 0.))
+        self.mu.machines[('M1', '127.0.0.1')] = machine
+
+        self.sent = []
+        machine.driver._send = self.sent.append
+
+        self.stage = SmoothingStage(self.mu, rate=50, keys='velocity_ref',
+                                    velocity_ref_slew=100, threshold=0.5)
+        self.mu.smoothing = self.stage
+
+    def writes(self):
+        assert all(str(m.path) == '/machine/set' for m in self.sent)
+        return [tuple(m.args) for m in self.sent]
+
+    def test_filters(self):
+        assert 'velocity_ref' in self.stage
+        assert 'acceleration' not in self.stage
+        assert self.stage.filters['velocity_ref'].slew == 100
+        assert self.stage.filters['velocity_ref'].threshold == 0.5
+
+    def test_tick(self):
+        self.mu['machine:velocity_ref'] = 10
+        while self.stage.tick(0.02):
+            pass
+
+        assert self.writes() == [('machine:velocity_ref', v) for v in (2, 4, 6, 8, 10)]
+
+    def test_current_value(self):
+        locked = []
+
+        def read(key):
+            locked.append(self.stage._lock.locked())
+            return 5.
+
+        self.mu.cache.reader = read
+        self.stage.put('velocity_ref', 10)
+        self.stage.tick(0.02)
+
+        assert locked == [False]
+        assert self.writes() == [('machine:velocity_ref', 7)]
+
+    def test_bypass(self):
+        self.stage.put('velocity_ref', 10)
+        self.mu.set_unfiltered('machine:velocity_ref', 3)
+
+        assert not self.stage.tick(0.02)
+        assert self.writes() == [('machine:velocity_ref', 3)]
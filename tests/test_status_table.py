@@ -0,0 +1,137 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+from threading import Event, Thread
+
+import pytest
+
+from kastl.status_table import StatusReader, StatusTable, StatusTableError
+from kastl.motion.status import StatusPublisher
+from kastl.reactor import Reactor
+
+
+KEYS = ('machine.status', 'machine.velocity', 'machine.position')
+
+
+class Test_StatusTable(object):
+    def setup_method(self, method):
+        self.table = None
+
+    def teardown_method(self, method):
+        if self.table:
+            self.table.close()
+
+    def open(self, tmpdir, keys=KEYS):
+        self.path = str(tmpdir.join('kastl.status'))
+        self.table = StatusTable(self.path, keys)
+        self.table.open()
+        return StatusReader(self.path)
+
+    def test_values(self, tmpdir):
+        reader = self.open(tmpdir)
+        assert reader.keys == list(KEYS)
+        assert reader.read('machine.velocity') == (None, 0)
+
+        self.table.set('machine.velocity', 1.5, stamp=10)
+        self.table.set('machine.position', 42)
+        self.table.set('machine.status', 'running')
+        assert not self.table.set('machine.unknown', 1)
+
+        assert reader.read('machine.velocity') == (1.5, 10)
+        assert reader['machine.position'] == 42
+        assert reader['machine.status'] == 'running'
+        assert reader.get('machine.unknown') is None
+
+        self.table.set('machine.status', True)
+        assert reader['machine.status'] is True
+
+    def test_reopen(self, tmpdir):
+        reader = self.open(tmpdir)
+        self.table.close()
+        assert reader.closed
+
+        self.table = StatusTable(self.path, ('machine.torque',))
+        self.table.open()
+        self.table.set('machine.torque', 2.)
+        reader.reopen()
+        assert reader.snapshot()['machine.torque'][0] == 2.
+
+    def test_consistency(self, tmpdir):
+        reader = self.open(tmpdir, ('machine.status',))
+        stop = Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                self.table.set('machine.status', 'x' * (i % 30 + 1))
+                i += 1
+
+        t = Thread(target=write)
+        t.start()
+        try:
+            for _ in range(2000):
+                v = reader['machine.status']
+                assert v is None or v == 'x' * len(v)
+        finally:
+            stop.set()
+            t.join()
+
+    def test_errors(self, tmpdir):
+        with pytest.raises(StatusTableError):
+            StatusTable(str(tmpdir.join('empty')), ())
+
+        path = tmpdir.join('garbage')
+        path.write(b'\0' * 128, mode='wb')
+        with pytest.raises(StatusTableError):
+            StatusReader(str(path))
+
+
+class FakeCache(object):
+    def __init__(self):
+        self.values = {'velocity': 2., 'position': 10}
+        self.listeners = []
+
+    def get(self, key, block=True):
+        return self.values[key]
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+
+class Test_StatusPublisher(object):
+    def test_publish(self, tmpdir):
+        cache = FakeCache()
+        path = str(tmpdir.join('kastl.status'))
+        publisher = StatusPublisher({'machine.status': lambda: 'ok'}, cache,
+                                    path=path, rate=1000, keys=', '.join(KEYS))
+        reactor = Reactor()
+        reactor.start()
+        publisher.start(reactor)
+        try:
+            publisher.tick()
+            reader = StatusReader(path)
+            assert reader['machine.status'] == 'ok'
+            assert reader['machine.velocity'] == 2.
+
+            listener = cache.listeners[0]
+            listener('position', 11)
+            assert reader['machine.position'] == 11
+        finally:
+            publisher.stop()
+            reactor.stop()
+            reactor.close()
+
+        assert cache.listeners == []
+        listener('position', 12)
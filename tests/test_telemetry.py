@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from kastl.motion.telemetry import TelemetryService, TelemetryError
+from kastl.processors.osc.message import OscAddress
+
+
+class FakeMotionUnit(object):
+    def __init__(self):
+        self.local_status = {}
+        self.sent = []
+
+    def send_message(self, m):
+        self.sent.append(m)
+
+    def __getitem__(self, key):
+        raise KeyError(key)
+
+
+class Test_TelemetryService(object):
+    def setup_method(self, method):
+        self.mu = FakeMotionUnit()
+        self.ts = TelemetryService(self.mu, lease=1, max_rate=10)
+        self.target = OscAddress(hostname='127.0.0.1', port=7000)
+
+    def test_push_changes(self):
+        self.mu.local_status.update({'a': 1, 'b': lambda: 2})
+        assert self.ts.subscribe(self.target, ('a', 'b'), 10) == 1
+
+        self.ts.tick(0)
+        assert len(self.mu.sent) == 1
+        assert self.mu.sent[0].args == ('a', 1, 'b', 2)
+
+        # Not due yet
+        self.mu.local_status['a'] = 3
+        self.ts.tick(0.05)
+        assert len(self.mu.sent) == 1
+
+        self.ts.tick(0.1)
+        assert self.mu.sent[-1].args == ('a', 3)
+
+        # Nothing changed
+        self.ts.tick(0.2)
+        assert len(self.mu.sent) == 2
+
+    def test_lease(self):
+        self.mu.local_status['a'] = 1
+        self.ts.subscribe(self.target, ('a',), 10)
+        sub, = self.ts.subscriptions
+
+        assert self.ts.tick(sub.expires + 1) is None
+        assert self.ts.subscriptions == []
+
+    def test_unsubscribe(self):
+        self.ts.subscribe(self.target, ('a',), 10)
+        self.ts.unsubscribe(self.target)
+        assert self.ts.subscriptions == []
+
+        with pytest.raises(TelemetryError):
+            self.ts.unsubscribe(self.target)
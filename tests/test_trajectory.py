@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import pytest
+
+from kastl.motion.trajectory import (move, plan, plan_phases, TrajectoryPlayer,
+                                     TrajectoryError)
+from kastl.reactor import Reactor
+
+
+def derivative(values, dt):
+    return [(b - a) / dt for a, b in zip(values, values[1:])]
+
+
+class FakeAxis(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, key, value):
+        self.writes.append((key, value))
+
+
+class Test_Profiles(object):
+    def test_trapezoid(self):
+        p = move(0, 10, velocity=2, acceleration=1)
+
+        assert p.duration == pytest.approx(7)
+        assert p.target == pytest.approx(10)
+        assert max(p.velocities) == pytest.approx(2)
+        assert max(derivative(p.velocities, p.dt)) == pytest.approx(1)
+        assert p.sample(5) == pytest.approx((8, 2))
+
+    def test_triangle(self):
+        p = move(0, 1, velocity=10, acceleration=1)
+        assert max(p.velocities) == pytest.approx(1, abs=0.01)
+        assert p.target == pytest.approx(1)
+
+    def test_scurve(self):
+        p = move(0, 10, velocity=2, acceleration=1, jerk=2)
+
+        assert p.duration == pytest.approx(7.5, abs=0.02)
+        assert p.target == pytest.approx(10)
+        acc = derivative(p.velocities, p.dt)
+        assert max(acc) == pytest.approx(1, abs=0.01)
+        assert max(derivative(acc, p.dt)) == pytest.approx(2, abs=0.01)
+
+    def test_blending(self):
+        phases = plan_phases(0, [5, 10], velocity=2, acceleration=1)
+        # No stop at 5
+        assert [a for _, _, a in phases] == [1, 0, 0, -1]
+
+        p = plan(0, [5, 10], velocity=2, acceleration=1)
+        assert p.duration == pytest.approx(7)
+
+    def test_reversal(self):
+        p = plan(3, [5, (-1, 1)], velocity=2, acceleration=1)
+
+        assert p.target == pytest.approx(-1)
+        assert min(p.velocities) == pytest.approx(-1, abs=0.001)
+        assert max(p.positions) == pytest.approx(5, abs=0.01)
+
+    def test_errors(self):
+        with pytest.raises(TrajectoryError):
+            move(0, 1, velocity=0, acceleration=1)
+        assert move(1, 1, velocity=1, acceleration=1).duration == 0
+
+
+class Test_TrajectoryPlayer(object):
+    def setup_method(self, method):
+        self.player = TrajectoryPlayer()
+        self.axis = FakeAxis()
+        self.done = []
+
+    def test_tick(self):
+        p = move(0, 0.1, velocity=1, acceleration=10, dt=0.01)
+        self.player.play('x', p, self.axis, start_at=100, callback=self.done.append)
+
+        assert self.player.tick(99) == 100
+        assert self.axis.writes == []
+
+        t = 100
+        while t is not None:
+            t = self.player.tick(t)
+
+        assert [v for _, v in self.axis.writes] == list(p.velocities)
+        assert self.player.late == 0
+        assert len(self.done) == 1
+        assert self.player.playing == []
+
+    def test_late(self):
+        p = move(0, 0.1, velocity=1, acceleration=10, dt=0.01)
+        self.player.play('x', p, self.axis, key='position_ref', start_at=100)
+
+        self.player.tick(100.05)
+        assert self.axis.writes == [('position_ref', p.positions[5])]
+        assert self.player.late == 1
+
+    def test_cancel(self):
+        p = move(0, 1, velocity=1, acceleration=10)
+        self.player.play('x', p, self.axis, start_at=100)
+        self.player.tick(100.5)
+        self.player.cancel('x')
+
+        assert self.axis.writes[-1] == ('velocity_ref', 0)
+        assert self.player.tick(101) is None
+
+    def test_reactor(self):
+        reactor = Reactor()
+        reactor.start()
+        self.player.start(reactor)
+        try:
+            p = move(0, 0.1, velocity=1, acceleration=10, dt=0.01)
+            played = self.player.play('x', p, self.axis)
+            assert played.done_ev.wait(1)
+        finally:
+            self.player.stop()
+            reactor.stop()
+            reactor.close()
+
+        assert self.axis.writes[-1] == ('velocity_ref', p.velocities[-1])
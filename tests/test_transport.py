@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import multiprocessing
+
+import pytest
+
+from kastl.processors.osc.message import OscMessage, OscAddress
+from kastl.processors.serial.message import SerialMessage
+from kastl.transport import (SharedRing, RingError, encode_message,
+                             decode_message, RecordError)
+
+
+class Test_SharedRing(object):
+    def setup_method(self, method):
+        self.ring = SharedRing(1024)
+
+    def teardown_method(self, method):
+        self.ring.close()
+
+    def test_put_get(self):
+        assert self.ring.get() is None
+        assert self.ring.put(b'abc')
+        assert self.ring.put(b'')
+        assert self.ring.get() == b'abc'
+        assert self.ring.get() == b''
+        assert self.ring.get() is None
+
+    def test_wrap(self):
+        record = bytes(range(100))
+        for i in range(50):
+            assert self.ring.put(record)
+            assert self.ring.put(record[:i])
+            assert self.ring.get() == record
+            assert self.ring.get() == record[:i]
+        assert self.ring.pending == 0
+
+    def test_full(self):
+        while self.ring.put(b'x' * 100):
+            pass
+        assert self.ring.dropped == 1
+        assert self.ring.get() == b'x' * 100
+        assert self.ring.put(b'x' * 100)
+
+        with pytest.raises(RingError):
+            self.ring.put(b'x' * 1024)
+
+    def test_processes(self):
+        ctx = multiprocessing.get_context('fork')
+        count = 2000
+
+        def produce():
+            for i in range(count):
+                while not self.ring.put(str(i).encode()):
+                    pass
+
+        p = ctx.Process(target=produce)
+        p.start()
+
+        received = []
+        while len(received) < count:
+            assert self.ring.wait(5)
+            received.extend(int(r) for r in self.ring.get_many())
+        p.join()
+
+        assert received == list(range(count))
+        assert not self.ring.wait(0.01)
+
+
+class Test_Records(object):
+    def test_osc(self):
+        m = OscMessage('/machine/set', 'machine:velocity', 1.5, 3, True, None,
+                       b'\x01', [1, 2], hostname='10.0.0.1', port=7000,
+                       msg_type='log')
+        d = decode_message(encode_message(m))
+
+        assert d.path == '/machine/set'
+        assert d.args == m.args
+        assert (d.receiver.hostname, d.receiver.port) == ('10.0.0.1', 7000)
+        assert d.msg_type == 'log'
+
+    def test_osc_sender(self):
+        sender = OscAddress(hostname='10.0.0.2', port=6969)
+        m = OscMessage('/remote/connect', 'Dario', types='s', sender=sender)
+        d = decode_message(encode_message(m))
+
+        assert d.receiver is None
+        assert (d.sender.hostname, d.sender.port) == ('10.0.0.2', 6969)
+        assert d.types == 's'
+
+    def test_serial(self):
+        m = SerialMessage()
+        m.cmd_bytes += 'machine.get'
+        m.cmd_bytes += 'machine.velocity'
+        d = decode_message(encode_message(m))
+
+        assert d.command == m.command
+        assert d.args == m.args
+        assert d.serial_number == m.serial_number
+
+    def test_errors(self):
+        with pytest.raises(RecordError):
+            decode_message(b'\x09\x00')
+        with pytest.raises(RecordError):
+            decode_message(encode_message(OscMessage('/a', 'b', hostname='h'))[:-1])
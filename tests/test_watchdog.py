@@ -0,0 +1,134 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim: fenc=utf-8 shiftwidth=4 softtabstop=4
+#
+# Copyright © 2017 Benoit Rapidel, ExMachina <benoit.rapidel+devs@exmachina.fr>
+#
+# Distributed under terms of the GPLv3+ license.
+
+"""
+
+"""
+
+import time
+
+import pytest
+
+from kastl.motion.watchdog import TimerWheel, WatchdogService, WatchdogError
+
+
+class Test_TimerWheel(object):
+    def setup_method(self, method):
+        self.wheel = TimerWheel(tick=0.01, sizes=(8, 4, 4), now=0)
+
+    def due(self, now):
+        return sorted(item for item, _ in self.wheel.advance(now))
+
+    def test_level0(self):
+        self.wheel.add('a', 0.03)
+        self.wheel.add('b', 0.05)
+
+        assert self.due(0.02) == []
+        assert self.due(0.03) == ['a']
+        assert self.due(0.10) == ['b']
+        assert len(self.wheel) == 0
+
+    def test_cascade(self):
+        # Beyond level 0 (8 ticks) and level 1 (32 ticks)
+        self.wheel.add('a', 0.2)
+        self.wheel.add('b', 0.5)
+        self.wheel.add('c', 10)     # Beyond the wheel
+
+        assert self.due(0.19) == []
+        assert self.due(0.20) == ['a']
+        assert self.due(0.49) == []
+        assert self.due(0.50) == ['b']
+        assert 'c' in self.wheel
+        assert self.due(9.99) == []
+        assert self.due(10) == ['c']
+
+    def test_remove(self):
+        self.wheel.add('a', 0.03)
+        self.wheel.add('a', 0.2)    # Moved
+        assert self.due(0.1) == []
+
+        self.wheel.remove('a')
+        assert self.due(1) == []
+
+
+class Test_WatchdogService(object):
+    def setup_method(self, method):
+        self.wd = WatchdogService(tick=0.01)
+        self.now = time.monotonic()
+        self.fired = []
+        self.recovered = []
+
+    def watch(self, name, timeout, **kwargs):
+        return self.wd.watch(name, timeout, self.fired.append,
+                             recover=self.recovered.append, **kwargs)
+
+    def test_not_armed(self):
+        self.watch('link', 0.1)
+        assert self.wd.check(self.now + 1) == []
+
+    def test_timeout(self):
+        w = self.watch('link', 0.1)
+        w.feed(self.now)
+
+        assert self.wd.check(self.now + 0.05) == []
+        assert self.wd.check(self.now + 0.11) == [w]
+        assert w.tripped
+        assert self.fired == [w]
+
+        # Tripped watches don't fire again
+        assert self.wd.check(self.now + 0.5) == []
+
+        w.feed(self.now + 0.5)
+        assert not w.tripped
+        assert self.recovered == [w]
+
+    def test_fed(self):
+        w = self.watch('link', 0.1)
+        for i in range(100):
+            w.feed(self.now + i * 0.01)
+            assert self.wd.check(self.now + i * 0.01) == []
+
+        assert self.wd.check(self.now + 1.1) == [w]
+        assert self.wd.max_latency < 2 * self.wd.tick
+
+    def test_repeat(self):
+        w = self.wd.watch('check', 0.1, self.fired.append, repeat=True)
+        start = w.last
+
+        assert self.wd.check(start + 0.11) == [w]
+        assert self.wd.check(start + 0.22) == [w]
+        assert not w.tripped
+
+        w.disarm()
+        assert self.wd.check(start + 1) == []
+
+    def test_unwatch(self):
+        w = self.watch('link', 0.1)
+        w.feed(self.now)
+        self.wd.unwatch('link')
+        w.feed(self.now)
+
+        assert self.wd.check(self.now + 1) == []
+        assert 'link' not in self.wd
+
+    def test_errors(self):
+        self.watch('link', 0.1)
+        with pytest.raises(WatchdogError):
+            self.watch('link', 0.1)
+        with pytest.raises(WatchdogError):
+            self.watch('other', 0)
+
+    def test_thread(self):
+        self.wd.start()
+        try:
+            w = self.watch('link', 0.05)
+            w.feed()
+            time.sleep(0.15)
+            assert self.fired == [w]
+        finally:
+            self.wd.stop()
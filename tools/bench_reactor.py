@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+CPU used per slave, with a thread set per slave or a single reactor.
+
+Slaves talk to a loopback driver: the OSC driver with every request answered
+at once, as if the slave replied instantly. Only the master side is
+measured, network and slave costs are left out.
+
+    python3 tools/bench_reactor.py [--duration 5] [--rate 50] [1 8 32]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kastl.drivers.osc import OscDriver
+from kastl.machines.slave import Slave, SlaveMachine
+from kastl.reactor import Reactor
+
+
+class Reply(object):
+    __slots__ = ('path', 'args')
+
+    def __init__(self, path, args):
+        self.path = path
+        self.args = args
+
+
+class LoopbackDriver(OscDriver):
+    def _send(self, message, uid=None, **kwargs):
+        args = message.args
+        if message.path == '/slave/set_many':
+            rargs = [a for k, v in zip(args[0::2], args[1::2]) for a in (k, 'ok', v)]
+        elif message.path == '/slave/time':
+            now = int(time.time() * 1000000)
+            rargs = [args[0], now, now]
+        else:
+            rargs = list(args)
+        self.queue.put(Reply(message.path + '/ok', [uid] + rargs))
+
+
+class FakeMaster(object):
+    "Master keys: every value changes at each feeder tick"
+
+    def __init__(self):
+        self.machine_keys = self
+        self.value = 0
+
+    def get_value_for_slave(self, slave, key, value=None):
+        return self.value
+
+
+def make_slaves(n, master):
+    slaves = []
+    for i in range(n):
+        sm = SlaveMachine(address='127.0.0.1:{}'.format(7000 + i), driver_type='Osc',
+                          motion_mode='velocity', config={})
+        sm.slave = Slave('SN{}'.format(i), '127.0.0.1', 'Osc', 'velocity', {})
+        sm.machine = master
+        sm.driver = LoopbackDriver(sm.driver_config)
+        sm.inlet = sm.driver.queue
+        slaves.append(sm)
+    return slaves
+
+
+def run(n, reactor_mode, duration, rate):
+    baseline = threading.active_count()
+    master = FakeMaster()
+    slaves = make_slaves(n, master)
+
+    reactor = None
+    if reactor_mode:
+        reactor = Reactor()
+        reactor.start()
+        for sm in slaves:
+            sm.start(reactor=reactor)
+    else:
+        for sm in slaves:
+            sm.start()
+            t = threading.Thread(target=sm.watcher_loop)
+            t.daemon = True
+            t.start()
+
+    time.sleep(0.5)     # Let initial requests settle
+    threads = threading.active_count() - baseline
+
+    cpu, wall = time.process_time(), time.time()
+    end = wall + duration
+    while time.time() < end:
+        master.value += 1
+        for sm in slaves:
+            sm.notify('machine:velocity')
+        time.sleep(1 / rate)
+    cpu, wall = time.process_time() - cpu, time.time() - wall
+
+    sent = sum(sm.bridge.setpoints for sm in slaves)
+    for sm in slaves:
+        sm.exit()
+    if reactor:
+        reactor.stop()
+        reactor.close()
+
+    # Let threads of this run end before the next one
+    deadline = time.time() + 5
+    while threading.active_count() > baseline and time.time() < deadline:
+        time.sleep(0.1)
+
+    return {
+        'threads': threads,
+        'cpu': 100 * cpu / wall,
+        'cpu_per_slave': 100 * cpu / wall / n,
+        'setpoints': sent / wall / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('counts', nargs='*', type=int, default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--rate', type=float, default=50,
+                        help='master value changes per second')
+    args = parser.parse_args()
+
+    print('{:>6} {:>8} {:>8} {:>8} {:>10} {:>10}'.format(
+        'slaves', 'mode', 'threads', 'cpu %', 'cpu/slave', 'sp/s/slave'))
+    for n in args.counts:
+        for mode in ('threads', 'reactor'):
+            r = run(n, mode == 'reactor', args.duration, args.rate)
+            print('{:>6} {:>8} {threads:>8} {cpu:>8.1f} {cpu_per_slave:>10.2f} '
+                  '{setpoints:>10.1f}'.format(n, mode, **r))
+
+
+if __name__ == '__main__':
+    main()
@@ -177,7 +177,13 @@ class ErtzaActions(object):
             if self.config_get('debug', False):
                 a = ' '.join(map(repr, args))
                 logging.debug('From {}: {} {}'.format(sender, path, a))
-            if '/machine/get' in path:
+            if '/machine/get_many' in path:
+                for k, st, v in zip(args[0::3], args[1::3], args[2::3]):
+                    if st == 'ok':
+                        self.status[k] = v
+                    else:
+                        logging.error('Unable to get {}: {}'.format(k, v))
+            elif '/machine/get' in path:
                 k, v, = args
                 self.status[k] = v
             elif '/config/get' in path:
@@ -289,8 +295,7 @@ class ErtzaActions(object):
 
             'machine:drive_temp', 'machine:dropped_frames',
         )
-        for s in st:
-            self.send('/machine/get', s)
+        self.send('/machine/get_many', *st)
 
     def drive_cancel(self):
         self.send('/debug/drive/drive_cancel', 1)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Print the status table published by a local motion unit.
+
+    python3 tools/kastl_status.py [--path /dev/shm/kastl.status] [--watch 0.1]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kastl.status_table import StatusReader
+
+
+def show(reader):
+    now = time.time()
+    for k, (v, stamp) in sorted(reader.snapshot().items()):
+        age = '{:8.3f}s'.format(now - stamp) if stamp else '   never'
+        print('{:<32} {!s:<24} {}'.format(k, v, age))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--path', default='/dev/shm/kastl.status')
+    parser.add_argument('--watch', type=float, default=0,
+                        help='refresh interval, 0 prints once')
+    args = parser.parse_args()
+
+    reader = StatusReader(args.path)
+    try:
+        while True:
+            if reader.closed:
+                reader.reopen()
+            show(reader)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()